@@ -209,6 +209,11 @@ CACHES = {
     }
 }
 
+# Метаданные изображений для FastAPI сервиса (Redis, который читает FastAPI)
+IMAGE_METADATA_REDIS_URL = os.getenv('IMAGE_METADATA_REDIS_URL', 'redis://redis:6379/0')
+IMAGE_METADATA_KEY_PREFIX = os.getenv('IMAGE_METADATA_KEY_PREFIX', 'image_meta:')
+IMAGE_METADATA_TTL = int(os.getenv('IMAGE_METADATA_TTL', 60 * 60 * 24 * 30))
+
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
 
@@ -1,10 +1,18 @@
 from fastapi import Request, Depends, HTTPException
 from functools import lru_cache
+from typing import Optional, Union
 import logging
 
 from ..services.django_service import DjangoService
 from ..services.ocr_service import OCRService
 from ..services.email_service import EmailService
+from ..services.task_events import TaskEventBroker
+from ..services.task_status import TaskStatusService
+from ..services.result_store import RedisResultStore, SQLiteResultStore
+from ..services.task_dedup import TaskDeduplicator
+from ..services.dead_letter import DeadLetterQueue
+from ..services.admission import AdmissionController
+from ..services.sync_ocr import SyncOCRExecutor
 from ..core.config import Settings, settings
 
 logger = logging.getLogger(__name__)
@@ -21,6 +29,34 @@ def get_email_service(request: Request) -> EmailService:
     """Получение Email сервиса из state"""
     return request.app.state.email_service
 
+def get_task_event_broker(request: Request) -> TaskEventBroker:
+    """Получение брокера событий задач из state"""
+    return request.app.state.task_events
+
+def get_task_status_service(request: Request) -> TaskStatusService:
+    """Получение сервиса состояний задач из state"""
+    return request.app.state.task_status
+
+def get_result_store(request: Request) -> Union[RedisResultStore, SQLiteResultStore]:
+    """Получение хранилища результатов OCR из state"""
+    return request.app.state.result_store
+
+def get_task_deduplicator(request: Request) -> TaskDeduplicator:
+    """Получение сервиса дедупликации задач из state"""
+    return request.app.state.task_dedup
+
+def get_dead_letter_queue(request: Request) -> DeadLetterQueue:
+    """Получение dead-letter очереди OCR задач из state"""
+    return request.app.state.dead_letter
+
+def get_sync_ocr_executor(request: Request) -> SyncOCRExecutor:
+    """Пул синхронного распознавания из state"""
+    return request.app.state.sync_ocr
+
+def get_admission_controller(request: Request) -> Optional[AdmissionController]:
+    """Контроль приема задач (None, если выключен)"""
+    return getattr(request.app.state, 'admission', None)
+
 @lru_cache()
 def get_settings() -> Settings:
     """Получение настроек (кэшируется)"""
@@ -1,12 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from typing import Optional
-from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Query, Header, Form, File, UploadFile
+from fastapi.responses import StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, Literal, Optional
+from uuid import UUID, uuid4
+import asyncio
+import json
 import logging
+from celery import chord, group
 
-from ..models.schemas import OCRRequest, OCRResponse, EmailRequest, EmailResponse, OCRResultResponse
-from ..api.dependencies import get_services, Services
-from ..tasks.celery_app import process_ocr_task
-from ..core.exceptions import ImageNotFoundException, OCRProcessingException
+from ..models.schemas import (
+    OCRRequest, OCRResponse, SyncOCRResponse, EmailRequest, EmailResponse, OCRResultResponse,
+    BatchOCRRequest, BatchOCRResponse, BatchStatusResponse,
+    BulkTaskStatusRequest, BulkTaskStatusResponse, TaskStatusItem, OCRResultHistoryResponse,
+    DeadLetterTask, DeadLetterListResponse, DeadLetterReplayRequest, DeadLetterReplayResponse
+)
+from ..api.dependencies import (
+    get_services, Services, get_task_event_broker, get_task_status_service, get_result_store,
+    get_task_deduplicator, get_admission_controller, get_sync_ocr_executor, get_dead_letter_queue
+)
+from ..services.task_events import TaskEventBroker, DISCONNECTED_STAGE
+from ..services.task_status import TaskStatusService, TERMINAL_STATES
+from ..services.task_dedup import TaskDeduplicator
+from ..services.admission import AdmissionController
+from ..services.sync_ocr import SyncOCRExecutor
+from ..services.dead_letter import DeadLetterQueue
+from ..tasks.celery_app import process_ocr_task, ocr_batch_completed
+from ..tasks.routing import select_ocr_queue, estimate_ocr_cost
+from ..core.config import settings
+from ..core.metrics import sync_ocr_requests
+from ..services.ocr_layout import to_hocr, to_tsv
+from ..core.exceptions import (
+    ImageNotFoundException, OCRProcessingException, BatchTooLargeException, OCRResultNotFoundException,
+    QueueOverloadedException, UploadTooLargeException, OCRDeadlineExceededException,
+    OCRLayoutNotFoundException
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +42,10 @@ router = APIRouter(prefix="/api/v1", tags=["OCR"])
 @router.post("/analyze_doc", response_model=OCRResponse)
 async def analyze_doc(
     request: OCRRequest,
-    services: Services = Depends(get_services)
+    services: Services = Depends(get_services),
+    task_dedup: TaskDeduplicator = Depends(get_task_deduplicator),
+    admission: Optional[AdmissionController] = Depends(get_admission_controller),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     Эндпоинт для запуска OCR анализа изображения
@@ -23,22 +53,67 @@ async def analyze_doc(
     - **image_id**: UUID изображения из Django
     - **send_email**: отправлять ли результат на email
     - **email**: email для отправки (если не указан, берется из настроек)
+    - **languages**: языки Tesseract (если не указаны, определяются по изображению)
+    
+    Повторный запрос для того же изображения с теми же параметрами, пока
+    задача выполняется (или с тем же заголовком Idempotency-Key),
+    возвращает task_id уже поставленной задачи. Idempotency-Key с другим
+    изображением или параметрами ставит новую задачу.
+    
+    Если очередь перегружена, возвращается 429 с заголовком Retry-After.
     """
     logger.info(f"📝 Received analyze_doc request for image {request.image_id}")
     
+    email = str(request.email).lower() if request.email else None
+    options = {'send_email': request.send_email, 'email': email, 'languages': request.languages}
+    if idempotency_key:
+        dedup_key = task_dedup.idempotency_key(idempotency_key, str(request.image_id), **options)
+        release_key = None
+    else:
+        dedup_key = task_dedup.inflight_key(str(request.image_id), **options)
+        release_key = dedup_key
+    
+    task_id = str(uuid4())
+    try:
+        task_id, claimed = await task_dedup.claim(dedup_key, task_id)
+    except Exception as e:
+        logger.warning(f"⚠️ Task deduplication unavailable: {str(e)}")
+        dedup_key = release_key = None
+        claimed = True
+    
+    if not claimed:
+        logger.info(f"♻️ Duplicate analyze_doc request for image {request.image_id}, task {task_id}")
+        return OCRResponse(
+            task_id=task_id,
+            status="processing",
+            message="Задача уже поставлена в очередь обработки",
+            deduplicated=True
+        )
+    
     try:
         image_data = await services.django_service.get_image(request.image_id)
         
         if not image_data:
             raise ImageNotFoundException(str(request.image_id))
         
-        task = process_ocr_task.delay(
-            image_id=str(request.image_id),
-            send_email=request.send_email,
-            email=str(request.email) if request.email else None
+        queue = select_ocr_queue(image_data)
+        if admission is not None:
+            await admission.check(queue)
+        
+        task = process_ocr_task.apply_async(
+            kwargs={
+                'image_id': str(request.image_id),
+                'send_email': request.send_email,
+                'email': str(request.email) if request.email else None,
+                'release_key': release_key,
+                'image_data': image_data,
+                'languages': request.languages
+            },
+            task_id=task_id,
+            queue=queue
         )
         
-        logger.info(f"✅ OCR task created with ID: {task.id}")
+        logger.info(f"✅ OCR task created with ID: {task.id} (queue {queue})")
         
         return OCRResponse(
             task_id=task.id,
@@ -46,12 +121,249 @@ async def analyze_doc(
             message="Задача поставлена в очередь обработки"
         )
         
-    except ImageNotFoundException:
-        raise
     except Exception as e:
+        if dedup_key:
+            await task_dedup.release(dedup_key, task_id)
+        if isinstance(e, (ImageNotFoundException, QueueOverloadedException)):
+            raise
         logger.error(f"❌ Error creating OCR task: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.post("/analyze_sync", response_model=SyncOCRResponse)
+async def analyze_sync(
+    image_id: Optional[UUID] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    services: Services = Depends(get_services),
+    sync_ocr: SyncOCRExecutor = Depends(get_sync_ocr_executor),
+    result_store = Depends(get_result_store),
+    admission: Optional[AdmissionController] = Depends(get_admission_controller)
+):
+    """
+    Быстрое распознавание небольших изображений без очереди Celery
+    
+    - **image_id**: UUID изображения из Django
+    - **file**: либо файл изображения в multipart запросе
+    
+    Изображение дешевле OCR_SYNC_MAX_COST мегапикселей распознается в пуле
+    процессов API за OCR_SYNC_DEADLINE секунд (path=sync). Иначе, а также
+    при занятом пуле или истекшем сроке, изображение из Django ставится
+    в очередь (path=queued, task_id). Загруженный файл в очередь не
+    передается: слишком большой - 413, не уложившийся в срок - 504.
+    """
+    if (image_id is None) == (file is None):
+        raise HTTPException(status_code=400, detail="Укажите image_id или загрузите файл")
+    
+    if file is not None:
+        data = await file.read(settings.OCR_SYNC_MAX_UPLOAD_BYTES + 1)
+        if len(data) > settings.OCR_SYNC_MAX_UPLOAD_BYTES:
+            raise UploadTooLargeException(f"Файл больше {settings.OCR_SYNC_MAX_UPLOAD_BYTES} байт")
+        width, height = sync_ocr.image_size(data)
+        if estimate_ocr_cost({'width': width, 'height': height}) > settings.OCR_SYNC_MAX_COST:
+            raise UploadTooLargeException(
+                f"Изображение {width}x{height} слишком велико для синхронного распознавания, "
+                f"загрузите его в Django и используйте /analyze_doc"
+            )
+        try:
+            result = await sync_ocr.recognize(data, wait=True)
+        except asyncio.TimeoutError:
+            sync_ocr_requests.labels(path='rejected', reason='deadline').inc()
+            raise OCRDeadlineExceededException(sync_ocr.deadline)
+        sync_ocr_requests.labels(path='sync', reason='ok').inc()
+        return SyncOCRResponse(path='sync', **result)
+    
+    image_data = await services.django_service.get_image(image_id)
+    if not image_data:
+        raise ImageNotFoundException(str(image_id))
+    
+    if estimate_ocr_cost(image_data) > settings.OCR_SYNC_MAX_COST:
+        reason = 'cost'
+    elif sync_ocr.busy:
+        # Пул занят: изображение не загружаем, сразу ставим задачу в очередь
+        reason = 'busy'
+    else:
+        try:
+            data = await services.ocr_service.read_image_bytes(image_data)
+            result = await sync_ocr.recognize(data)
+        except asyncio.TimeoutError:
+            reason = 'deadline'
+        else:
+            if result is not None:
+                await result_store.save(
+                    str(image_id), text=result['text'], confidence=result['confidence'], layout=result.get('layout')
+                )
+                sync_ocr_requests.labels(path='sync', reason='ok').inc()
+                return SyncOCRResponse(path='sync', image_id=image_id, **result)
+            # Пул заняли, пока загружалось изображение
+            reason = 'busy'
+    
+    queue = select_ocr_queue(image_data)
+    if admission is not None:
+        await admission.check(queue)
+    task = process_ocr_task.apply_async(
+        kwargs={
+            'image_id': str(image_id),
+            'send_email': False,
+            'email': None,
+            'image_data': image_data
+        },
+        queue=queue
+    )
+    logger.info(f"⏩ analyze_sync for image {image_id} queued as {task.id} ({reason})")
+    sync_ocr_requests.labels(path='queued', reason=reason).inc()
+    return SyncOCRResponse(path='queued', reason=reason, image_id=image_id, task_id=task.id)
+
+@router.post("/analyze_batch", response_model=BatchOCRResponse)
+async def analyze_batch(
+    request: BatchOCRRequest,
+    services: Services = Depends(get_services),
+    admission: Optional[AdmissionController] = Depends(get_admission_controller)
+):
+    """
+    Эндпоинт для пакетного запуска OCR анализа
+    
+    - **image_ids**: список UUID изображений из Django
+    - **send_email**: отправлять ли результаты на email
+    - **email**: email для отправки (если не указан, берется из настроек)
+    - **notify_on_complete**: выполнить callback после завершения всего пакета
+    
+    Если перегружена любая из очередей пакета, пакет не ставится:
+    возвращается 429 с заголовком Retry-After.
+    """
+    image_ids = list(dict.fromkeys(request.image_ids))
+    limit = settings.OCR_BATCH_MAX_SIZE
+    if len(image_ids) > limit:
+        raise BatchTooLargeException(len(image_ids), limit)
+    
+    logger.info(f"📝 Received analyze_batch request for {len(image_ids)} images")
+    
+    try:
+        found, missing = await services.django_service.get_images(image_ids)
+        
+        if not found:
+            raise ImageNotFoundException(", ".join(missing))
+        
+        queues = {image_id: select_ocr_queue(image_data) for image_id, image_data in found.items()}
+        if admission is not None:
+            for queue in sorted(set(queues.values())):
+                await admission.check(queue)
+        
+        email = str(request.email) if request.email else None
+        header = group(
+            process_ocr_task.s(
+                image_id=image_id,
+                send_email=request.send_email,
+                email=email,
+                image_data=image_data,
+                batch_member=request.notify_on_complete
+            ).set(queue=queues[image_id])
+            for image_id, image_data in found.items()
+        )
+        
+        if request.notify_on_complete:
+            # id группы задается до публикации: callback и batch_status получают один batch_id
+            batch_id = str(uuid4())
+            group_result = chord(
+                header, ocr_batch_completed.s(batch_id=batch_id, email=email), task_id=batch_id
+            ).apply_async(task_id=str(uuid4())).parent
+        else:
+            group_result = header.apply_async()
+            batch_id = group_result.id
+        
+        group_result.save()
+        
+        task_ids = [result.id for result in group_result.results]
+        logger.info(f"✅ OCR batch {batch_id} created with {len(task_ids)} tasks")
+        
+        return BatchOCRResponse(
+            batch_id=batch_id,
+            task_ids=task_ids,
+            missing_ids=missing,
+            status="processing",
+            message="Пакет поставлен в очередь обработки"
+        )
+    
+    except (ImageNotFoundException, QueueOverloadedException):
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error creating OCR batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/batch_status/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(
+    batch_id: str,
+    task_status: TaskStatusService = Depends(get_task_status_service)
+):
+    """
+    Агрегированный прогресс пакета: выполнено / с ошибкой / в ожидании
+    """
+    from celery.result import GroupResult
+    from ..tasks.celery_app import celery_app
+    
+    group_result = GroupResult.restore(batch_id, app=celery_app)
+    if group_result is None:
+        raise HTTPException(status_code=404, detail=f"Пакет {batch_id} не найден")
+    
+    metas = await run_in_threadpool(task_status.get_many, [result.id for result in group_result.results])
+    
+    done = failed = 0
+    for meta in metas.values():
+        state = meta.get('status')
+        result = meta.get('result')
+        if state == 'SUCCESS' and isinstance(result, dict) and result.get('status') == 'failed':
+            # Задача пакета с callback завершается результатом failed, а не ошибкой
+            failed += 1
+        elif state == 'SUCCESS':
+            done += 1
+        elif state in ('FAILURE', 'REVOKED'):
+            failed += 1
+    
+    total = len(metas)
+    pending = total - done - failed
+    
+    return BatchStatusResponse(
+        batch_id=batch_id,
+        total=total,
+        done=done,
+        failed=failed,
+        pending=pending,
+        completed=pending == 0
+    )
+
+@router.post("/task_status/bulk", response_model=BulkTaskStatusResponse, response_model_exclude_none=True)
+async def get_task_status_bulk(
+    request: BulkTaskStatusRequest,
+    task_status: TaskStatusService = Depends(get_task_status_service)
+):
+    """
+    Состояния многих задач за один запрос к result backend
+    
+    - **task_ids**: список ID задач
+    - **pending_only**: вернуть только незавершенные задачи
+    - **include_results**: добавить результаты и ошибки завершенных задач
+    """
+    if len(request.task_ids) > settings.TASK_STATUS_BULK_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Слишком много задач: {len(request.task_ids)} (максимум {settings.TASK_STATUS_BULK_MAX})"
+        )
+    
+    metas = await run_in_threadpool(task_status.get_many, request.task_ids)
+    
+    tasks = {}
+    for task_id, meta in metas.items():
+        state = meta.get('status', 'PENDING')
+        if request.pending_only and state in TERMINAL_STATES:
+            continue
+        item = TaskStatusItem(state=state)
+        if request.include_results:
+            if state == 'SUCCESS':
+                item.result = meta.get('result')
+            elif state == 'FAILURE':
+                item.error = str(meta.get('result'))
+        tasks[task_id] = item
+    
+    return BulkTaskStatusResponse(tasks=tasks)
+
 @router.get("/task_status/{task_id}")
 async def get_task_status(task_id: str):
     """
@@ -81,6 +393,63 @@ async def get_task_status(task_id: str):
     
     return response
 
+def _sse(event: str, data: dict) -> str:
+    """Форматирование server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _task_event_stream(task_id: str, request: Request, broker: TaskEventBroker) -> AsyncIterator[str]:
+    """
+    Поток этапов обработки задачи до ее завершения
+    
+    Подписка оформляется до чтения текущего состояния, чтобы не
+    пропустить события, опубликованные между этими шагами.
+    """
+    from celery.result import AsyncResult
+    from ..tasks.celery_app import celery_app
+    
+    async with broker.subscribe(task_id) as queue:
+        state = await run_in_threadpool(lambda: AsyncResult(task_id, app=celery_app).state)
+        yield _sse('state', {'task_id': task_id, 'state': state})
+        if state in TERMINAL_STATES:
+            return
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.TASK_EVENTS_STREAM_TIMEOUT
+        while loop.time() < deadline:
+            if await request.is_disconnected():
+                return
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.TASK_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            
+            stage = event.get('stage')
+            yield _sse(stage, event)
+            
+            if stage in ('failed', 'emailed', DISCONNECTED_STAGE):
+                return
+            if stage == 'completed' and not event.get('email_queued'):
+                return
+
+@router.get("/task_events/{task_id}")
+async def stream_task_events(
+    task_id: str,
+    request: Request,
+    broker: TaskEventBroker = Depends(get_task_event_broker)
+):
+    """
+    Поток событий задачи (Server-Sent Events): fetched, downloaded,
+    page (для многостраничных документов), ocr, completed, emailed,
+    а также retrying / failed; disconnected - поток событий прерван,
+    нужно переподключиться
+    """
+    return StreamingResponse(
+        _task_event_stream(task_id, request, broker),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @router.post("/send_message_to_email", response_model=EmailResponse)
 async def send_message_to_email(
     request: EmailRequest,
@@ -107,7 +476,7 @@ async def send_message_to_email(
         
         body = request.body
         if request.ocr_text and image_data:
-            body += f"\n\nOCR Results for {image_data.title}:\n{request.ocr_text}"
+            body += f"\n\nOCR Results for {image_data.get('title')}:\n{request.ocr_text}"
         
         success = await services.email_service.send_notification(
             to_email=request.to_email,
@@ -136,12 +505,106 @@ async def health_check():
         'version': '1.0.0'
     }
 
-@router.get("/result/{image_id}", response_model=Optional[OCRResultResponse])
+@router.get("/result/{image_id}", response_model=OCRResultResponse, response_model_exclude_unset=True)
 async def get_ocr_result(
     image_id: UUID,
-    services: Services = Depends(get_services)
+    format: Optional[Literal['json', 'hocr', 'tsv']] = Query(
+        None, description="Разметка слов: json (поле layout), hocr или tsv"
+    ),
+    result_store = Depends(get_result_store)
 ):
     """
     Получение последнего результата OCR для изображения
+    
+    Результат читается из хранилища результатов одним запросом по image_id.
+    Разметка слов читается только при указанном format и строится из
+    того же прохода Tesseract, что и текст.
+    """
+    if format is None:
+        result = await result_store.get_latest(str(image_id))
+        if result is None:
+            raise OCRResultNotFoundException(str(image_id))
+        return OCRResultResponse(image_id=image_id, **result)
+    
+    result = await result_store.get_latest(str(image_id), with_layout=True)
+    if result is None:
+        raise OCRResultNotFoundException(str(image_id))
+    layout = result['layout']
+    if layout is None:
+        raise OCRLayoutNotFoundException(str(image_id))
+    if format == 'hocr':
+        return Response(to_hocr(layout), media_type='text/html')
+    if format == 'tsv':
+        return Response(to_tsv(layout), media_type='text/tab-separated-values')
+    return OCRResultResponse(image_id=image_id, **result)
+
+@router.get("/result/{image_id}/history", response_model=OCRResultHistoryResponse, response_model_exclude_unset=True)
+async def get_ocr_result_history(
+    image_id: UUID,
+    limit: int = Query(10, ge=1, le=100),
+    result_store = Depends(get_result_store)
+):
+    """
+    История запусков OCR для изображения, от последнего к первому
     """
-    return None
\ No newline at end of file
+    runs = await result_store.get_history(str(image_id), limit)
+    return OCRResultHistoryResponse(
+        image_id=image_id,
+        runs=[OCRResultResponse(image_id=image_id, **run) for run in runs]
+    )
+
+@router.get("/dead_letter", response_model=DeadLetterListResponse)
+async def list_dead_letter_tasks(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    dead_letter: DeadLetterQueue = Depends(get_dead_letter_queue)
+):
+    """
+    Задачи OCR, упавшие окончательно: после последней попытки или
+    с постоянной ошибкой. Новые первыми.
+    """
+    total, entries = await dead_letter.list(limit, offset)
+    return DeadLetterListResponse(
+        total=total,
+        tasks=[DeadLetterTask(image_id=entry['kwargs'].get('image_id'), **entry) for entry in entries]
+    )
+
+@router.post("/dead_letter/replay", response_model=DeadLetterReplayResponse)
+async def replay_dead_letter_tasks(
+    request: DeadLetterReplayRequest,
+    dead_letter: DeadLetterQueue = Depends(get_dead_letter_queue)
+):
+    """
+    Повторная постановка задач из dead-letter очереди
+    
+    - **task_ids**: ID упавших задач
+    - **limit**: без task_ids переотправляется столько самых старых задач
+    
+    Задача получает новый ID и снова проходит все попытки. Записи
+    извлекаются атомарно, поэтому одновременные запросы не ставят одну
+    задачу дважды.
+    """
+    task_ids = request.task_ids or await dead_letter.oldest(request.limit)
+    entries = await dead_letter.pop(task_ids)
+    
+    replayed = {}
+    for index, entry in enumerate(entries):
+        kwargs = entry['kwargs']
+        queue = entry['queue']
+        if queue == 'unknown':
+            queue = select_ocr_queue(kwargs.get('image_data') or {})
+        try:
+            task = process_ocr_task.apply_async(kwargs=kwargs, queue=queue)
+        except Exception as e:
+            for rest in entries[index:]:
+                await dead_letter.restore(rest)
+            logger.error(f"❌ Dead-letter replay stopped after {len(replayed)} tasks: {str(e)}")
+            raise HTTPException(status_code=503, detail=f"Не удалось поставить задачу в очередь: {str(e)}")
+        replayed[entry['task_id']] = task.id
+    
+    logger.info(f"♻️ Replayed {len(replayed)} dead-lettered OCR tasks")
+    found = {entry['task_id'] for entry in entries}
+    return DeadLetterReplayResponse(
+        replayed=replayed,
+        missing_ids=[task_id for task_id in request.task_ids or [] if task_id not in found]
+    )
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import EmailStr, Field
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
 
@@ -10,20 +10,119 @@ class Settings(BaseSettings):
 
     DJANGO_API_URL: str = "http://web:8000/api"
     DJANGO_API_TIMEOUT: int = 30
+    DJANGO_MEDIA_BASE_URL: Optional[str] = None
+    
+    IMAGE_METADATA_CACHE_ENABLED: bool = True
+    IMAGE_METADATA_KEY_PREFIX: str = "image_meta:"
+    IMAGE_METADATA_TTL: int = 2592000
+    IMAGE_METADATA_NEGATIVE_TTL: int = 60
     
     REDIS_URL: str = "redis://redis:6379/0"
     
+    TASK_EVENTS_CHANNEL: str = "ocr:task_events"
+    TASK_EVENTS_HEARTBEAT: int = 15
+    TASK_EVENTS_STREAM_TIMEOUT: int = 1800
+    TASK_STATUS_BULK_MAX: int = 1000
+    TASK_STATUS_CACHE_SIZE: int = 10000
+    TASK_STATUS_CACHE_TTL: int = 3600
+    
     CELERY_BROKER_URL: str = "redis://redis:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://redis:6379/0"
     
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_API_KEY: str = "600/m"
+    RATE_LIMIT_PER_IP: str = "120/m"
+    RATE_LIMIT_API_KEY_HEADER: str = "X-API-Key"
+    RATE_LIMIT_API_KEYS: List[str] = []
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    RATE_LIMIT_LOCAL_CACHE_SIZE: int = 10000
+    RATE_LIMIT_ROUTE_COSTS: Dict[str, int] = {
+        "/api/v1/analyze_doc": 1,
+        "/api/v1/analyze_batch": 20,
+        "/api/v1/send_message_to_email": 2,
+    }
+    
+    READINESS_PROBE_INTERVAL: int = 15
+    READINESS_PROBE_TIMEOUT: float = 2.0
+    READINESS_REQUIRE_WORKERS: bool = False
+    
     EMAIL_HOST: str = "smtp.gmail.com"
     EMAIL_PORT: int = 587
     EMAIL_USE_TLS: bool = True
     EMAIL_HOST_USER: Optional[str] = None
     EMAIL_HOST_PASSWORD: Optional[str] = None
     DEFAULT_FROM_EMAIL: Optional[EmailStr] = None
+    EMAIL_POOL_SIZE: int = 4
+    EMAIL_POOL_HEALTHCHECK_INTERVAL: int = 30
+    EMAIL_POOL_MAX_IDLE: int = 240
+    EMAIL_QUEUE: str = "email"
+    EMAIL_RATE_LIMIT: str = "60/m"
+    EMAIL_DIGEST_ENABLED: bool = False
+    EMAIL_DIGEST_WINDOW: int = 300
+    EMAIL_DIGEST_MAX_ITEMS: int = 50
     
     TESSERACT_CMD: str = "/usr/bin/tesseract"
+    OCR_LANGUAGES: str = "rus+eng"
+    OCR_LANGUAGE_DETECTION: bool = True
+    OCR_SCRIPT_LANGUAGES: Dict[str, str] = {"Cyrillic": "rus", "Latin": "eng"}
+    OCR_LANGUAGE_SAMPLE_SIDE: int = 1200
+    OCR_LANGUAGE_MIN_CONFIDENCE: float = 2.0
+    OCR_LANGUAGE_CACHE_TTL: int = 604800
+    
+    OCR_TEXT_PREFILTER_ENABLED: bool = True
+    OCR_TEXT_PREFILTER_SAMPLE_SIDE: int = 800
+    OCR_TEXT_PREFILTER_CELL_SIZE: int = 32
+    OCR_TEXT_PREFILTER_EDGE_LEVEL: int = 96
+    OCR_TEXT_PREFILTER_MIN_DENSITY: float = 0.08
+    
+    MEDIA_ROOT: Optional[str] = "/app/media"
+    
+    OCR_MAX_DOWNLOAD_BYTES: int = 50 * 1024 * 1024
+    OCR_DECODE_MAX_SIDE: int = 5000
+    
+    WORKER_METRICS_PORT: int = 9808
+    WORKER_METRICS_ADDR: str = "0.0.0.0"
+    WORKER_MAX_TASKS_PER_CHILD: int = 500
+    WORKER_MAX_MEMORY_PER_CHILD_MB: int = 1024
+    WORKER_TRACEMALLOC_TOP: int = 0
+    WORKER_TESSERACT_TEMP_MAX_AGE: int = 3600
+    
+    OCR_MAX_WORKERS: int = 4
+    OCR_TILE_THRESHOLD_PIXELS: int = 12_000_000
+    OCR_TILE_BAND_HEIGHT: int = 1500
+    OCR_TILE_OVERLAP: int = 120
+    
+    OCR_BATCH_MAX_SIZE: int = 10000
+    
+    OCR_SYNC_MAX_COST: float = 2.0
+    OCR_SYNC_DEADLINE: float = 2.0
+    OCR_SYNC_MAX_WORKERS: int = 2
+    OCR_SYNC_MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    
+    OCR_QUEUE_SMALL: str = "ocr.small"
+    OCR_QUEUE_LARGE: str = "ocr.large"
+    OCR_LARGE_COST_THRESHOLD: float = 4.0
+    
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_QUEUE_DEPTH: int = 5000
+    ADMISSION_MAX_WAIT_SECONDS: float = 900
+    ADMISSION_MIN_DRAIN_RATE: float = 0.5
+    ADMISSION_SAMPLE_INTERVAL: float = 2
+    ADMISSION_RETRY_AFTER_MAX: int = 300
+    
+    OCR_INFLIGHT_LOCK_TTL: int = 3600
+    OCR_IDEMPOTENCY_KEY_TTL: int = 86400
+    
+    OCR_TASK_MAX_RETRIES: int = 3
+    OCR_RETRY_BACKOFF_BASE: float = 10
+    OCR_RETRY_BACKOFF_MAX: float = 600
+    OCR_DEAD_LETTER_MAX_ITEMS: int = 10000
+    OCR_DEAD_LETTER_REPLAY_MAX: int = 1000
+    
+    OCR_RESULT_STORE_BACKEND: str = "redis"
+    OCR_RESULT_SQLITE_PATH: str = "/app/media/ocr_results.sqlite3"
+    OCR_RESULT_HISTORY_LIMIT: int = 10
+    OCR_RESULT_RETENTION_DAYS: int = 30
     
     class Config:
         env_file = ".env"
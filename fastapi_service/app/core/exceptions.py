@@ -19,6 +19,20 @@ class ImageNotFoundException(AppException):
             detail=f"Изображение с ID {image_id} не найдено"
         )
 
+class OCRResultNotFoundException(AppException):
+    def __init__(self, image_id: str):
+        super().__init__(
+            status_code=404,
+            detail=f"Результат OCR для изображения {image_id} не найден"
+        )
+
+class OCRLayoutNotFoundException(AppException):
+    def __init__(self, image_id: str):
+        super().__init__(
+            status_code=404,
+            detail=f"Разметка слов для изображения {image_id} не сохранена"
+        )
+
 class OCRProcessingException(AppException):
     def __init__(self, detail: str = "Ошибка при обработке OCR"):
         super().__init__(status_code=422, detail=detail)
@@ -29,4 +43,45 @@ class EmailSendingException(AppException):
 
 class DjangoAPIException(AppException):
     def __init__(self, detail: str = "Ошибка при обращении к Django API"):
-        super().__init__(status_code=502, detail=detail)
\ No newline at end of file
+        super().__init__(status_code=502, detail=detail)
+
+class BatchTooLargeException(AppException):
+    def __init__(self, size: int, limit: int):
+        super().__init__(
+            status_code=413,
+            detail=f"Слишком большой пакет: {size} изображений (максимум {limit})"
+        )
+
+class ImageTooLargeException(AppException):
+    def __init__(self, size: int, limit: int):
+        super().__init__(
+            status_code=413,
+            detail=f"Слишком большой файл изображения: {size} байт (максимум {limit})"
+        )
+
+class UploadTooLargeException(AppException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=413, detail=detail)
+
+class OCRDeadlineExceededException(AppException):
+    def __init__(self, deadline: float):
+        super().__init__(
+            status_code=504,
+            detail=f"Распознавание не завершилось за {deadline} с"
+        )
+
+class QueueOverloadedException(AppException):
+    def __init__(self, queue: str, retry_after: int):
+        super().__init__(
+            status_code=429,
+            detail=f"Очередь {queue} перегружена, повторите запрос через {retry_after} с",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class RateLimitExceededException(AppException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=429,
+            detail=f"Превышен лимит запросов, повторите через {retry_after} с",
+            headers={"Retry-After": str(retry_after)}
+        )
\ No newline at end of file
@@ -0,0 +1,38 @@
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Модуль, который загружается при первом обращении к его атрибуту.
+    
+    Тяжелые зависимости (pytesseract, PIL, jinja2, aiosmtplib) нужны только
+    при обработке задач, поэтому не должны замедлять импорт приложения.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def load_lazy_modules(*names: str):
+    """
+    Загрузка отложенных модулей в текущем потоке.
+    
+    LazyLoader в Python 3.11 не потокобезопасен: если первое обращение к
+    атрибуту происходит в нескольких потоках пула одновременно, один из
+    них может увидеть недозагруженный модуль и получить AttributeError.
+    Поэтому модули загружаются до отправки работы в пул.
+    """
+    for name in names:
+        module = sys.modules.get(name) or importlib.import_module(name)
+        # Любое обращение к атрибуту _LazyModule выполняет загрузку
+        module.__dict__
\ No newline at end of file
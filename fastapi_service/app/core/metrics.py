@@ -0,0 +1,95 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.routing import Match
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216, 67_108_864, 268_435_456)
+
+request_count = Counter(
+    'http_requests_total',
+    'Total HTTP requests',
+    ['method', 'endpoint', 'status']
+)
+request_duration = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request duration',
+    ['method', 'endpoint', 'status']
+)
+
+ocr_stage_duration = Histogram(
+    'ocr_stage_seconds',
+    'Duration of OCR pipeline stages',
+    ['stage'],
+    buckets=STAGE_BUCKETS
+)
+ocr_download_bytes = Histogram(
+    'ocr_download_bytes',
+    'Size of images loaded for OCR',
+    ['source'],
+    buckets=BYTES_BUCKETS
+)
+
+queue_depth = Gauge(
+    'ocr_queue_depth',
+    'Tasks waiting in the broker queue',
+    ['queue']
+)
+queue_drain_rate = Gauge(
+    'ocr_queue_drain_rate',
+    'Estimated tasks completed per second',
+    ['queue']
+)
+queue_estimated_wait = Gauge(
+    'ocr_queue_estimated_wait_seconds',
+    'Estimated wait for a newly queued task',
+    ['queue']
+)
+admission_rejected = Counter(
+    'ocr_admission_rejected_total',
+    'Requests rejected by queue admission control',
+    ['queue']
+)
+rate_limited = Counter(
+    'http_rate_limited_total',
+    'Requests rejected by the rate limiter',
+    ['endpoint', 'scope', 'source']
+)
+sync_ocr_requests = Counter(
+    'ocr_sync_requests_total',
+    'analyze_sync requests by path taken',
+    ['path', 'reason']
+)
+language_detections = Counter(
+    'ocr_language_detections_total',
+    'Tesseract language sets chosen for images',
+    ['languages', 'source']
+)
+text_prefilter_decisions = Counter(
+    'ocr_text_prefilter_total',
+    'Text presence prefilter decisions before OCR',
+    ['decision']
+)
+
+def route_template(app, scope) -> str:
+    """
+    Шаблон маршрута запроса (/api/v1/task_status/{task_id}) вместо пути,
+    чтобы число серий метрик не зависело от идентификаторов в URL
+    """
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return 'unmatched'
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+@contextmanager
+def observe_stage(stage: str):
+    """Замер длительности этапа OCR (metadata, download, decode, preprocess, tesseract, email)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ocr_stage_duration.labels(stage=stage).observe(time.perf_counter() - start)
\ No newline at end of file
@@ -1,17 +1,28 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
-from prometheus_client import make_asgi_app, Counter, Histogram
+from prometheus_client import make_asgi_app
 import time
 
 from .api.routes import router
 from .core.config import settings
 from .core.exception_handlers import app_exception_handler, generic_exception_handler
-from .core.exceptions import AppException
+from .core.exceptions import AppException, RateLimitExceededException
+from .core.metrics import request_count, request_duration, route_template, status_class
 from .services.django_service import DjangoService
 from .services.ocr_service import OCRService
 from .services.email_service import EmailService
+from .services.task_events import TaskEventBroker
+from .services.task_status import TaskStatusService
+from .services.result_store import create_result_store
+from .services.task_dedup import TaskDeduplicator
+from .services.dead_letter import DeadLetterQueue
+from .services.readiness import ReadinessProbe
+from .services.admission import AdmissionController
+from .services.rate_limiter import RateLimiter
+from .services.sync_ocr import SyncOCRExecutor
 
 logging.basicConfig(
     level=logging.INFO if not settings.DEBUG else logging.DEBUG,
@@ -19,9 +30,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-request_count = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint'])
-request_duration = Histogram('http_request_duration_seconds', 'HTTP request duration', ['method', 'endpoint'])
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -31,20 +39,44 @@ async def lifespan(app: FastAPI):
     
     app.state.django_service = DjangoService()
     app.state.ocr_service = OCRService()
+    app.state.sync_ocr = SyncOCRExecutor()
     app.state.email_service = EmailService()
+    app.state.task_events = TaskEventBroker()
+    app.state.result_store = create_result_store()
+    app.state.task_dedup = TaskDeduplicator()
+    app.state.dead_letter = DeadLetterQueue()
+    if settings.RATE_LIMIT_ENABLED:
+        app.state.rate_limiter = RateLimiter()
+    
+    from .tasks.celery_app import celery_app
+    app.state.task_status = TaskStatusService(celery_app.backend)
+    
+    # Брокер и воркеры проверяются в фоне, запуск их не ждет
+    app.state.readiness = ReadinessProbe(celery_app)
+    app.state.readiness.start()
     
-    try:
-        from .tasks.celery_app import celery_app
-        celery_app.control.ping()
-        logger.info("✅ Celery connected successfully")
-    except Exception as e:
-        logger.warning(f"⚠️ Celery connection warning: {str(e)}")
+    if settings.ADMISSION_ENABLED:
+        app.state.admission = AdmissionController()
+        app.state.admission.start()
     
     logger.info("✅ FastAPI OCR Service started successfully")
     
     yield
     
     logger.info("🛑 Shutting down FastAPI OCR Service...")
+    await app.state.readiness.close()
+    if settings.ADMISSION_ENABLED:
+        await app.state.admission.close()
+    await app.state.django_service.close()
+    await app.state.ocr_service.close()
+    await app.state.sync_ocr.close()
+    await app.state.email_service.close()
+    await app.state.task_events.close()
+    await app.state.result_store.close()
+    await app.state.task_dedup.close()
+    await app.state.dead_letter.close()
+    if settings.RATE_LIMIT_ENABLED:
+        await app.state.rate_limiter.close()
     logger.info("👋 FastAPI OCR Service stopped")
 
 def create_app() -> FastAPI:
@@ -68,19 +100,42 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    @app.middleware("http")
+    async def rate_limit_middleware(request, call_next):
+        """
+        Ограничение частоты запросов по API ключу или IP клиента
+        
+        Объявлен до middleware метрик, поэтому отказы 429 попадают в метрики.
+        """
+        rate_limiter = getattr(request.app.state, 'rate_limiter', None)
+        if rate_limiter is not None:
+            endpoint = route_template(request.app, request.scope)
+            retry_after = await rate_limiter.hit(request, endpoint)
+            if retry_after is not None:
+                return await app_exception_handler(request, RateLimitExceededException(retry_after))
+        return await call_next(request)
+    
     @app.middleware("http")
     async def metrics_middleware(request, call_next):
-        """Middleware для сбора метрик"""
-        method = request.method
-        path = request.url.path
+        """
+        Middleware для сбора метрик
         
-        request_count.labels(method=method, endpoint=path).inc()
+        Метки - шаблон маршрута и класс статуса, а не сырой путь:
+        иначе каждый task_id в URL порождает новую серию.
+        """
+        method = request.method
+        endpoint = route_template(request.app, request.scope)
         
         start_time = time.time()
-        response = await call_next(request)
-        duration = time.time() - start_time
-        
-        request_duration.labels(method=method, endpoint=path).observe(duration)
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            duration = time.time() - start_time
+            status = status_class(status_code)
+            request_count.labels(method=method, endpoint=endpoint, status=status).inc()
+            request_duration.labels(method=method, endpoint=endpoint, status=status).observe(duration)
         
         return response
     
@@ -93,13 +148,27 @@ def create_app() -> FastAPI:
     app.add_exception_handler(Exception, generic_exception_handler)
     
     @app.get("/health", tags=["Health"])
-    async def health_check():
+    async def health_check(request: Request):
+        """Живость процесса; результаты фоновых проверок - для информации"""
+        readiness = getattr(request.app.state, 'readiness', None)
         return {
             "status": "healthy",
             "service": "FastAPI OCR Service",
-            "version": "1.0.0"
+            "version": "1.0.0",
+            "checks": readiness.checks if readiness is not None else {}
         }
     
+    @app.get("/ready", tags=["Health"])
+    async def readiness_check(request: Request):
+        """Готовность принимать задачи: 503, пока брокер недоступен"""
+        readiness = getattr(request.app.state, 'readiness', None)
+        if readiness is None:
+            return JSONResponse(status_code=503, content={"status": "starting", "checks": {}})
+        return JSONResponse(
+            status_code=200 if readiness.ready else 503,
+            content=readiness.status()
+        )
+    
     @app.get("/", tags=["Root"])
     async def root():
         return {
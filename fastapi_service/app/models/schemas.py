@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator
 from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional, List
+from ..core.config import settings
 
 class DjangoImageResponse(BaseModel):
     id: UUID
@@ -16,17 +17,127 @@ class OCRRequest(BaseModel):
     image_id: UUID = Field(..., description="ID изображения в Django")
     send_email: bool = Field(True, description="Отправлять ли результат на email")
     email: Optional[EmailStr] = Field(None, description="Email для отправки (если не указан, берется из настроек)")
+    languages: Optional[str] = Field(
+        None,
+        description="Языки Tesseract через '+', например 'rus' (если не указаны, определяются по изображению)"
+    )
+    
+    @field_validator('languages')
+    @classmethod
+    def check_languages(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return value
+        allowed = settings.OCR_LANGUAGES.split('+')
+        if not set(value.split('+')) <= set(allowed):
+            raise ValueError(f"Допустимые языки: {', '.join(allowed)}")
+        return value
 
 class OCRResponse(BaseModel):
     task_id: str = Field(..., description="ID задачи в Celery")
     status: str = Field("processing", description="Статус обработки")
     message: str = Field("Задача поставлена в очередь", description="Сообщение")
+    deduplicated: bool = Field(False, description="Возвращена уже поставленная задача")
+
+class SyncOCRResponse(BaseModel):
+    path: str = Field(..., description="Путь обработки: sync (распознано сразу) или queued (задача в очереди)")
+    reason: Optional[str] = Field(None, description="Почему задача поставлена в очередь: cost, busy или deadline")
+    image_id: Optional[UUID] = None
+    text: Optional[str] = None
+    confidence: Optional[float] = None
+    task_id: Optional[str] = Field(None, description="ID задачи в Celery (для path=queued)")
+
+class BatchOCRRequest(BaseModel):
+    image_ids: List[UUID] = Field(..., min_length=1, description="ID изображений в Django")
+    send_email: bool = Field(True, description="Отправлять ли результаты на email")
+    email: Optional[EmailStr] = Field(None, description="Email для отправки (если не указан, берется из настроек)")
+    notify_on_complete: bool = Field(False, description="Запустить callback после завершения всего пакета")
+
+class BatchOCRResponse(BaseModel):
+    batch_id: str = Field(..., description="ID пакета (GroupResult в Celery)")
+    task_ids: List[str] = Field(default_factory=list, description="ID задач пакета")
+    missing_ids: List[str] = Field(default_factory=list, description="ID изображений, не найденных в Django")
+    status: str = Field("processing", description="Статус обработки")
+    message: str = Field("Пакет поставлен в очередь", description="Сообщение")
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    total: int
+    done: int
+    failed: int
+    pending: int
+    completed: bool
+
+class BulkTaskStatusRequest(BaseModel):
+    task_ids: List[str] = Field(..., min_length=1, description="ID задач в Celery")
+    pending_only: bool = Field(False, description="Возвращать только незавершенные задачи")
+    include_results: bool = Field(False, description="Включать результаты и ошибки завершенных задач")
+
+class TaskStatusItem(BaseModel):
+    state: str
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
+class BulkTaskStatusResponse(BaseModel):
+    tasks: Dict[str, TaskStatusItem]
+
+class OCRLayout(BaseModel):
+    """Колоночная разметка слов: в каждом списке, кроме pages, по элементу на слово"""
+    pages: List[List[int]] = Field(..., description="Ширина и высота каждой страницы")
+    text: List[str]
+    conf: List[int] = Field(..., description="Уверенность Tesseract (-1, если неизвестна)")
+    left: List[int]
+    top: List[int]
+    width: List[int]
+    height: List[int]
+    page_num: List[int] = Field(..., description="Номер страницы, начиная с 1")
+    block: List[int] = Field(..., description="Номер блока")
+    par: List[int] = Field(..., description="Номер абзаца внутри блока")
+    line: List[int] = Field(..., description="Номер строки внутри абзаца")
 
 class OCRResultResponse(BaseModel):
     image_id: UUID
     text: str
     confidence: Optional[float] = None
     processed_at: datetime
+    task_id: Optional[str] = None
+    layout: Optional[OCRLayout] = Field(None, description="Разметка слов (для format=json)")
+
+class OCRResultHistoryResponse(BaseModel):
+    image_id: UUID
+    runs: List[OCRResultResponse]
+
+class DeadLetterTask(BaseModel):
+    task_id: str = Field(..., description="ID упавшей задачи в Celery")
+    task: str
+    queue: str
+    image_id: Optional[str] = None
+    error: str
+    exception: str = Field(..., description="Тип исключения")
+    retries: int = Field(..., description="Число выполненных повторов")
+    retryable: bool = Field(..., description="Временная ли ошибка (False - повторы не выполнялись)")
+    failed_at: datetime
+
+class DeadLetterListResponse(BaseModel):
+    total: int
+    tasks: List[DeadLetterTask]
+
+class DeadLetterReplayRequest(BaseModel):
+    task_ids: Optional[List[str]] = Field(
+        None,
+        min_length=1,
+        max_length=settings.OCR_DEAD_LETTER_REPLAY_MAX,
+        description="ID задач (если не указаны, переотправляются самые старые)"
+    )
+    limit: int = Field(
+        100,
+        ge=1,
+        le=settings.OCR_DEAD_LETTER_REPLAY_MAX,
+        description="Сколько самых старых задач переотправить без task_ids"
+    )
+
+class DeadLetterReplayResponse(BaseModel):
+    replayed: Dict[str, str] = Field(default_factory=dict, description="ID упавшей задачи -> ID новой задачи")
+    missing_ids: List[str] = Field(default_factory=list, description="ID, которых нет в dead-letter очереди")
 
 class EmailRequest(BaseModel):
     to_email: EmailStr
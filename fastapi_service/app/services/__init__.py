@@ -1,5 +1,25 @@
 from .ocr_service import OCRService
 from .email_service import EmailService
 from .django_service import DjangoService
+from .email_digest import EmailDigestService
+from .task_events import TaskEventPublisher, TaskEventBroker
+from .task_status import TaskStatusService
+from .task_dedup import TaskDeduplicator
+from .image_metadata import ImageMetadataCache
+from .readiness import ReadinessProbe
+from .admission import AdmissionController
+from .rate_limiter import RateLimiter
+from .sync_ocr import SyncOCRExecutor
+from .language import LanguageDetector
+from .text_presence import TextPresenceFilter
+from .dead_letter import DeadLetterQueue
+from .result_store import RedisResultStore, SQLiteResultStore, create_result_store
 
-__all__ = ('OCRService', 'EmailService', 'DjangoService')
\ No newline at end of file
+__all__ = (
+    'OCRService', 'EmailService', 'DjangoService', 'EmailDigestService',
+    'TaskEventPublisher', 'TaskEventBroker', 'TaskStatusService',
+    'RedisResultStore', 'SQLiteResultStore', 'create_result_store', 'TaskDeduplicator',
+    'ImageMetadataCache', 'ReadinessProbe', 'AdmissionController',
+    'RateLimiter', 'SyncOCRExecutor', 'LanguageDetector',
+    'TextPresenceFilter', 'DeadLetterQueue'
+)
\ No newline at end of file
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, List, Optional
+import redis.asyncio as redis
+from ..core.config import settings
+from ..core.exceptions import QueueOverloadedException
+from ..core.metrics import queue_depth, queue_drain_rate, queue_estimated_wait, admission_rejected
+
+logger = logging.getLogger(__name__)
+
+# Счетчик выполненных задач очереди, который ведут воркеры (task_postrun)
+DRAINED_KEY_PREFIX = 'ocr:queue_drained:'
+
+class AdmissionController:
+    """
+    Контроль приема задач по глубине очередей Celery.
+    
+    Глубина очереди - LLEN списка брокера, скорость разбора - производная
+    счетчика выполненных задач, сглаженная EWMA. Снимок обновляется в фоне
+    и отдается в метрики; запросы читают последний снимок без обращения к Redis.
+    """
+    
+    def __init__(
+        self,
+        queues: Optional[List[str]] = None,
+        broker_url: str = settings.CELERY_BROKER_URL,
+        max_depth: int = settings.ADMISSION_MAX_QUEUE_DEPTH,
+        max_wait: float = settings.ADMISSION_MAX_WAIT_SECONDS,
+        min_drain_rate: float = settings.ADMISSION_MIN_DRAIN_RATE,
+        sample_interval: float = settings.ADMISSION_SAMPLE_INTERVAL,
+        retry_after_max: int = settings.ADMISSION_RETRY_AFTER_MAX,
+        smoothing: float = 0.3
+    ):
+        self.queues = queues or [settings.OCR_QUEUE_SMALL, settings.OCR_QUEUE_LARGE]
+        self.broker_url = broker_url
+        self.max_depth = max_depth
+        self.max_wait = max_wait
+        self.min_drain_rate = min_drain_rate
+        self.sample_interval = sample_interval
+        self.retry_after_max = retry_after_max
+        self.smoothing = smoothing
+        self.snapshot: Dict[str, dict] = {}
+        self._sampled_at: Optional[float] = None
+        self._counters: Dict[str, tuple] = {}
+        self._rates: Dict[str, float] = {}
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.broker_url, socket_timeout=1, socket_connect_timeout=1)
+        return self._redis
+    
+    def _update_rate(self, queue: str, drained: int, now: float) -> float:
+        """Скорость разбора очереди (задач/с) по приращению счетчика воркеров"""
+        previous = self._counters.get(queue)
+        if previous is None or drained < previous[0]:
+            self._counters[queue] = (drained, now)
+            return self._rates.get(queue, 0.0)
+        
+        prev_drained, prev_time = previous
+        elapsed = now - prev_time
+        # Слишком короткое окно дает шумную оценку - копим приращение
+        if elapsed < max(self.sample_interval, 1.0):
+            return self._rates.get(queue, 0.0)
+        
+        instant = (drained - prev_drained) / elapsed
+        rate = self._rates.get(queue)
+        rate = instant if rate is None else self.smoothing * instant + (1 - self.smoothing) * rate
+        self._rates[queue] = rate
+        self._counters[queue] = (drained, now)
+        return rate
+    
+    async def sample(self) -> Dict[str, dict]:
+        """Чтение глубины очередей и счетчиков одним конвейером Redis"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for queue in self.queues:
+                pipe.llen(queue)
+                pipe.get(f"{DRAINED_KEY_PREFIX}{queue}")
+            values = await pipe.execute()
+        
+        now = time.monotonic()
+        snapshot = {}
+        for index, queue in enumerate(self.queues):
+            depth = int(values[index * 2] or 0)
+            drained = int(values[index * 2 + 1] or 0)
+            rate = self._update_rate(queue, drained, now)
+            wait = depth / max(rate, self.min_drain_rate)
+            snapshot[queue] = {'depth': depth, 'drain_rate': rate, 'estimated_wait': wait}
+            
+            queue_depth.labels(queue=queue).set(depth)
+            queue_drain_rate.labels(queue=queue).set(rate)
+            queue_estimated_wait.labels(queue=queue).set(wait)
+        
+        self.snapshot = snapshot
+        self._sampled_at = now
+        return snapshot
+    
+    async def _loop(self):
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                logger.warning(f"Could not sample queue depth: {str(e)}")
+            await asyncio.sleep(self.sample_interval)
+    
+    def start(self):
+        """Фоновое обновление снимка очередей и метрик"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+    
+    def _retry_after(self, state: dict) -> int:
+        """Через сколько секунд очередь опустится ниже порога при текущей скорости"""
+        rate = max(state['drain_rate'], self.min_drain_rate)
+        allowed_depth = min(self.max_depth, self.max_wait * rate)
+        seconds = math.ceil((state['depth'] - allowed_depth) / rate)
+        return min(max(seconds, 1), self.retry_after_max)
+    
+    async def check(self, queue: str):
+        """
+        Проверка перед постановкой задачи в очередь queue.
+        
+        Поднимает QueueOverloadedException (429 + Retry-After), если
+        глубина или ожидаемое ожидание превышают пороги. При недоступном
+        Redis задача принимается.
+        """
+        stale = self._sampled_at is None or time.monotonic() - self._sampled_at > self.sample_interval * 3
+        if stale:
+            try:
+                await self.sample()
+            except Exception as e:
+                logger.warning(f"Admission control skipped, queue depth unavailable: {str(e)}")
+                return
+        
+        state = self.snapshot.get(queue)
+        if state is None:
+            return
+        if state['depth'] >= self.max_depth or state['estimated_wait'] >= self.max_wait:
+            retry_after = self._retry_after(state)
+            admission_rejected.labels(queue=queue).inc()
+            logger.warning(
+                f"Rejecting task for {queue}: depth {state['depth']}, "
+                f"estimated wait {state['estimated_wait']:.0f}s, retry after {retry_after}s"
+            )
+            raise QueueOverloadedException(queue, retry_after)
+    
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
\ No newline at end of file
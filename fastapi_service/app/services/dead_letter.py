@@ -0,0 +1,111 @@
+import json
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class DeadLetterQueue:
+    """
+    Задачи OCR, завершившиеся ошибкой после последней попытки.
+    
+    Записи (аргументы задачи, очередь, ошибка) хранятся в Redis хэше по
+    task_id, порядок - в sorted set по времени ошибки. Очередь ограничена
+    OCR_DEAD_LETTER_MAX_ITEMS: самые старые записи вытесняются.
+    """
+    
+    ENTRIES_KEY = 'ocr:dead_letter:entries'
+    INDEX_KEY = 'ocr:dead_letter:index'
+    
+    def __init__(self, redis_url: str = settings.REDIS_URL, max_items: int = settings.OCR_DEAD_LETTER_MAX_ITEMS):
+        self.redis_url = redis_url
+        self.max_items = max_items
+        self._redis: Optional[redis.Redis] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+    
+    async def add(
+        self,
+        task_id: str,
+        task: str,
+        queue: str,
+        kwargs: dict,
+        exception: BaseException,
+        retries: int,
+        retryable: bool
+    ) -> bool:
+        """Запись задачи; ошибка Redis не мешает завершить задачу"""
+        entry = {
+            'task_id': task_id,
+            'task': task,
+            'queue': queue,
+            'kwargs': kwargs,
+            'error': str(exception),
+            'exception': type(exception).__name__,
+            'retries': retries,
+            'retryable': retryable,
+            'failed_at': datetime.now(timezone.utc).isoformat()
+        }
+        try:
+            count = await self._put(entry)
+            if self.max_items and count > self.max_items:
+                await self.pop(await self.oldest(count - self.max_items))
+            return True
+        except Exception as e:
+            logger.error(f"Could not dead-letter task {task_id}: {str(e)}")
+            return False
+    
+    async def list(self, limit: int = 100, offset: int = 0) -> Tuple[int, List[dict]]:
+        """Число записей и страница записей, новые первыми"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zcard(self.INDEX_KEY)
+            pipe.zrevrange(self.INDEX_KEY, offset, offset + limit - 1)
+            total, task_ids = await pipe.execute()
+        if not task_ids:
+            return total, []
+        items = await self.redis.hmget(self.ENTRIES_KEY, task_ids)
+        return total, [json.loads(item) for item in items if item is not None]
+    
+    async def oldest(self, limit: int) -> List[str]:
+        """ID самых старых записей"""
+        return await self.redis.zrange(self.INDEX_KEY, 0, limit - 1)
+    
+    async def pop(self, task_ids: Sequence[str]) -> List[dict]:
+        """
+        Атомарное извлечение записей по ID.
+        
+        Запись достается только одному из одновременных вызовов, поэтому
+        задача не переотправляется дважды.
+        """
+        if not task_ids:
+            return []
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hmget(self.ENTRIES_KEY, task_ids)
+            pipe.hdel(self.ENTRIES_KEY, *task_ids)
+            pipe.zrem(self.INDEX_KEY, *task_ids)
+            items, _, _ = await pipe.execute()
+        return [json.loads(item) for item in items if item is not None]
+    
+    async def restore(self, entry: dict):
+        """Возврат извлеченной записи на прежнее место (если переотправить задачу не удалось)"""
+        await self._put(entry)
+    
+    async def _put(self, entry: dict) -> int:
+        failed_at = datetime.fromisoformat(entry['failed_at']).timestamp()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.ENTRIES_KEY, entry['task_id'], json.dumps(entry, default=str))
+            pipe.zadd(self.INDEX_KEY, {entry['task_id']: failed_at})
+            pipe.zcard(self.INDEX_KEY)
+            _, _, count = await pipe.execute()
+        return count
+    
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
\ No newline at end of file
@@ -1,34 +1,99 @@
 import httpx
 from uuid import UUID
+from typing import Dict, Iterable, List, Optional, Tuple
 import logging
 from ..core.config import settings
 from ..core.exceptions import DjangoAPIException, ImageNotFoundException
+from .image_metadata import ImageMetadataCache
+from ..core.metrics import observe_stage
 
 logger = logging.getLogger(__name__)
 
 class DjangoService:
-    """Сервис для взаимодействия с Django API"""
+    """
+    Сервис для взаимодействия с Django API
     
-    def __init__(self, base_url: str = settings.DJANGO_API_URL):
+    Метаданные изображений сначала читаются из Redis, куда их пишет Django;
+    HTTP запрос выполняется только при промахе кэша.
+    """
+    
+    def __init__(
+        self,
+        base_url: str = settings.DJANGO_API_URL,
+        metadata_cache: Optional[ImageMetadataCache] = None
+    ):
         self.base_url = base_url
         self.timeout = settings.DJANGO_API_TIMEOUT
+        if metadata_cache is None and settings.IMAGE_METADATA_CACHE_ENABLED:
+            metadata_cache = ImageMetadataCache()
+        self.metadata_cache = metadata_cache
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Переиспользуемый HTTP клиент с пулом соединений"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+    
+    async def close(self):
+        """Закрытие пула соединений"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self.metadata_cache is not None:
+            await self.metadata_cache.close()
+    
+    async def _cached(self, image_ids: List[str]) -> Dict[str, Optional[dict]]:
+        """Чтение метаданных из кэша; недоступный Redis считается промахом"""
+        if self.metadata_cache is None:
+            return {}
+        try:
+            return await self.metadata_cache.get_many(image_ids)
+        except Exception as e:
+            logger.warning(f"Image metadata cache unavailable: {str(e)}")
+            return {}
+    
+    async def _remember(self, found: Dict[str, dict], missing: List[str]):
+        """Заполнение кэша результатами HTTP запросов"""
+        if self.metadata_cache is None:
+            return
+        try:
+            for image_id, data in found.items():
+                await self.metadata_cache.set(image_id, data)
+            await self.metadata_cache.set_missing(missing)
+        except Exception as e:
+            logger.warning(f"Could not fill image metadata cache: {str(e)}")
     
     async def get_image(self, image_id: UUID) -> dict:
-        """Получение информации об изображении из Django"""
+        """Получение информации об изображении (кэш, затем Django)"""
+        with observe_stage('metadata'):
+            return await self._get_image(image_id)
+    
+    async def _get_image(self, image_id: UUID) -> dict:
+        cached = await self._cached([str(image_id)])
+        if str(image_id) in cached:
+            data = cached[str(image_id)]
+            if data is None:
+                raise ImageNotFoundException(str(image_id))
+            logger.debug(f"Image {image_id} metadata served from cache")
+            return data
+        
         url = f"{self.base_url}/images/{image_id}/api-data/"
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    logger.info(f"Successfully retrieved image {image_id}")
-                    return data
-                elif response.status_code == 404:
-                    raise ImageNotFoundException(str(image_id))
-                else:
-                    raise DjangoAPIException(f"Django API error: {response.status_code}")
+            response = await self.client.get(url)
+            
+            if response.status_code == 200:
+                data = response.json()
+                logger.info(f"Successfully retrieved image {image_id}")
+                await self._remember({str(image_id): data}, [])
+                return data
+            elif response.status_code == 404:
+                await self._remember({}, [str(image_id)])
+                raise ImageNotFoundException(str(image_id))
+            else:
+                raise DjangoAPIException(f"Django API error: {response.status_code}")
         except httpx.TimeoutException:
             raise DjangoAPIException("Timeout connecting to Django API")
         except httpx.RequestError as e:
@@ -37,4 +102,50 @@ class DjangoService:
     async def get_image_url(self, image_id: UUID) -> str:
         """Получение URL изображения"""
         data = await self.get_image(image_id)
-        return data.get('image_url')
\ No newline at end of file
+        return data.get('image_url')
+    
+    async def get_images(self, image_ids: Iterable[UUID], chunk_size: int = 500) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Пакетное получение информации об изображениях.
+        
+        Возвращает словарь найденных изображений по ID и список отсутствующих ID.
+        """
+        url = f"{self.base_url}/images/api-data/bulk/"
+        ids = [str(image_id) for image_id in image_ids]
+        found: Dict[str, dict] = {}
+        missing: List[str] = []
+        
+        cached = await self._cached(ids)
+        for image_id, data in cached.items():
+            if data is None:
+                missing.append(image_id)
+            else:
+                found[image_id] = data
+        ids = [image_id for image_id in ids if image_id not in cached]
+        fetched: Dict[str, dict] = {}
+        fetched_missing: List[str] = []
+        
+        try:
+            for start in range(0, len(ids), chunk_size):
+                response = await self.client.post(url, json={'ids': ids[start:start + chunk_size]})
+                
+                if response.status_code != 200:
+                    raise DjangoAPIException(f"Django API error: {response.status_code}")
+                
+                data = response.json()
+                fetched.update(data.get('images', {}))
+                fetched_missing.extend(data.get('missing', []))
+        except httpx.TimeoutException:
+            raise DjangoAPIException("Timeout connecting to Django API")
+        except httpx.RequestError as e:
+            raise DjangoAPIException(f"Failed to connect to Django API: {str(e)}")
+        
+        await self._remember(fetched, fetched_missing)
+        found.update(fetched)
+        missing.extend(fetched_missing)
+        
+        logger.info(
+            f"Successfully retrieved {len(found)} images ({len(missing)} missing, "
+            f"{len(cached)} from cache)"
+        )
+        return found, missing
\ No newline at end of file
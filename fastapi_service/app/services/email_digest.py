@@ -0,0 +1,54 @@
+import json
+import logging
+from typing import List, Optional
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class EmailDigestService:
+    """
+    Накопление результатов OCR для писем-дайджестов.
+    
+    Результаты складываются в Redis список по получателю и забираются
+    целиком при отправке дайджеста.
+    """
+    
+    KEY_PREFIX = 'ocr:email_digest:'
+    
+    def __init__(self, redis_url: str = settings.REDIS_URL):
+        self.redis_url = redis_url
+        self._redis: Optional[redis.Redis] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+    
+    def _key(self, to_email: str) -> str:
+        return f"{self.KEY_PREFIX}{to_email.lower()}"
+    
+    async def add(self, to_email: str, result: dict) -> int:
+        """Добавление результата; возвращает число накопленных результатов"""
+        key = self._key(to_email)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, json.dumps(result))
+            # Страховка на случай, если задача отправки дайджеста потеряется
+            pipe.expire(key, settings.EMAIL_DIGEST_WINDOW * 10)
+            count, _ = await pipe.execute()
+        return count
+    
+    async def pop_all(self, to_email: str) -> List[dict]:
+        """Атомарное извлечение всех накопленных результатов"""
+        key = self._key(to_email)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.delete(key)
+            items, _ = await pipe.execute()
+        return [json.loads(item) for item in items]
+    
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
\ No newline at end of file
@@ -1,11 +1,14 @@
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import aiosmtplib
 from typing import Optional, List
-from jinja2 import Template
 from ..core.config import settings
 from ..core.exceptions import EmailSendingException
+from .smtp_pool import SMTPConnectionPool
+from ..core.metrics import observe_stage
+from ..core.lazy import lazy_import
+
+jinja2 = lazy_import('jinja2')
 
 logger = logging.getLogger(__name__)
 
@@ -31,26 +34,32 @@ EMAIL_TEMPLATE = """
         </div>
         <div class="content">
             <p>Здравствуйте!</p>
+            {% if results|length > 1 %}
+            <p>Ваши изображения ({{ results|length }}) были успешно проанализированы.</p>
+            {% else %}
             <p>Ваше изображение было успешно проанализировано.</p>
+            {% endif %}
             
+            {% for result in results %}
             <div class="image-info">
                 <h3>Информация об изображении:</h3>
-                <p><strong>Название:</strong> {{ image_title }}</p>
-                <p><strong>ID:</strong> {{ image_id }}</p>
-                <p><strong>Дата загрузки:</strong> {{ uploaded_at }}</p>
-                <p><strong>Размер:</strong> {{ size }} байт</p>
-                <p><strong>Разрешение:</strong> {{ width }}x{{ height }}</p>
-                <p><strong>Формат:</strong> {{ format }}</p>
+                <p><strong>Название:</strong> {{ result.image_title }}</p>
+                <p><strong>ID:</strong> {{ result.image_id }}</p>
+                <p><strong>Дата загрузки:</strong> {{ result.uploaded_at }}</p>
+                <p><strong>Размер:</strong> {{ result.size }} байт</p>
+                <p><strong>Разрешение:</strong> {{ result.width }}x{{ result.height }}</p>
+                <p><strong>Формат:</strong> {{ result.format }}</p>
             </div>
             
             <h3>Распознанный текст:</h3>
             <div class="ocr-text">
-                {{ ocr_text }}
+                {{ result.ocr_text }}
             </div>
             
-            {% if confidence %}
-            <p><strong>Уверенность распознавания:</strong> {{ confidence }}%</p>
+            {% if result.confidence %}
+            <p><strong>Уверенность распознавания:</strong> {{ result.confidence }}%</p>
             {% endif %}
+            {% endfor %}
         </div>
         <div class="footer">
             <p>Это автоматическое сообщение, пожалуйста, не отвечайте на него.</p>
@@ -71,10 +80,27 @@ class EmailService:
         self.username = settings.EMAIL_HOST_USER
         self.password = settings.EMAIL_HOST_PASSWORD
         self.from_email = settings.DEFAULT_FROM_EMAIL
-        self.template = Template(EMAIL_TEMPLATE)
+        self._template = None
+        self.pool = SMTPConnectionPool(
+            host=self.host,
+            port=self.port,
+            use_tls=self.use_tls,
+            username=self.username,
+            password=self.password,
+            max_size=settings.EMAIL_POOL_SIZE,
+            healthcheck_interval=settings.EMAIL_POOL_HEALTHCHECK_INTERVAL,
+            max_idle=settings.EMAIL_POOL_MAX_IDLE
+        )
         
         logger.info(f"Email Service initialized with host: {self.host}")
     
+    @property
+    def template(self):
+        """Шаблон письма (компилируется при первой отправке)"""
+        if self._template is None:
+            self._template = jinja2.Template(EMAIL_TEMPLATE)
+        return self._template
+    
     async def send_ocr_result(
         self,
         to_email: str,
@@ -86,20 +112,9 @@ class EmailService:
         Отправка результатов OCR на email
         """
         try:
-            context = {
-                'image_title': image_data.get('title', 'Без названия'),
-                'image_id': str(image_data.get('id', '')),
-                'uploaded_at': image_data.get('uploaded_at', ''),
-                'size': image_data.get('size', 0),
-                'width': image_data.get('width', 0),
-                'height': image_data.get('height', 0),
-                'format': image_data.get('format', ''),
-                'ocr_text': ocr_text,
-                'confidence': confidence,
-                'year': '2026'
-            }
-            
-            html_content = self.template.render(**context)
+            context = self._result_context(image_data, ocr_text, confidence)
+            
+            html_content = self.template.render(results=[context], year='2026')
             
             message = MIMEMultipart('alternative')
             message['From'] = self.from_email
@@ -125,6 +140,47 @@ class EmailService:
             logger.error(f"❌ Failed to send email: {str(e)}")
             raise EmailSendingException(f"Failed to send email: {str(e)}")
     
+    async def send_ocr_digest(self, to_email: str, results: List[dict]) -> bool:
+        """
+        Отправка нескольких результатов OCR одним письмом
+        
+        Каждый элемент results содержит image_data, ocr_text и confidence.
+        """
+        try:
+            contexts = [
+                self._result_context(r.get('image_data', {}), r.get('ocr_text', ''), r.get('confidence'))
+                for r in results
+            ]
+            
+            html_content = self.template.render(results=contexts, year='2026')
+            
+            message = MIMEMultipart('alternative')
+            message['From'] = self.from_email
+            message['To'] = to_email
+            message['Subject'] = f"Результаты OCR для {len(contexts)} изображений"
+            
+            text_part = MIMEText(
+                "\n\n".join(
+                    f"Результаты OCR для изображения {c['image_title']}\n\n"
+                    f"Распознанный текст:\n{c['ocr_text']}"
+                    for c in contexts
+                ),
+                'plain'
+            )
+            message.attach(text_part)
+            
+            html_part = MIMEText(html_content, 'html')
+            message.attach(html_part)
+            
+            await self._send_email(message)
+            
+            logger.info(f"✅ OCR digest with {len(contexts)} results sent to {to_email}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to send digest: {str(e)}")
+            raise EmailSendingException(f"Failed to send digest: {str(e)}")
+    
     async def send_notification(
         self,
         to_email: str,
@@ -149,25 +205,31 @@ class EmailService:
             logger.error(f"❌ Failed to send notification: {str(e)}")
             raise EmailSendingException(f"Failed to send notification: {str(e)}")
     
+    def _result_context(self, image_data: dict, ocr_text: str, confidence: Optional[float]) -> dict:
+        """Данные одного результата OCR для шаблона письма"""
+        return {
+            'image_title': image_data.get('title', 'Без названия'),
+            'image_id': str(image_data.get('id', '')),
+            'uploaded_at': image_data.get('uploaded_at', ''),
+            'size': image_data.get('size', 0),
+            'width': image_data.get('width', 0),
+            'height': image_data.get('height', 0),
+            'format': image_data.get('format', ''),
+            'ocr_text': ocr_text,
+            'confidence': confidence
+        }
+    
     async def _send_email(self, message: MIMEMultipart):
         """
-        Внутренний метод для отправки email через SMTP
+        Внутренний метод для отправки email через пул SMTP соединений
         """
         try:
-            smtp = aiosmtplib.SMTP(
-                hostname=self.host,
-                port=self.port,
-                use_tls=self.use_tls
-            )
-            
-            await smtp.connect()
-            
-            if self.username and self.password:
-                await smtp.login(self.username, self.password)
-            
-            await smtp.send_message(message)
-            await smtp.quit()
-            
+            with observe_stage('email'):
+                await self.pool.send_message(message)
         except Exception as e:
             logger.error(f"SMTP error: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    async def close(self):
+        """Закрытие SMTP соединений пула"""
+        await self.pool.close()
\ No newline at end of file
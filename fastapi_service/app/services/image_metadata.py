@@ -0,0 +1,90 @@
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urljoin, urlsplit
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Отметка "изображения нет" для отрицательного кэширования 404
+MISSING = 'null'
+
+class ImageMetadataCache:
+    """
+    Метаданные изображений в Redis, общем с Django.
+    
+    Django записывает компактную запись при сохранении изображения и
+    удаляет ее при удалении. URL файла в записи относительный и
+    достраивается по адресу Django.
+    """
+    
+    def __init__(
+        self,
+        redis_url: str = settings.REDIS_URL,
+        key_prefix: str = settings.IMAGE_METADATA_KEY_PREFIX,
+        ttl: int = settings.IMAGE_METADATA_TTL,
+        negative_ttl: int = settings.IMAGE_METADATA_NEGATIVE_TTL,
+        media_base_url: Optional[str] = settings.DJANGO_MEDIA_BASE_URL
+    ):
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        if media_base_url is None:
+            parts = urlsplit(settings.DJANGO_API_URL)
+            media_base_url = f"{parts.scheme}://{parts.netloc}"
+        self.media_base_url = media_base_url
+        self._redis: Optional[redis.Redis] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+    
+    def _key(self, image_id: str) -> str:
+        return f"{self.key_prefix}{image_id}"
+    
+    def _decode(self, raw: str) -> dict:
+        data = json.loads(raw)
+        if data.get('image_url'):
+            data['image_url'] = urljoin(self.media_base_url, data['image_url'])
+        return data
+    
+    async def get_many(self, image_ids: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """
+        Чтение записей одним MGET.
+        
+        В результат попадают только найденные в кэше ID: словарь
+        метаданных или None для изображения, отмеченного отсутствующим.
+        """
+        ids = [str(image_id) for image_id in image_ids]
+        if not ids:
+            return {}
+        values = await self.redis.mget([self._key(image_id) for image_id in ids])
+        
+        cached: Dict[str, Optional[dict]] = {}
+        for image_id, raw in zip(ids, values):
+            if raw is None:
+                continue
+            cached[image_id] = None if raw == MISSING else self._decode(raw)
+        return cached
+    
+    async def set(self, image_id: str, data: dict):
+        """Заполнение кэша данными, полученными по HTTP (запись Django не перезаписывается)"""
+        await self.redis.set(self._key(image_id), json.dumps(data), ex=self.ttl, nx=True)
+    
+    async def set_missing(self, image_ids: List[str]):
+        """Отрицательное кэширование отсутствующих изображений"""
+        if not image_ids:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for image_id in image_ids:
+                pipe.set(self._key(image_id), MISSING, ex=self.negative_ttl, nx=True)
+            await pipe.execute()
+    
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
\ No newline at end of file
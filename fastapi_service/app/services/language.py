@@ -0,0 +1,106 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import math
+from typing import Dict, Optional
+import redis.asyncio as redis
+from ..core.config import settings
+from ..core.lazy import lazy_import
+from ..core.metrics import language_detections
+
+pytesseract = lazy_import('pytesseract')
+Image = lazy_import('PIL.Image')
+
+logger = logging.getLogger(__name__)
+
+class LanguageDetector:
+    """
+    Выбор языковых пакетов Tesseract для изображения.
+    
+    Письменность определяется Tesseract OSD на уменьшенной копии
+    изображения и сопоставляется с языками (Cyrillic -> rus, Latin -> eng).
+    Если OSD не уверен или не нашел текста, используется полный набор
+    OCR_LANGUAGES. Результат кэшируется в Redis по хэшу уменьшенной копии.
+    """
+    
+    KEY_PREFIX = 'ocr:lang:'
+    
+    def __init__(
+        self,
+        redis_url: str = settings.REDIS_URL,
+        default_languages: str = settings.OCR_LANGUAGES,
+        script_languages: Optional[Dict[str, str]] = None,
+        sample_side: int = settings.OCR_LANGUAGE_SAMPLE_SIDE,
+        min_confidence: float = settings.OCR_LANGUAGE_MIN_CONFIDENCE,
+        cache_ttl: int = settings.OCR_LANGUAGE_CACHE_TTL,
+        tesseract_cmd: str = settings.TESSERACT_CMD
+    ):
+        self.redis_url = redis_url
+        self.default_languages = default_languages
+        self.script_languages = script_languages if script_languages is not None else settings.OCR_SCRIPT_LANGUAGES
+        self.sample_side = sample_side
+        self.min_confidence = min_confidence
+        self.cache_ttl = cache_ttl
+        self.tesseract_cmd = tesseract_cmd
+        self._redis: Optional[redis.Redis] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+    
+    def _sample(self, image: Image.Image) -> Image.Image:
+        """Уменьшенная копия в оттенках серого (не больше sample_side по длинной стороне)"""
+        factor = math.ceil(max(image.size) / self.sample_side)
+        sample = image.reduce(factor) if factor > 1 else image
+        return sample.convert('L')
+    
+    def _osd(self, sample: Image.Image) -> Optional[str]:
+        """Языки по письменности, найденной OSD (None, если письменность не определена)"""
+        pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+        try:
+            osd = pytesseract.image_to_osd(sample, config='--psm 0', output_type=pytesseract.Output.DICT)
+        except Exception as e:
+            logger.debug(f"OSD failed: {str(e)}")
+            return None
+        if float(osd.get('script_conf') or 0) < self.min_confidence:
+            return None
+        return self.script_languages.get(osd.get('script'))
+    
+    async def detect(self, image: Image.Image) -> str:
+        """Языковые пакеты для распознавания изображения, например 'rus' или 'rus+eng'"""
+        try:
+            sample = await asyncio.to_thread(self._sample, image)
+            key = f"{self.KEY_PREFIX}{hashlib.sha1(sample.tobytes()).hexdigest()}"
+        except Exception as e:
+            logger.warning(f"Language detection skipped: {str(e)}")
+            return self.default_languages
+        
+        try:
+            cached = await self.redis.get(key)
+        except Exception as e:
+            logger.warning(f"Language cache unavailable: {str(e)}")
+            cached = None
+        if cached:
+            language_detections.labels(languages=cached, source='cache').inc()
+            return cached
+        
+        languages = await asyncio.to_thread(self._osd, sample)
+        source = 'osd'
+        if languages is None:
+            languages = self.default_languages
+            source = 'fallback'
+        language_detections.labels(languages=languages, source=source).inc()
+        
+        try:
+            await self.redis.set(key, languages, ex=self.cache_ttl)
+        except Exception as e:
+            logger.warning(f"Could not cache detected languages: {str(e)}")
+        return languages
+    
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
\ No newline at end of file
@@ -0,0 +1,165 @@
+from html import escape
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Колонки разметки: по значению на каждое распознанное слово
+WORD_FIELDS = ('text', 'conf', 'left', 'top', 'width', 'height', 'page_num', 'block', 'par', 'line')
+
+TSV_HEADER = 'level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext'
+
+HOCR_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">
+<head>
+<title></title>
+<meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>
+<meta name="ocr-system" content="tesseract"/>
+<meta name="ocr-capabilities" content="ocr_page ocr_carea ocr_par ocr_line ocrx_word"/>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+def _conf(value) -> int:
+    try:
+        return int(float(value))
+    except (ValueError, TypeError):
+        return -1
+
+def empty_layout(size: Iterable[int]) -> Dict[str, list]:
+    """Разметка одной страницы без слов (pages - размеры страниц)"""
+    return {'pages': [list(size)], **{field: [] for field in WORD_FIELDS}}
+
+def words_layout(data: Dict, size: Iterable[int], offset_top: int = 0) -> Dict[str, list]:
+    """
+    Колоночная разметка слов из результата image_to_data.
+    
+    Пустые элементы (страница, блоки, строки без текста) отбрасываются:
+    структура блоков и строк хранится номерами у каждого слова.
+    """
+    layout = empty_layout(size)
+    for i, text in enumerate(data['text']):
+        if not text.strip():
+            continue
+        layout['text'].append(text)
+        layout['conf'].append(_conf(data['conf'][i]))
+        layout['left'].append(int(data['left'][i]))
+        layout['top'].append(offset_top + int(data['top'][i]))
+        layout['width'].append(int(data['width'][i]))
+        layout['height'].append(int(data['height'][i]))
+        layout['page_num'].append(1)
+        layout['block'].append(int(data['block_num'][i]))
+        layout['par'].append(int(data['par_num'][i]))
+        layout['line'].append(int(data['line_num'][i]))
+    return layout
+
+def merge_layouts(
+    layouts: List[Dict[str, list]],
+    size: Iterable[int],
+    keep: Optional[List[Callable[[int], bool]]] = None
+) -> Dict[str, list]:
+    """
+    Склейка разметки полос в разметку страницы.
+    
+    keep[i] отбирает слова i-й полосы по центру по Y; номера блоков
+    сдвигаются, чтобы блоки разных полос не совпадали.
+    """
+    merged = empty_layout(size)
+    block_offset = 0
+    for index, layout in enumerate(layouts):
+        for i in range(len(layout['text'])):
+            if keep is not None and not keep[index](layout['top'][i] + layout['height'][i] // 2):
+                continue
+            for field in WORD_FIELDS:
+                merged[field].append(layout[field][i])
+            merged['block'][-1] += block_offset
+        block_offset += max(layout['block'], default=0)
+    return merged
+
+def join_pages(layouts: List[Dict[str, list]]) -> Dict[str, list]:
+    """Разметка многостраничного документа из разметок страниц в порядке страниц"""
+    joined = {'pages': [], **{field: [] for field in WORD_FIELDS}}
+    for layout in layouts:
+        offset = len(joined['pages'])
+        joined['pages'].extend(layout['pages'])
+        for field in WORD_FIELDS:
+            if field == 'page_num':
+                joined[field].extend(offset + page for page in layout[field])
+            else:
+                joined[field].extend(layout[field])
+    return joined
+
+def summarize(layout: Dict[str, list]) -> Dict:
+    """Текст через пробел и средняя уверенность по словам с conf > 0"""
+    confidences = [conf for conf in layout['conf'] if conf > 0]
+    avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+    return {
+        'text': ' '.join(layout['text']),
+        'confidence': round(avg_confidence, 2)
+    }
+
+def _structure(layout: Dict[str, list]) -> Dict[int, Dict[int, Dict[int, Dict[int, List[int]]]]]:
+    """Индексы слов по страницам, блокам, абзацам и строкам в порядке чтения"""
+    pages: Dict[int, Dict[int, Dict[int, Dict[int, List[int]]]]] = {
+        page: {} for page in range(1, len(layout['pages']) + 1)
+    }
+    for i in range(len(layout['text'])):
+        pars = pages[layout['page_num'][i]].setdefault(layout['block'][i], {})
+        lines = pars.setdefault(layout['par'][i], {})
+        lines.setdefault(layout['line'][i], []).append(i)
+    return pages
+
+def _bbox(layout: Dict[str, list], indexes: List[int]) -> str:
+    left = min(layout['left'][i] for i in indexes)
+    top = min(layout['top'][i] for i in indexes)
+    right = max(layout['left'][i] + layout['width'][i] for i in indexes)
+    bottom = max(layout['top'][i] + layout['height'][i] for i in indexes)
+    return f"bbox {left} {top} {right} {bottom}"
+
+def to_tsv(layout: Dict[str, list]) -> str:
+    """Разметка в формате TSV tesseract (строки уровня слов)"""
+    rows = [TSV_HEADER]
+    for page, blocks in _structure(layout).items():
+        for block, pars in blocks.items():
+            for par, lines in pars.items():
+                for line, indexes in lines.items():
+                    for word_num, i in enumerate(indexes, start=1):
+                        rows.append('\t'.join(str(value) for value in (
+                            5, page, block, par, line, word_num,
+                            layout['left'][i], layout['top'][i], layout['width'][i], layout['height'][i],
+                            layout['conf'][i], layout['text'][i]
+                        )))
+    return '\n'.join(rows) + '\n'
+
+def to_hocr(layout: Dict[str, list]) -> str:
+    """Разметка в формате hOCR (ocr_page на каждую страницу)"""
+    parts = []
+    for page, blocks in _structure(layout).items():
+        width, height = layout['pages'][page - 1]
+        parts.append(f"<div class='ocr_page' id='page_{page}' title='bbox 0 0 {width} {height}; ppageno {page - 1}'>")
+        par_id = line_id = word_id = 0
+        for block, pars in blocks.items():
+            block_indexes = [i for lines in pars.values() for indexes in lines.values() for i in indexes]
+            parts.append(f"<div class='ocr_carea' id='block_{page}_{block}' title='{_bbox(layout, block_indexes)}'>")
+            for lines in pars.values():
+                par_id += 1
+                par_indexes = [i for indexes in lines.values() for i in indexes]
+                parts.append(f"<p class='ocr_par' id='par_{page}_{par_id}' title='{_bbox(layout, par_indexes)}'>")
+                for indexes in lines.values():
+                    line_id += 1
+                    words = []
+                    for i in indexes:
+                        word_id += 1
+                        words.append(
+                            f"<span class='ocrx_word' id='word_{page}_{word_id}' "
+                            f"title='{_bbox(layout, [i])}; x_wconf {layout['conf'][i]}'>{escape(layout['text'][i])}</span>"
+                        )
+                    parts.append(
+                        f"<span class='ocr_line' id='line_{page}_{line_id}' title='{_bbox(layout, indexes)}'>"
+                        + ' '.join(words) + "</span>"
+                    )
+                parts.append("</p>")
+            parts.append("</div>")
+        parts.append("</div>")
+    return HOCR_TEMPLATE.format(body='\n'.join(parts))
\ No newline at end of file
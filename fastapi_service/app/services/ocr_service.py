@@ -1,74 +1,396 @@
-import pytesseract
-from PIL import Image
+from __future__ import annotations
 import httpx
 import io
+import math
+import os
+import mmap
+from pathlib import Path
+import asyncio
 import logging
-from typing import Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional, Dict, List, Tuple
 from ..core.config import settings
-from ..core.exceptions import OCRProcessingException
+from ..core.exceptions import OCRProcessingException, ImageTooLargeException
+from ..core.metrics import observe_stage, ocr_download_bytes
+from ..core.lazy import lazy_import, load_lazy_modules
+from .ocr_layout import words_layout, merge_layouts, join_pages, empty_layout, summarize
+
+# Загружаются при первом распознавании, а не при импорте приложения
+pytesseract = lazy_import('pytesseract')
+Image = lazy_import('PIL.Image')
+ImageSequence = lazy_import('PIL.ImageSequence')
 
 logger = logging.getLogger(__name__)
 
+def tesseract_config(languages: str) -> str:
+    """Параметры tesseract с набором языков вида 'rus+eng'"""
+    return f'--oem 3 --psm 6 -l {languages}'
+
+def count_pages(image: Image.Image) -> int:
+    """Количество страниц (кадров) многостраничного TIFF, GIF или WebP"""
+    return int(getattr(image, 'n_frames', 1))
+
+def _split_into_bands(height: int, band_height: int, overlap: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Разбиение высоты изображения на перекрывающиеся горизонтальные полосы.
+    
+    Возвращает кортежи (top, bottom, own_top, own_bottom): границы полосы
+    и зона, которой полоса "владеет" при склейке (граница проходит
+    по середине перекрытия).
+    """
+    step = max(band_height - overlap, 1)
+    tops = list(range(0, max(height - overlap, 1), step))
+    
+    bands = []
+    for index, top in enumerate(tops):
+        bottom = min(top + band_height, height)
+        own_top = 0 if index == 0 else top + overlap // 2
+        own_bottom = height if index == len(tops) - 1 else tops[index + 1] + overlap // 2
+        bands.append((top, bottom, own_top, own_bottom))
+    return bands
+
+def _ocr_band(band: Image.Image, top: int, tesseract_cmd: str, config: str) -> Dict[str, list]:
+    """
+    Распознавание одной полосы или страницы.
+    
+    Каждый вызов запускает отдельный процесс tesseract, поэтому полосы
+    выполняются параллельно даже из потоков пула.
+    Возвращает разметку слов полосы в координатах всего изображения.
+    """
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    data = pytesseract.image_to_data(band, config=config, output_type=pytesseract.Output.DICT)
+    return words_layout(data, band.size, offset_top=top)
+
+def _recognize(image: Image.Image, tesseract_cmd: str, languages: str) -> Dict:
+    """Текст, уверенность и разметка слов за один проход image_to_data"""
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    data = pytesseract.image_to_data(image, config=tesseract_config(languages), output_type=pytesseract.Output.DICT)
+    layout = words_layout(data, image.size)
+    return {**summarize(layout), 'layout': layout}
+
+def recognize_image_bytes(data: bytes, tesseract_cmd: str, languages: str = settings.OCR_LANGUAGES) -> Dict:
+    """
+    Распознавание изображения из байтов целиком в текущем процессе.
+    
+    Функция уровня модуля, чтобы ее можно было выполнять в пуле процессов.
+    Страницы многостраничного изображения распознаются по очереди.
+    """
+    image = Image.open(io.BytesIO(data))
+    layout = join_pages([
+        _recognize(page, tesseract_cmd, languages)['layout'] for page in ImageSequence.Iterator(image)
+    ])
+    return {**summarize(layout), 'layout': layout}
+
 class OCRService:
     """Сервис для распознавания текста на изображениях"""
     
     def __init__(self, tesseract_cmd: str = settings.TESSERACT_CMD):
-        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        self.tesseract_cmd = tesseract_cmd
+        self.tile_threshold = settings.OCR_TILE_THRESHOLD_PIXELS
+        self.band_height = settings.OCR_TILE_BAND_HEIGHT
+        self.band_overlap = settings.OCR_TILE_OVERLAP
+        self.media_root = settings.MEDIA_ROOT
+        self.max_download_bytes = settings.OCR_MAX_DOWNLOAD_BYTES
+        self.decode_max_side = settings.OCR_DECODE_MAX_SIDE
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._client: Optional[httpx.AsyncClient] = None
         logger.info(f"OCR Service initialized with tesseract: {tesseract_cmd}")
     
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Пул для параллельного запуска tesseract (создается при первом обращении)"""
+        if self._executor is None:
+            # Потоки пула не должны впервые обращаться к отложенным модулям одновременно
+            load_lazy_modules('pytesseract', 'PIL.Image', 'PIL.ImageSequence')
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.OCR_MAX_WORKERS,
+                thread_name_prefix='ocr'
+            )
+        return self._executor
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Переиспользуемый HTTP клиент для загрузки изображений"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient()
+        return self._client
+    
+    async def close(self):
+        """Освобождение HTTP клиента и пула потоков"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    def _should_tile(self, image: Image.Image) -> bool:
+        """Нужно ли разбивать изображение на полосы"""
+        width, height = image.size
+        return width * height > self.tile_threshold and height > self.band_height
+    
     async def extract_text_from_url(self, image_url: str) -> str:
         """Извлечение текста из изображения по URL"""
+        image = await self.download_image(image_url)
+        result = await self.recognize_with_confidence(image)
+        return result['text']
+    
+    async def _extract_tiled(self, image: Image.Image, languages: str = settings.OCR_LANGUAGES) -> Dict:
+        """
+        Распознавание большого изображения по горизонтальным полосам.
+        
+        Полосы распознаются параллельно, слова из зоны перекрытия
+        берутся только из полосы, которой эта зона принадлежит, а
+        уверенность усредняется по всем словам. Разметка полос
+        склеивается в разметку всего изображения.
+        """
+        width, height = image.size
+        bands = _split_into_bands(height, self.band_height, self.band_overlap)
+        logger.info(f"Tiling {width}x{height} image into {len(bands)} bands")
+        
+        loop = asyncio.get_running_loop()
+        with observe_stage('preprocess'):
+            crops = [image.crop((0, top, width, bottom)) for top, bottom, _, _ in bands]
+        futures = [
+            loop.run_in_executor(
+                self.executor,
+                _ocr_band,
+                crop,
+                top,
+                self.tesseract_cmd,
+                tesseract_config(languages),
+            )
+            for crop, (top, _, _, _) in zip(crops, bands)
+        ]
+        with observe_stage('tesseract'):
+            band_layouts = await asyncio.gather(*futures)
+        for crop in crops:
+            crop.close()
+        
+        keep = [
+            lambda center, own_top=own_top, own_bottom=own_bottom: own_top <= center < own_bottom
+            for _, _, own_top, own_bottom in bands
+        ]
+        layout = merge_layouts(band_layouts, image.size, keep)
+        return {**summarize(layout), 'layout': layout}
+    
+    def _resolve_media_path(self, file_path: Optional[str]) -> Optional[str]:
+        """Путь к файлу на общем media томе (None, если файла нет или путь вне тома)"""
+        if not file_path or not self.media_root:
+            return None
+        root = os.path.realpath(self.media_root)
+        path = os.path.realpath(os.path.join(root, file_path))
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            return None
+        return path
+    
+    def _check_size(self, size: int):
+        if size > self.max_download_bytes:
+            raise ImageTooLargeException(size, self.max_download_bytes)
+    
+    def _draft(self, image: Image.Image):
+        """
+        Уменьшенное декодирование JPEG (в 2, 4 или 8 раз) через draft(),
+        если изображение больше OCR_DECODE_MAX_SIDE по длинной стороне
+        """
+        if not self.decode_max_side or image.format != 'JPEG':
+            return
+        width, height = image.size
+        scale = max(width, height) / self.decode_max_side
+        if scale < 2:
+            return
+        image.draft('L', (math.ceil(width / scale), math.ceil(height / scale)))
+        logger.debug(f"JPEG {width}x{height} decoded at {image.size[0]}x{image.size[1]}")
+    
+    def _decode(self, source) -> Image.Image:
+        image = Image.open(source)
+        self._draft(image)
+        with observe_stage('decode'):
+            image.load()
+        return image
+    
+    def _read_local_image(self, path: str) -> Image.Image:
+        """
+        Декодирование файла, отображенного в память, без копии в буфер.
+        
+        Кадры многостраничного изображения читаются при переходе к ним,
+        поэтому его отображение закрывается вместе с изображением (close()).
+        """
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._check_size(size)
+            try:
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                source = io.BytesIO(f.read())
+        image = None
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(image_url)
-                response.raise_for_status()
-                image = Image.open(io.BytesIO(response.content))
-                text = await self._extract_text_from_image(image)
-                return text
+            image = self._decode(source)
+            ocr_download_bytes.labels(source='volume').observe(size)
+            return image
+        finally:
+            if image is None or count_pages(image) == 1:
+                source.close()
+    
+    async def open_local_image(self, file_path: Optional[str]) -> Optional[Image.Image]:
+        """
+        Чтение изображения с общего с Django media тома.
+        
+        Возвращает None, если файл недоступен или не читается, - тогда
+        изображение загружается по HTTP.
+        """
+        path = self._resolve_media_path(file_path)
+        if path is None:
+            return None
+        try:
+            return await asyncio.to_thread(self._read_local_image, path)
+        except ImageTooLargeException:
+            raise
         except Exception as e:
-            logger.error(f"OCR processing error: {str(e)}")
-            raise OCRProcessingException(f"OCR processing failed: {str(e)}")
+            logger.warning(f"Could not read {path} from media volume: {str(e)}")
+            return None
+    
+    async def read_image_bytes(self, image_data: dict) -> bytes:
+        """Исходные байты изображения: с общего media тома или по HTTP"""
+        path = self._resolve_media_path(image_data.get('file_path'))
+        if path is not None:
+            try:
+                # ImageTooLargeException не OSError и проходит дальше
+                self._check_size(os.path.getsize(path))
+                with observe_stage('download'):
+                    data = await asyncio.to_thread(Path(path).read_bytes)
+                ocr_download_bytes.labels(source='volume').observe(len(data))
+                return data
+            except OSError as e:
+                logger.warning(f"Could not read {path} from media volume: {str(e)}")
+        
+        image_url = image_data.get('image_url')
+        if not image_url:
+            raise OCRProcessingException("Image URL not found")
+        buffer = await self._fetch(image_url)
+        return buffer.getvalue()
     
-    async def _extract_text_from_image(self, image: Image.Image) -> str:
-        """Внутренний метод для извлечения текста"""
+    async def _fetch(self, image_url: str) -> io.BytesIO:
+        """
+        Потоковая загрузка изображения в один буфер.
+        
+        Ответ с Content-Length больше OCR_MAX_DOWNLOAD_BYTES отклоняется до
+        чтения тела, остальные - как только прочитанное превысит лимит.
+        """
         try:
-            custom_config = r'--oem 3 --psm 6 -l rus+eng'
-            text = pytesseract.image_to_string(image, config=custom_config)
-            return ' '.join(text.split())
+            with observe_stage('download'):
+                async with self.client.stream('GET', image_url) as response:
+                    response.raise_for_status()
+                    length = response.headers.get('Content-Length', '')
+                    if length.isdigit():
+                        self._check_size(int(length))
+                    
+                    buffer = io.BytesIO()
+                    async for chunk in response.aiter_bytes():
+                        self._check_size(buffer.tell() + len(chunk))
+                        buffer.write(chunk)
+        except ImageTooLargeException:
+            raise
         except Exception as e:
-            logger.error(f"Tesseract processing error: {str(e)}")
-            raise OCRProcessingException(f"Tesseract failed: {str(e)}")
+            logger.error(f"Image download error: {str(e)}")
+            raise OCRProcessingException(f"Image download failed: {str(e)}")
+        
+        ocr_download_bytes.labels(source='http').observe(buffer.tell())
+        buffer.seek(0)
+        return buffer
     
-    async def extract_text_with_confidence(self, image_url: str) -> Dict:
-        """Извлечение текста с уверенностью распознавания"""
+    async def download_image(self, image_url: str) -> Image.Image:
+        """Загрузка изображения по URL"""
+        buffer = await self._fetch(image_url)
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(image_url)
-                response.raise_for_status()
-                image = Image.open(io.BytesIO(response.content))
-                
-                data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-                
-                text_parts = []
-                confidences = []
-                
-                for i, text in enumerate(data['text']):
-                    if text.strip():
-                        text_parts.append(text)
-                        try:
-                            conf = int(data['conf'][i])
-                            if conf > 0:
-                                confidences.append(conf)
-                        except (ValueError, TypeError):
-                            pass
-                
-                full_text = ' '.join(text_parts)
-                avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-                
-                return {
-                    'text': full_text,
-                    'confidence': round(avg_confidence, 2)
-                }
+            return self._decode(buffer)
+        except Exception as e:
+            logger.error(f"Image decode error: {str(e)}")
+            raise OCRProcessingException(f"Image decode failed: {str(e)}")
+    
+    async def recognize_pages(
+        self,
+        image: Image.Image,
+        languages: str = settings.OCR_LANGUAGES,
+        on_page: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        has_text: Optional[Callable[[Image.Image], Awaitable[bool]]] = None
+    ) -> Dict:
+        """
+        Распознавание многостраничного документа по страницам.
+        
+        Кадры читаются по одному через ImageSequence и распознаются
+        параллельно в пуле, в памяти одновременно не больше
+        OCR_MAX_WORKERS страниц. Результат собирается в порядке страниц,
+        on_page(done, total) вызывается по мере готовности страниц.
+        Страницы, для которых has_text вернул False, не распознаются.
+        """
+        pages = count_pages(image)
+        logger.info(f"Recognizing {pages}-page document")
+        loop = asyncio.get_running_loop()
+        config = tesseract_config(languages)
+        slots = asyncio.Semaphore(settings.OCR_MAX_WORKERS)
+        done = 0
+        
+        async def recognize(page: Image.Image) -> Dict[str, list]:
+            nonlocal done
+            try:
+                if has_text is not None and not await has_text(page):
+                    layout = empty_layout(page.size)
+                else:
+                    layout = await loop.run_in_executor(self.executor, _ocr_band, page, 0, self.tesseract_cmd, config)
+            finally:
+                page.close()
+                slots.release()
+            done += 1
+            if on_page is not None:
+                await on_page(done, pages)
+            return layout
+        
+        jobs = []
+        try:
+            for frame in ImageSequence.Iterator(image):
+                await slots.acquire()
+                with observe_stage('decode'):
+                    page = frame.copy()
+                jobs.append(asyncio.create_task(recognize(page)))
+            with observe_stage('tesseract'):
+                layouts = await asyncio.gather(*jobs)
+        except BaseException:
+            for job in jobs:
+                job.cancel()
+            raise
+        
+        layout = join_pages(layouts)
+        return {**summarize(layout), 'layout': layout, 'page_count': pages}
+    
+    async def recognize_with_confidence(
+        self,
+        image: Image.Image,
+        languages: str = settings.OCR_LANGUAGES,
+        on_page: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        has_text: Optional[Callable[[Image.Image], Awaitable[bool]]] = None
+    ) -> Dict:
+        """
+        Распознавание загруженного изображения за один проход Tesseract.
+        
+        Возвращает текст, среднюю уверенность и колоночную разметку слов
+        (layout) с рамками и номерами страниц, блоков, абзацев и строк;
+        languages - пакеты Tesseract. Многостраничные изображения
+        распознаются по страницам (см. recognize_pages).
+        """
+        try:
+            if count_pages(image) > 1:
+                return await self.recognize_pages(image, languages, on_page, has_text)
+            if self._should_tile(image):
+                return await self._extract_tiled(image, languages)
+            
+            with observe_stage('tesseract'):
+                return _recognize(image, self.tesseract_cmd, languages)
         except Exception as e:
             logger.error(f"OCR with confidence error: {str(e)}")
-            raise OCRProcessingException(f"OCR with confidence failed: {str(e)}")
\ No newline at end of file
+            raise OCRProcessingException(f"OCR with confidence failed: {str(e)}")
+    
+    async def extract_text_with_confidence(self, image_url: str) -> Dict:
+        """Извлечение текста с уверенностью распознавания"""
+        image = await self.download_image(image_url)
+        return await self.recognize_with_confidence(image)
\ No newline at end of file
@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+import redis.asyncio as redis
+from starlette.requests import Request
+from ..core.config import settings
+from ..core.metrics import rate_limited
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+
+# Token bucket: пополнение по времени сервера Redis, списание только при
+# достаточном запасе. Возвращает {allowed, tokens, retry_after}; дробные
+# значения - строками, иначе Redis отбросит дробную часть
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+def parse_rate(value: str) -> Tuple[int, float]:
+    """'120/m' -> (емкость корзины, пополнение в секунду)"""
+    count, _, period = value.partition('/')
+    seconds = PERIODS[period.strip() or 's']
+    capacity = int(count)
+    return capacity, capacity / seconds
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов клиента (token bucket в Redis).
+    
+    Клиент с API ключом из списка api_keys ограничивается по ключу,
+    остальные - по IP: неизвестный ключ в заголовке не дает отдельной
+    корзины, иначе случайный ключ в каждом запросе обходил бы лимит по
+    IP. Стоимость запроса задается по шаблону маршрута; маршруты
+    без стоимости не ограничиваются. Отказ Redis запоминается локально
+    до истечения Retry-After, и повторные запросы того же клиента с той
+    же стоимостью отклоняются без обращения к Redis; более дешевые
+    запросы проверяются в Redis, запаса корзины на них может хватить.
+    """
+    
+    KEY_PREFIX = 'ratelimit:'
+    
+    def __init__(
+        self,
+        redis_url: str = settings.REDIS_URL,
+        api_key_limit: str = settings.RATE_LIMIT_PER_API_KEY,
+        ip_limit: str = settings.RATE_LIMIT_PER_IP,
+        route_costs: Optional[Dict[str, int]] = None,
+        api_key_header: str = settings.RATE_LIMIT_API_KEY_HEADER,
+        api_keys: Optional[Iterable[str]] = None,
+        trust_forwarded: bool = settings.RATE_LIMIT_TRUST_FORWARDED,
+        local_cache_size: int = settings.RATE_LIMIT_LOCAL_CACHE_SIZE
+    ):
+        self.redis_url = redis_url
+        self.limits = {'api_key': parse_rate(api_key_limit), 'ip': parse_rate(ip_limit)}
+        self.route_costs = route_costs if route_costs is not None else settings.RATE_LIMIT_ROUTE_COSTS
+        self.api_key_header = api_key_header
+        self.api_keys = frozenset(api_keys if api_keys is not None else settings.RATE_LIMIT_API_KEYS)
+        self.trust_forwarded = trust_forwarded
+        self.local_cache_size = local_cache_size
+        self._blocked: OrderedDict = OrderedDict()
+        self._redis: Optional[redis.Redis] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+    
+    def client_key(self, request: Request) -> Tuple[str, str]:
+        """(область, ключ корзины): по известному API ключу, иначе по IP клиента"""
+        api_key = request.headers.get(self.api_key_header)
+        if api_key and api_key in self.api_keys:
+            return 'api_key', f"{self.KEY_PREFIX}key:{hashlib.sha1(api_key.encode()).hexdigest()}"
+        
+        ip = request.client.host if request.client else 'unknown'
+        if self.trust_forwarded:
+            forwarded = request.headers.get('X-Forwarded-For')
+            if forwarded:
+                ip = forwarded.split(',')[0].strip()
+        return 'ip', f"{self.KEY_PREFIX}ip:{ip}"
+    
+    def _local_retry_after(self, key: Tuple[str, int], now: float) -> Optional[int]:
+        blocked_until = self._blocked.get(key)
+        if blocked_until is None:
+            return None
+        if blocked_until <= now:
+            del self._blocked[key]
+            return None
+        return math.ceil(blocked_until - now)
+    
+    def _block_locally(self, key: Tuple[str, int], retry_after: float, now: float):
+        self._blocked[key] = now + retry_after
+        self._blocked.move_to_end(key)
+        while len(self._blocked) > self.local_cache_size:
+            self._blocked.popitem(last=False)
+    
+    async def hit(self, request: Request, endpoint: str) -> Optional[int]:
+        """
+        Списание стоимости запроса к маршруту endpoint.
+        
+        Возвращает None, если запрос разрешен, иначе Retry-After в секундах.
+        При недоступном Redis запрос разрешается.
+        """
+        cost = self.route_costs.get(endpoint)
+        if not cost:
+            return None
+        
+        scope, key = self.client_key(request)
+        capacity, rate = self.limits[scope]
+        cost = min(cost, capacity)
+        now = time.monotonic()
+        retry_after = self._local_retry_after((key, cost), now)
+        if retry_after is not None:
+            rate_limited.labels(endpoint=endpoint, scope=scope, source='local').inc()
+            return retry_after
+        
+        try:
+            allowed, _, wait = await self.redis.eval(
+                TOKEN_BUCKET_SCRIPT, 1, key, capacity, rate, cost
+            )
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {str(e)}")
+            return None
+        
+        if int(allowed):
+            return None
+        wait = float(wait)
+        self._block_locally((key, cost), wait, now)
+        rate_limited.labels(endpoint=endpoint, scope=scope, source='redis').inc()
+        return max(math.ceil(wait), 1)
+    
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
\ No newline at end of file
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ReadinessProbe:
+    """
+    Фоновая проверка зависимостей API: брокера Celery и воркеров.
+    
+    Проверки выполняются периодически в фоне и не задерживают запуск
+    приложения; /health и /ready отдают последний известный результат.
+    """
+    
+    def __init__(
+        self,
+        celery_app,
+        broker_url: str = settings.CELERY_BROKER_URL,
+        interval: float = settings.READINESS_PROBE_INTERVAL,
+        timeout: float = settings.READINESS_PROBE_TIMEOUT,
+        require_workers: bool = settings.READINESS_REQUIRE_WORKERS
+    ):
+        self.celery_app = celery_app
+        self.broker_url = broker_url
+        self.interval = interval
+        self.timeout = timeout
+        self.required = ('broker', 'workers') if require_workers else ('broker',)
+        self.checks: Dict[str, dict] = {}
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(
+                self.broker_url,
+                socket_connect_timeout=self.timeout,
+                socket_timeout=self.timeout
+            )
+        return self._redis
+    
+    async def _check_broker(self) -> str:
+        await self.redis.ping()
+        return 'ok'
+    
+    async def _check_workers(self) -> str:
+        replies = await asyncio.to_thread(self.celery_app.control.ping, timeout=self.timeout)
+        if not replies:
+            raise RuntimeError('no workers replied')
+        return f"{len(replies)} workers"
+    
+    async def _run_check(self, name: str, check):
+        try:
+            detail = await asyncio.wait_for(check(), timeout=self.timeout * 2)
+            ok = True
+        except Exception as e:
+            detail = str(e) or type(e).__name__
+            ok = False
+        previous = self.checks.get(name)
+        if previous is not None and previous['ok'] != ok:
+            log = logger.info if ok else logger.warning
+            log(f"Readiness check {name}: {'ok' if ok else 'failing'} ({detail})")
+        self.checks[name] = {'ok': ok, 'detail': detail, 'checked_at': time.time()}
+    
+    async def run_once(self):
+        """
+        Однократный запуск проверок.
+        
+        Воркеры опрашиваются только при доступном брокере: иначе ping
+        Celery ждет переподключения к брокеру в потоке пула.
+        """
+        await self._run_check('broker', self._check_broker)
+        if self.checks['broker']['ok']:
+            await self._run_check('workers', self._check_workers)
+        else:
+            self.checks['workers'] = {'ok': False, 'detail': 'broker unavailable', 'checked_at': time.time()}
+    
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+    
+    def start(self):
+        """Запуск проверок в фоне (не блокирует lifespan)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+    
+    @property
+    def ready(self) -> bool:
+        return all(self.checks.get(name, {}).get('ok') for name in self.required)
+    
+    def status(self) -> dict:
+        if not self.checks:
+            state = 'starting'
+        else:
+            state = 'ready' if self.ready else 'not_ready'
+        return {'status': state, 'checks': self.checks}
+    
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
\ No newline at end of file
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def _dump_layout(layout: Optional[dict]) -> Optional[str]:
+    """Компактный JSON колоночной разметки слов"""
+    if layout is None:
+        return None
+    return json.dumps(layout, ensure_ascii=False, separators=(',', ':'))
+
+def _run_record(task_id: Optional[str], text: str, confidence: Optional[float], processed_at: datetime) -> dict:
+    return {
+        'task_id': task_id,
+        'text': text,
+        'confidence': confidence,
+        'processed_at': processed_at.isoformat()
+    }
+
+class RedisResultStore:
+    """
+    Хранилище результатов OCR в Redis.
+    
+    Последний результат лежит в хэше ocr:result:{image_id} (один HMGET
+    на чтение, разметка слов читается только по запросу), история
+    запусков без разметки - в ограниченном списке рядом с ним.
+    """
+    
+    KEY_PREFIX = 'ocr:result:'
+    HISTORY_PREFIX = 'ocr:result_history:'
+    
+    def __init__(
+        self,
+        redis_url: str = settings.REDIS_URL,
+        history_limit: int = settings.OCR_RESULT_HISTORY_LIMIT,
+        retention_days: int = settings.OCR_RESULT_RETENTION_DAYS
+    ):
+        self.redis_url = redis_url
+        self.history_limit = history_limit
+        self.retention_days = retention_days
+        self._redis: Optional[redis.Redis] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+    
+    async def save(
+        self,
+        image_id: str,
+        text: str,
+        confidence: Optional[float] = None,
+        task_id: Optional[str] = None,
+        processed_at: Optional[datetime] = None,
+        layout: Optional[dict] = None
+    ):
+        """Сохранение результата запуска OCR (layout - разметка слов последнего запуска)"""
+        record = _run_record(task_id, text, confidence, processed_at or datetime.now(timezone.utc))
+        key = f"{self.KEY_PREFIX}{image_id}"
+        history_key = f"{self.HISTORY_PREFIX}{image_id}"
+        
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={
+                'task_id': task_id or '',
+                'text': text,
+                'confidence': '' if confidence is None else str(confidence),
+                'processed_at': record['processed_at'],
+                'layout': _dump_layout(layout) or ''
+            })
+            pipe.lpush(history_key, json.dumps(record))
+            pipe.ltrim(history_key, 0, self.history_limit - 1)
+            if self.retention_days:
+                ttl = int(timedelta(days=self.retention_days).total_seconds())
+                pipe.expire(key, ttl)
+                pipe.expire(history_key, ttl)
+            await pipe.execute()
+    
+    async def get_latest(self, image_id: str, with_layout: bool = False) -> Optional[dict]:
+        """Последний результат для изображения (with_layout - вместе с разметкой слов)"""
+        fields = ['task_id', 'text', 'confidence', 'processed_at']
+        if with_layout:
+            fields.append('layout')
+        data = dict(zip(fields, await self.redis.hmget(f"{self.KEY_PREFIX}{image_id}", fields)))
+        if data['processed_at'] is None:
+            return None
+        result = {
+            'task_id': data['task_id'] or None,
+            'text': data['text'] or '',
+            'confidence': float(data['confidence']) if data['confidence'] else None,
+            'processed_at': data['processed_at']
+        }
+        if with_layout:
+            result['layout'] = json.loads(data['layout']) if data['layout'] else None
+        return result
+    
+    async def get_history(self, image_id: str, limit: int = 10) -> List[dict]:
+        """История запусков, от последнего к первому"""
+        items = await self.redis.lrange(f"{self.HISTORY_PREFIX}{image_id}", 0, limit - 1)
+        return [json.loads(item) for item in items]
+    
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+class SQLiteResultStore:
+    """
+    Хранилище результатов OCR в файле SQLite.
+    
+    Запуски хранятся в одной таблице с индексом (image_id, processed_at),
+    поэтому последний результат читается одним индексным запросом.
+    """
+    
+    def __init__(
+        self,
+        path: str = settings.OCR_RESULT_SQLITE_PATH,
+        history_limit: int = settings.OCR_RESULT_HISTORY_LIMIT,
+        retention_days: int = settings.OCR_RESULT_RETENTION_DAYS
+    ):
+        self.path = path
+        self.history_limit = history_limit
+        self.retention_days = retention_days
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript('''
+                CREATE TABLE IF NOT EXISTS ocr_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    image_id TEXT NOT NULL,
+                    task_id TEXT,
+                    text TEXT NOT NULL,
+                    confidence REAL,
+                    processed_at TEXT NOT NULL,
+                    layout TEXT
+                );
+                CREATE INDEX IF NOT EXISTS ocr_results_image_processed
+                    ON ocr_results (image_id, processed_at DESC);
+                CREATE INDEX IF NOT EXISTS ocr_results_processed
+                    ON ocr_results (processed_at);
+            ''')
+            columns = {row['name'] for row in connection.execute('PRAGMA table_info(ocr_results)')}
+            if 'layout' not in columns:
+                connection.execute('ALTER TABLE ocr_results ADD COLUMN layout TEXT')
+            self._connection = connection
+        return self._connection
+    
+    def _save(self, image_id: str, record: dict, layout: Optional[str]):
+        with self._lock, self.connection as connection:
+            connection.execute(
+                'INSERT INTO ocr_results (image_id, task_id, text, confidence, processed_at, layout) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (image_id, record['task_id'], record['text'], record['confidence'], record['processed_at'], layout)
+            )
+            connection.execute(
+                'DELETE FROM ocr_results WHERE image_id = ? AND id NOT IN ('
+                'SELECT id FROM ocr_results WHERE image_id = ? ORDER BY processed_at DESC LIMIT ?)',
+                (image_id, image_id, self.history_limit)
+            )
+            if self.retention_days:
+                cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+                connection.execute('DELETE FROM ocr_results WHERE processed_at < ?', (cutoff.isoformat(),))
+    
+    def _select(self, image_id: str, limit: int, with_layout: bool = False) -> List[dict]:
+        columns = 'task_id, text, confidence, processed_at' + (', layout' if with_layout else '')
+        with self._lock:
+            rows = self.connection.execute(
+                f'SELECT {columns} FROM ocr_results '
+                'WHERE image_id = ? ORDER BY processed_at DESC LIMIT ?',
+                (image_id, limit)
+            ).fetchall()
+        records = [dict(row) for row in rows]
+        if with_layout:
+            for record in records:
+                record['layout'] = json.loads(record['layout']) if record['layout'] else None
+        return records
+    
+    async def save(
+        self,
+        image_id: str,
+        text: str,
+        confidence: Optional[float] = None,
+        task_id: Optional[str] = None,
+        processed_at: Optional[datetime] = None,
+        layout: Optional[dict] = None
+    ):
+        """Сохранение результата запуска OCR (layout - разметка слов последнего запуска)"""
+        record = _run_record(task_id, text, confidence, processed_at or datetime.now(timezone.utc))
+        await asyncio.to_thread(self._save, image_id, record, _dump_layout(layout))
+    
+    async def get_latest(self, image_id: str, with_layout: bool = False) -> Optional[dict]:
+        """Последний результат для изображения (with_layout - вместе с разметкой слов)"""
+        rows = await asyncio.to_thread(self._select, image_id, 1, with_layout)
+        return rows[0] if rows else None
+    
+    async def get_history(self, image_id: str, limit: int = 10) -> List[dict]:
+        """История запусков, от последнего к первому"""
+        return await asyncio.to_thread(self._select, image_id, limit)
+    
+    async def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+def create_result_store():
+    """Хранилище результатов согласно OCR_RESULT_STORE_BACKEND"""
+    if settings.OCR_RESULT_STORE_BACKEND == 'sqlite':
+        return SQLiteResultStore()
+    return RedisResultStore()
\ No newline at end of file
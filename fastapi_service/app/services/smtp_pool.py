@@ -0,0 +1,137 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.message import Message
+from typing import List, Optional, Tuple
+from ..core.lazy import lazy_import
+
+aiosmtplib = lazy_import('aiosmtplib')
+
+logger = logging.getLogger(__name__)
+
+class SMTPConnectionPool:
+    """
+    Ограниченный пул переиспользуемых SMTP соединений.
+    
+    Соединение открывается (connect + STARTTLS + login) один раз и затем
+    обслуживает много писем. Перед повторным использованием долго
+    простаивавшее соединение проверяется командой NOOP, а при обрыве
+    письмо отправляется заново через новое соединение.
+    """
+    
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        use_tls: bool = False,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        max_size: int = 4,
+        healthcheck_interval: float = 30,
+        max_idle: float = 240
+    ):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.max_size = max_size
+        self.healthcheck_interval = healthcheck_interval
+        self.max_idle = max_idle
+        self._idle: List[Tuple[aiosmtplib.SMTP, float]] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+    
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_size)
+        return self._semaphore
+    
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+    
+    async def _connect(self) -> aiosmtplib.SMTP:
+        """Открытие нового соединения с авторизацией"""
+        smtp = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            use_tls=self.use_tls
+        )
+        await smtp.connect()
+        
+        if self.username and self.password:
+            await smtp.login(self.username, self.password)
+        
+        logger.debug(f"Opened SMTP connection to {self.host}:{self.port}")
+        return smtp
+    
+    async def _discard(self, smtp: aiosmtplib.SMTP):
+        """Закрытие соединения без ошибок наружу"""
+        try:
+            await smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+    
+    async def _is_healthy(self, smtp: aiosmtplib.SMTP, idle_for: float) -> bool:
+        """Проверка соединения перед повторным использованием"""
+        if idle_for > self.max_idle or not smtp.is_connected:
+            return False
+        if idle_for < self.healthcheck_interval:
+            return True
+        try:
+            await smtp.noop()
+            return True
+        except Exception as e:
+            logger.info(f"SMTP connection failed NOOP health check: {str(e)}")
+            return False
+    
+    async def _get_connection(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            smtp, released_at = self._idle.pop()
+            if await self._is_healthy(smtp, time.monotonic() - released_at):
+                return smtp
+            await self._discard(smtp)
+        return await self._connect()
+    
+    def _release(self, smtp: aiosmtplib.SMTP):
+        self._idle.append((smtp, time.monotonic()))
+    
+    @asynccontextmanager
+    async def connection(self):
+        """Взятие соединения из пула; при ошибке соединение закрывается"""
+        async with self.semaphore:
+            smtp = await self._get_connection()
+            try:
+                yield smtp
+            except Exception:
+                await self._discard(smtp)
+                raise
+            else:
+                self._release(smtp)
+    
+    async def send_message(self, message: Message):
+        """
+        Отправка письма через соединение из пула.
+        
+        Если сервер закрыл соединение, письмо отправляется еще раз
+        через новое соединение.
+        """
+        try:
+            async with self.connection() as smtp:
+                await smtp.send_message(message)
+        except (aiosmtplib.SMTPServerDisconnected, ConnectionError) as e:
+            logger.warning(f"SMTP connection lost, reconnecting: {str(e)}")
+            async with self.connection() as smtp:
+                await smtp.send_message(message)
+    
+    async def close(self):
+        """Закрытие всех простаивающих соединений"""
+        idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            await self._discard(smtp)
\ No newline at end of file
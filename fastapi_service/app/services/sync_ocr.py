@@ -0,0 +1,99 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from ..core.config import settings
+from ..core.exceptions import OCRProcessingException
+from ..core.lazy import lazy_import
+from ..core.metrics import observe_stage
+from .ocr_service import recognize_image_bytes
+
+Image = lazy_import('PIL.Image')
+
+logger = logging.getLogger(__name__)
+
+class SyncOCRExecutor:
+    """
+    Синхронное распознавание небольших изображений в пуле процессов API.
+    
+    Число одновременных распознаваний ограничено размером пула. Задача,
+    не уложившаяся в срок, продолжает выполняться в пуле и занимает слот
+    до завершения, но ответ API ее уже не ждет.
+    """
+    
+    def __init__(
+        self,
+        max_workers: int = settings.OCR_SYNC_MAX_WORKERS,
+        deadline: float = settings.OCR_SYNC_DEADLINE,
+        tesseract_cmd: str = settings.TESSERACT_CMD
+    ):
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.tesseract_cmd = tesseract_cmd
+        self._slots = asyncio.Semaphore(max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+    
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Пул процессов (создается при первом синхронном запросе)"""
+        if self._executor is None:
+            # spawn: fork процесса с event loop и потоками небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+    
+    @property
+    def busy(self) -> bool:
+        """Все процессы пула заняты"""
+        return self._slots.locked()
+    
+    @staticmethod
+    def image_size(data: bytes) -> Tuple[int, int]:
+        """Размеры загруженного изображения по заголовку файла, без декодирования"""
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                return image.size
+        except Exception as e:
+            raise OCRProcessingException(f"Не удалось прочитать изображение: {str(e)}")
+    
+    def _on_done(self, future: asyncio.Future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"Sync OCR job finished with error: {future.exception()}")
+    
+    async def recognize(self, data: bytes, wait: bool = False) -> Optional[Dict]:
+        """
+        Распознавание изображения в пуле процессов с ограничением по времени.
+        
+        Если все процессы заняты, возвращает None (или ждет слот в пределах
+        срока при wait=True). При превышении срока поднимает asyncio.TimeoutError.
+        """
+        if self.busy and not wait:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        await asyncio.wait_for(self._slots.acquire(), timeout=self.deadline)
+        try:
+            future = loop.run_in_executor(self.executor, recognize_image_bytes, data, self.tesseract_cmd)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._on_done)
+        
+        try:
+            with observe_stage('tesseract'):
+                return await asyncio.wait_for(asyncio.shield(future), timeout=max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            raise OCRProcessingException(f"OCR processing failed: {str(e)}")
+    
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
\ No newline at end of file
@@ -0,0 +1,90 @@
+import hashlib
+import logging
+from typing import Optional, Tuple
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Удаление ключа, только если он все еще принадлежит этой задаче
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class TaskDeduplicator:
+    """
+    Защита от повторной постановки одной и той же OCR задачи.
+    
+    Ключ (image_id + параметры, а с заголовком Idempotency-Key - еще и
+    сам заголовок) через SET NX связывается с task_id первой задачи;
+    повторные запросы получают ее id. Тот же Idempotency-Key с другим
+    изображением или параметрами дает другой ключ и новую задачу.
+    Ключ по параметрам снимается воркером по завершении задачи, ключ
+    Idempotency-Key живет до истечения срока.
+    """
+    
+    INFLIGHT_PREFIX = 'ocr:inflight:'
+    IDEMPOTENCY_PREFIX = 'ocr:idempotency:'
+    
+    def __init__(
+        self,
+        redis_url: str = settings.REDIS_URL,
+        inflight_ttl: int = settings.OCR_INFLIGHT_LOCK_TTL,
+        idempotency_ttl: int = settings.OCR_IDEMPOTENCY_KEY_TTL
+    ):
+        self.redis_url = redis_url
+        self.inflight_ttl = inflight_ttl
+        self.idempotency_ttl = idempotency_ttl
+        self._redis: Optional[redis.Redis] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+    
+    @staticmethod
+    def _digest(*parts: str, **options) -> str:
+        parts = [str(part) for part in parts] + [f"{name}={options[name]}" for name in sorted(options)]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    
+    def inflight_key(self, image_id: str, **options) -> str:
+        """Ключ активной задачи по изображению и параметрам OCR"""
+        return f"{self.INFLIGHT_PREFIX}{self._digest(image_id, **options)}"
+    
+    def idempotency_key(self, key: str, image_id: str, **options) -> str:
+        """Ключ по заголовку Idempotency-Key клиента, изображению и параметрам OCR"""
+        return f"{self.IDEMPOTENCY_PREFIX}{self._digest(key, image_id, **options)}"
+    
+    async def claim(self, key: str, task_id: str) -> Tuple[str, bool]:
+        """
+        Закрепление ключа за задачей.
+        
+        Возвращает (task_id, claimed): id новой задачи и True, если ключ
+        свободен, иначе id уже поставленной задачи и False.
+        """
+        ttl = self.idempotency_ttl if key.startswith(self.IDEMPOTENCY_PREFIX) else self.inflight_ttl
+        for _ in range(3):
+            if await self.redis.set(key, task_id, nx=True, ex=ttl):
+                return task_id, True
+            existing = await self.redis.get(key)
+            if existing is not None:
+                return existing, False
+        # Ключ постоянно освобождается между SET и GET - не мешаем запросу
+        return task_id, True
+    
+    async def release(self, key: str, task_id: str) -> bool:
+        """Снятие ключа, если он принадлежит задаче task_id"""
+        try:
+            return bool(await self.redis.eval(RELEASE_SCRIPT, 1, key, task_id))
+        except Exception as e:
+            logger.warning(f"Could not release dedup key {key} for {task_id}: {str(e)}")
+            return False
+    
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
\ No newline at end of file
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Событие, которым завершаются потоки подписчиков при потере подписки на канал
+DISCONNECTED_STAGE = 'disconnected'
+
+class TaskEventPublisher:
+    """Публикация этапов обработки задачи в Redis pub/sub (на стороне воркера)"""
+    
+    def __init__(self, redis_url: str = settings.REDIS_URL, channel: str = settings.TASK_EVENTS_CHANNEL):
+        self.redis_url = redis_url
+        self.channel = channel
+        self._redis: Optional[redis.Redis] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url)
+        return self._redis
+    
+    async def publish(self, task_id: str, stage: str, **data):
+        """Публикация события; ошибки Redis не должны ломать обработку"""
+        event = {'task_id': task_id, 'stage': stage, 'timestamp': time.time(), **data}
+        try:
+            await self.redis.publish(self.channel, json.dumps(event))
+        except Exception as e:
+            logger.warning(f"Could not publish task event {stage} for {task_id}: {str(e)}")
+    
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+class TaskEventBroker:
+    """
+    Раздача событий задач подключенным клиентам (на стороне API).
+    
+    Процесс держит одну подписку на канал событий и рассылает
+    сообщения по очередям подписчиков конкретных задач.
+    """
+    
+    def __init__(
+        self,
+        redis_url: str = settings.REDIS_URL,
+        channel: str = settings.TASK_EVENTS_CHANNEL,
+        queue_size: int = 100
+    ):
+        self.redis_url = redis_url
+        self.channel = channel
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._redis: Optional[redis.Redis] = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url)
+        return self._redis
+    
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+    
+    async def _ensure_listener(self):
+        """Запуск единственной подписки процесса при первом подписчике"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._listener is not None and not self._listener.done():
+                return
+            if self._pubsub is not None:
+                # Подписка упавшего слушателя
+                try:
+                    await self._pubsub.aclose()
+                except Exception as e:
+                    logger.debug(f"Could not close stale task events subscription: {str(e)}")
+            self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(self.channel)
+            self._listener = asyncio.create_task(self._listen(self._pubsub))
+            logger.info(f"Subscribed to task events channel {self.channel}")
+    
+    async def _listen(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                if message.get('type') == 'message':
+                    self.dispatch(message['data'])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Task events listener stopped: {str(e)}")
+        self.disconnect_subscribers()
+    
+    def disconnect_subscribers(self):
+        """
+        Завершение потоков текущих подписчиков после потери подписки.
+        
+        Без подписки события до них не дойдут; клиент переподключается,
+        и следующий подписчик запускает новую подписку.
+        """
+        for task_id, queues in self._subscribers.items():
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait({'task_id': task_id, 'stage': DISCONNECTED_STAGE})
+    
+    def dispatch(self, raw):
+        """Передача события подписчикам его задачи"""
+        try:
+            event = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+        for queue in self._subscribers.get(event.get('task_id'), ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping task event for slow subscriber of {event.get('task_id')}")
+    
+    @asynccontextmanager
+    async def subscribe(self, task_id: str):
+        """Подписка на события задачи; возвращает очередь событий"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        try:
+            await self._ensure_listener()
+            yield queue
+        finally:
+            queues = self._subscribers.get(task_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[task_id]
+    
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
\ No newline at end of file
@@ -0,0 +1,87 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = frozenset({'SUCCESS', 'FAILURE', 'REVOKED'})
+
+class TaskStatusService:
+    """
+    Пакетное чтение состояний задач из result backend Celery.
+    
+    Состояния, которых нет в кэше, читаются одним MGET (Redis backend),
+    а завершенные задачи кэшируются в процессе: их состояние больше не меняется.
+    """
+    
+    def __init__(
+        self,
+        backend,
+        cache_size: int = settings.TASK_STATUS_CACHE_SIZE,
+        cache_ttl: int = settings.TASK_STATUS_CACHE_TTL
+    ):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+    
+    def _cache_get(self, task_id: str) -> Optional[dict]:
+        entry = self._cache.get(task_id)
+        if entry is None:
+            return None
+        cached_at, meta = entry
+        if time.monotonic() - cached_at > self.cache_ttl:
+            del self._cache[task_id]
+            return None
+        self._cache.move_to_end(task_id)
+        return meta
+    
+    def _cache_set(self, task_id: str, meta: dict):
+        self._cache[task_id] = (time.monotonic(), meta)
+        self._cache.move_to_end(task_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    def _fetch(self, task_ids: List[str]) -> Dict[str, dict]:
+        """Чтение метаданных задач из backend за один запрос"""
+        if not hasattr(self.backend, 'mget'):
+            return {task_id: self.backend.get_task_meta(task_id) for task_id in task_ids}
+        
+        keys = [self.backend.get_key_for_task(task_id) for task_id in task_ids]
+        values = self.backend.mget(keys)
+        
+        metas = {}
+        for task_id, value in zip(task_ids, values):
+            if value is None:
+                metas[task_id] = {'status': 'PENDING', 'result': None}
+            else:
+                metas[task_id] = self.backend.decode_result(value)
+        return metas
+    
+    def get_many(self, task_ids: Iterable[str]) -> Dict[str, dict]:
+        """
+        Состояния задач: {task_id: {'status': ..., 'result': ...}}
+        (синхронный вызов, из async кода выполнять в пуле потоков)
+        """
+        task_ids = list(dict.fromkeys(task_ids))
+        metas: Dict[str, dict] = {}
+        misses = []
+        
+        for task_id in task_ids:
+            meta = self._cache_get(task_id)
+            if meta is None:
+                misses.append(task_id)
+            else:
+                metas[task_id] = meta
+        
+        if misses:
+            fetched = self._fetch(misses)
+            for task_id, meta in fetched.items():
+                if meta.get('status') in TERMINAL_STATES:
+                    self._cache_set(task_id, meta)
+            metas.update(fetched)
+        
+        logger.debug(f"Task states: {len(task_ids)} requested, {len(misses)} read from backend")
+        return {task_id: metas[task_id] for task_id in task_ids}
\ No newline at end of file
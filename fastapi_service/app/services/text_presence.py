@@ -0,0 +1,63 @@
+from __future__ import annotations
+import asyncio
+import logging
+import math
+from ..core.config import settings
+from ..core.lazy import lazy_import
+from ..core.metrics import text_prefilter_decisions
+
+Image = lazy_import('PIL.Image')
+ImageFilter = lazy_import('PIL.ImageFilter')
+
+logger = logging.getLogger(__name__)
+
+class TextPresenceFilter:
+    """
+    Быстрая проверка, есть ли на изображении текст, до запуска Tesseract.
+    
+    На уменьшенной копии в оттенках серого строится карта резких границ,
+    которая усредняется по ячейкам сетки. Строка текста дает плотные
+    границы хотя бы в одной ячейке, а гладкие фото, градиенты и пустые
+    страницы - нет. Изображение без текста распознавать не нужно.
+    """
+    
+    def __init__(
+        self,
+        sample_side: int = settings.OCR_TEXT_PREFILTER_SAMPLE_SIDE,
+        cell_size: int = settings.OCR_TEXT_PREFILTER_CELL_SIZE,
+        edge_level: int = settings.OCR_TEXT_PREFILTER_EDGE_LEVEL,
+        min_density: float = settings.OCR_TEXT_PREFILTER_MIN_DENSITY
+    ):
+        self.sample_side = sample_side
+        self.cell_size = cell_size
+        self.edge_level = edge_level
+        self.min_density = min_density
+    
+    def score(self, image: Image.Image) -> float:
+        """Доля пикселей-границ в самой плотной ячейке сетки (от 0 до 1)"""
+        factor = math.ceil(max(image.size) / self.sample_side)
+        sample = (image.reduce(factor) if factor > 1 else image).convert('L')
+        
+        edges = sample.filter(ImageFilter.FIND_EDGES)
+        width, height = edges.size
+        if width > 2 and height > 2:
+            # FIND_EDGES дает ложные границы по краю изображения
+            edges = edges.crop((1, 1, width - 1, height - 1))
+        mask = edges.point([0] * self.edge_level + [255] * (256 - self.edge_level))
+        
+        grid = mask.resize(
+            (max(mask.width // self.cell_size, 1), max(mask.height // self.cell_size, 1)),
+            Image.Resampling.BOX
+        )
+        return grid.getextrema()[1] / 255
+    
+    async def has_text(self, image: Image.Image) -> bool:
+        """Есть ли на изображении текст; при ошибке проверки считается, что есть"""
+        try:
+            score = await asyncio.to_thread(self.score, image)
+        except Exception as e:
+            logger.warning(f"Text prefilter skipped: {str(e)}")
+            return True
+        found = score >= self.min_density
+        text_prefilter_decisions.labels(decision='text' if found else 'no_text').inc()
+        return found
\ No newline at end of file
@@ -1,14 +1,39 @@
 from celery import Celery
-from celery.signals import task_failure, task_success, task_prerun
+from celery.signals import (
+    task_failure, task_success, task_prerun, task_postrun, task_retry, before_task_publish,
+    worker_init, worker_process_init, worker_process_shutdown
+)
+from kombu import Queue
+from billiard.compat import mem_rss
 import logging
 import asyncio
-from typing import Optional
+import os
+import time
+from typing import Optional, List
 from uuid import UUID
 
 from ..core.config import settings
-from ..services.ocr_service import OCRService
+from ..services.ocr_service import OCRService, count_pages
 from ..services.email_service import EmailService
 from ..services.django_service import DjangoService
+from ..services.email_digest import EmailDigestService
+from ..services.task_events import TaskEventPublisher
+from ..services.result_store import create_result_store
+from ..services.task_dedup import TaskDeduplicator
+from ..services.admission import DRAINED_KEY_PREFIX
+from ..services.language import LanguageDetector
+from ..services.text_presence import TextPresenceFilter
+from ..services.dead_letter import DeadLetterQueue
+from ..services.ocr_layout import empty_layout
+from ..core.exceptions import EmailSendingException
+from ..core.lazy import load_lazy_modules
+from .metrics import (
+    task_queue_wait, task_run_duration, task_retries, task_failures, image_megapixels,
+    task_peak_memory, task_rss_growth, task_dead_lettered, worker_recycled, multiprocess_enabled, prepare_multiprocess_dir,
+    start_metrics_server, mark_process_dead, reset_peak_rss, peak_rss_bytes, rss_bytes
+)
+from .retry import is_retryable, backoff_delay
+from .memory import start_tracemalloc, take_snapshot, top_allocations, remove_stale_tesseract_files
 
 logger = logging.getLogger(__name__)
 
@@ -32,11 +57,195 @@ celery_app.conf.update(
     task_reject_on_worker_lost=True,
     result_expires=3600,
     worker_prefetch_multiplier=1,
+    # Дочерний процесс заменяется после N задач или если после задачи его RSS больше лимита (KiB)
+    worker_max_tasks_per_child=settings.WORKER_MAX_TASKS_PER_CHILD or None,
+    worker_max_memory_per_child=settings.WORKER_MAX_MEMORY_PER_CHILD_MB * 1024 or None,
+    task_default_queue='celery',
+    task_queues=(
+        Queue('celery'),
+        Queue(settings.OCR_QUEUE_SMALL),
+        Queue(settings.OCR_QUEUE_LARGE),
+        Queue(settings.EMAIL_QUEUE),
+    ),
+    task_routes={
+        'send_ocr_result_email': {'queue': settings.EMAIL_QUEUE},
+        'flush_email_digest': {'queue': settings.EMAIL_QUEUE},
+    },
 )
 
+class WorkerServices:
+    """Сервисы, общие для всех задач одного процесса воркера"""
+    def __init__(self):
+        self.django_service = DjangoService()
+        self.ocr_service = OCRService()
+        self.email_service = EmailService()
+        self.email_digest = EmailDigestService()
+        self.task_events = TaskEventPublisher()
+        self.result_store = create_result_store()
+        self.task_dedup = TaskDeduplicator()
+        self.language_detector = LanguageDetector()
+        self.text_prefilter = TextPresenceFilter()
+        self.dead_letter = DeadLetterQueue()
+    
+    async def close(self):
+        await self.django_service.close()
+        await self.ocr_service.close()
+        await self.email_service.close()
+        await self.email_digest.close()
+        await self.task_events.close()
+        await self.result_store.close()
+        await self.task_dedup.close()
+        await self.language_detector.close()
+        await self.dead_letter.close()
+
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker_services: Optional[WorkerServices] = None
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Долгоживущий event loop процесса (создается лениво, например в eager-режиме)"""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop
+
+def get_worker_services() -> WorkerServices:
+    """Общие экземпляры сервисов процесса"""
+    global _worker_services
+    if _worker_services is None:
+        _worker_services = WorkerServices()
+    return _worker_services
+
+def run_async(coro):
+    """Выполнение корутины в event loop процесса воркера"""
+    return get_worker_loop().run_until_complete(coro)
+
+@worker_init.connect
+def worker_init_handler(**kwargs):
+    """Главный процесс воркера: эндпоинт метрик для Prometheus"""
+    if not settings.WORKER_METRICS_PORT:
+        return
+    if multiprocess_enabled():
+        prepare_multiprocess_dir()
+    try:
+        start_metrics_server(settings.WORKER_METRICS_PORT, settings.WORKER_METRICS_ADDR)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not start worker metrics server: {str(e)}")
+
+@worker_process_init.connect
+def worker_process_init_handler(**kwargs):
+    get_worker_loop()
+    get_worker_services()
+    # До первой задачи: страницы и полосы распознаются в нескольких потоках сразу
+    load_lazy_modules('pytesseract', 'PIL.Image', 'PIL.ImageSequence', 'PIL.ImageFilter')
+    remove_stale_tesseract_files(settings.WORKER_TESSERACT_TEMP_MAX_AGE)
+    if settings.WORKER_TRACEMALLOC_TOP > 0:
+        start_tracemalloc()
+    logger.info("🔧 Worker process initialized: event loop and services are ready")
+
+def _recycle_reason() -> str:
+    """Причина завершения дочернего процесса: лимит задач, лимит памяти или остановка воркера"""
+    if settings.WORKER_MAX_TASKS_PER_CHILD and _tasks_in_process >= settings.WORKER_MAX_TASKS_PER_CHILD:
+        return 'max_tasks'
+    # Пул сравнивает с лимитом пиковый RSS процесса за все время (ru_maxrss), а не текущий
+    if settings.WORKER_MAX_MEMORY_PER_CHILD_MB and mem_rss() > settings.WORKER_MAX_MEMORY_PER_CHILD_MB * 1024:
+        return 'max_memory'
+    return 'shutdown'
+
+@worker_process_shutdown.connect
+def worker_process_shutdown_handler(**kwargs):
+    global _worker_loop, _worker_services
+    reason = _recycle_reason()
+    worker_recycled.labels(reason=reason).inc()
+    logger.info(f"🔧 Worker process exiting ({reason}) after {_tasks_in_process} tasks, RSS {rss_bytes()} bytes")
+    mark_process_dead(os.getpid())
+    if _worker_loop is None or _worker_loop.is_closed():
+        return
+    try:
+        if _worker_services is not None:
+            _worker_loop.run_until_complete(_worker_services.close())
+    finally:
+        _worker_loop.close()
+        _worker_loop = None
+        _worker_services = None
+    logger.info("🔧 Worker process shut down")
+
+_task_started_at = {}
+_task_memory_tracked = set()
+_task_rss_before = {}
+_task_snapshots = {}
+_tasks_in_process = 0
+
+def _task_queue(task) -> str:
+    delivery_info = task.request.delivery_info or {}
+    return delivery_info.get('routing_key') or 'unknown'
+
+@before_task_publish.connect
+def before_task_publish_handler(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
 @task_prerun.connect
 def task_prerun_handler(task_id, task, *args, **kwargs):
     logger.info(f"🚀 Task {task.name}[{task_id}] started")
+    now = time.time()
+    _task_started_at[task_id] = now
+    if reset_peak_rss():
+        _task_memory_tracked.add(task_id)
+    _task_rss_before[task_id] = rss_bytes()
+    snapshot = take_snapshot()
+    if snapshot is not None:
+        _task_snapshots[task_id] = snapshot
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at:
+        task_queue_wait.labels(queue=_task_queue(task)).observe(max(now - published_at, 0))
+
+@task_postrun.connect
+def task_postrun_handler(task_id, task, *args, **kwargs):
+    global _tasks_in_process
+    _tasks_in_process += 1
+    queue = _task_queue(task)
+    started_at = _task_started_at.pop(task_id, None)
+    if started_at is not None:
+        task_run_duration.labels(queue=queue).observe(time.time() - started_at)
+    if task_id in _task_memory_tracked:
+        _task_memory_tracked.discard(task_id)
+        peak = peak_rss_bytes()
+        if peak is not None:
+            task_peak_memory.labels(queue=queue).observe(peak)
+    _account_task_memory(task_id, task.name, queue)
+    if queue in (settings.OCR_QUEUE_SMALL, settings.OCR_QUEUE_LARGE):
+        _count_drained(queue)
+
+def _account_task_memory(task_id: str, task_name: str, queue: str):
+    """RSS до и после задачи и, если включен tracemalloc, места наибольших выделений"""
+    before = _task_rss_before.pop(task_id, None)
+    after = rss_bytes()
+    if before is not None and after is not None:
+        growth = after - before
+        task_rss_growth.labels(queue=queue).observe(max(growth, 0))
+        logger.debug(f"Task {task_name}[{task_id}] RSS {before} -> {after} bytes ({growth:+d})")
+    
+    snapshot = _task_snapshots.pop(task_id, None)
+    if snapshot is not None:
+        lines = top_allocations(snapshot, take_snapshot(), settings.WORKER_TRACEMALLOC_TOP)
+        if lines:
+            logger.info(f"🧠 Top allocations of {task_name}[{task_id}]:\n" + '\n'.join(lines))
+
+_broker_client = None
+
+def _count_drained(queue: str):
+    """Счетчик выполненных задач очереди для оценки скорости ее разбора в API"""
+    global _broker_client
+    try:
+        if _broker_client is None:
+            import redis
+            _broker_client = redis.Redis.from_url(
+                settings.CELERY_BROKER_URL, socket_timeout=1, socket_connect_timeout=1
+            )
+        _broker_client.incr(f"{DRAINED_KEY_PREFIX}{queue}")
+    except Exception as e:
+        logger.debug(f"Could not count drained task for {queue}: {str(e)}")
 
 @task_success.connect
 def task_success_handler(sender, result, **kwargs):
@@ -45,74 +254,194 @@ def task_success_handler(sender, result, **kwargs):
 @task_failure.connect
 def task_failure_handler(sender, task_id, exception, *args, **kwargs):
     logger.error(f"❌ Task {sender.name}[{task_id}] failed: {str(exception)}")
+    task_failures.labels(
+        task=sender.name,
+        queue=_task_queue(sender),
+        exception=type(exception).__name__
+    ).inc()
+
+@task_retry.connect
+def task_retry_handler(sender, request=None, **kwargs):
+    delivery_info = getattr(request, 'delivery_info', None) or {}
+    task_retries.labels(task=sender.name, queue=delivery_info.get('routing_key') or 'unknown').inc()
 
 @celery_app.task(bind=True, name='process_ocr_task')
-def process_ocr_task(self, image_id: str, send_email: bool = True, email: Optional[str] = None):
+def process_ocr_task(
+    self,
+    image_id: str,
+    send_email: bool = True,
+    email: Optional[str] = None,
+    release_key: Optional[str] = None,
+    image_data: Optional[dict] = None,
+    languages: Optional[str] = None,
+    batch_member: bool = False
+):
     """
     Асинхронная задача для обработки OCR
+    
+    release_key - ключ дедупликации analyze_doc, который снимается,
+    когда задача завершилась (успешно или после последней попытки).
+    image_data - метаданные изображения, уже полученные API при постановке
+    задачи; без них метаданные запрашиваются у Django.
+    languages - языки Tesseract, выбранные клиентом; без них языки
+    определяются по изображению.
+    Страницы многостраничного документа распознаются параллельно, о
+    каждой готовой странице публикуется событие page.
+    
+    Временные ошибки (сеть, таймауты, 5xx) повторяются с экспоненциальной
+    задержкой и полным джиттером, постоянные (404, нечитаемое изображение)
+    не повторяются. Задача, упавшая окончательно, попадает в dead-letter
+    очередь, откуда ее можно переотправить через API.
+    batch_member - задача входит в chord пакета: после последней попытки
+    она возвращает {'status': 'failed'} вместо исключения, иначе одна
+    ошибка отменяет callback всего пакета.
     """
     logger.info(f"📸 Starting OCR task for image {image_id}")
     
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(
-            _process_ocr_async(image_id, send_email, email, self.request.id)
+        result = run_async(
+            _process_ocr_async(image_id, send_email, email, self.request.id, image_data, languages)
         )
         
-        loop.close()
-        
         logger.info(f"✅ OCR task completed for image {image_id}")
+        if release_key:
+            run_async(get_worker_services().task_dedup.release(release_key, self.request.id))
         return result
         
     except Exception as e:
         logger.error(f"❌ OCR task failed for image {image_id}: {str(e)}")
-        self.retry(exc=e, countdown=60, max_retries=3)
+        retryable = is_retryable(e)
+        final = not retryable or self.request.retries >= settings.OCR_TASK_MAX_RETRIES
+        services = get_worker_services()
+        run_async(services.task_events.publish(self.request.id, 'failed' if final else 'retrying', error=str(e)))
+        if not final:
+            self.retry(
+                exc=e,
+                countdown=backoff_delay(
+                    self.request.retries, settings.OCR_RETRY_BACKOFF_BASE, settings.OCR_RETRY_BACKOFF_MAX
+                ),
+                max_retries=settings.OCR_TASK_MAX_RETRIES
+            )
+        
+        if release_key:
+            run_async(services.task_dedup.release(release_key, self.request.id))
+        queue = _task_queue(self)
+        run_async(services.dead_letter.add(
+            self.request.id,
+            self.name,
+            queue,
+            kwargs={
+                'image_id': image_id,
+                'send_email': send_email,
+                'email': email,
+                'image_data': image_data,
+                'languages': languages
+            },
+            exception=e,
+            retries=self.request.retries,
+            retryable=retryable
+        ))
+        task_dead_lettered.labels(task=self.name, queue=queue, retryable=str(retryable).lower()).inc()
+        logger.warning(f"🪦 OCR task {self.request.id} for image {image_id} moved to dead-letter queue")
+        if batch_member:
+            task_failures.labels(task=self.name, queue=queue, exception=type(e).__name__).inc()
+            return {'status': 'failed', 'image_id': image_id, 'error': str(e)}
         raise
 
 async def _process_ocr_async(
     image_id: str, 
     send_email: bool, 
     email: Optional[str],
-    task_id: str
+    task_id: str,
+    image_data: Optional[dict] = None,
+    languages: Optional[str] = None
 ) -> dict:
     """
     Асинхронная логика OCR обработки
     """
-    django_service = DjangoService()
-    ocr_service = OCRService()
-    email_service = EmailService()
+    services = get_worker_services()
     
     try:
-        logger.info(f"Step 1: Getting image data for {image_id}")
-        image_data = await django_service.get_image(UUID(image_id))
+        if image_data is None:
+            logger.info(f"Step 1: Getting image data for {image_id}")
+            image_data = await services.django_service.get_image(UUID(image_id))
+        await services.task_events.publish(task_id, 'fetched', image_id=image_id)
         
-        if not image_data.image_url:
-            raise ValueError("Image URL not found")
+        logger.info(f"Step 2: Loading image {image_id}")
+        image = await services.ocr_service.open_local_image(image_data.get('file_path'))
+        if image is None:
+            image_url = image_data.get('image_url')
+            if not image_url:
+                raise ValueError("Image URL not found")
+            image = await services.ocr_service.download_image(image_url)
+        try:
+            await services.task_events.publish(task_id, 'downloaded')
+            width, height = image.size
+            image_megapixels.observe(width * height / 1_000_000)
+            
+            page_count = count_pages(image)
+            has_text = services.text_prefilter.has_text if settings.OCR_TEXT_PREFILTER_ENABLED else None
+            
+            async def report_page(pages_done: int, total: int):
+                await services.task_events.publish(task_id, 'page', pages_done=pages_done, page_count=total)
+            
+            text_detected = True
+            if has_text is not None and page_count == 1:
+                text_detected = await has_text(image)
+            
+            if not text_detected:
+                logger.info(f"No text found on image {image_id}, skipping OCR")
+                languages = None
+                ocr_result = {'text': '', 'confidence': 0.0, 'layout': empty_layout(image.size)}
+            else:
+                if not languages:
+                    if settings.OCR_LANGUAGE_DETECTION:
+                        languages = await services.language_detector.detect(image)
+                    else:
+                        languages = settings.OCR_LANGUAGES
+                ocr_result = await services.ocr_service.recognize_with_confidence(
+                    image, languages, on_page=report_page, has_text=has_text
+                )
+        finally:
+            # Декодированные страницы больше не нужны, а файл многостраничного документа открыт
+            image.close()
+        await services.task_events.publish(
+            task_id, 'ocr', confidence=ocr_result['confidence'], text_detected=text_detected
+        )
         
-        logger.info(f"Step 2: Extracting text from {image_data.image_url}")
-        ocr_result = await ocr_service.extract_text_with_confidence(image_data.image_url)
+        await services.result_store.save(
+            image_id,
+            text=ocr_result['text'],
+            confidence=ocr_result['confidence'],
+            task_id=task_id,
+            layout=ocr_result.get('layout')
+        )
         
+        email_queued = False
         if send_email:
-            logger.info(f"Step 3: Sending email")
             to_email = email or settings.DEFAULT_FROM_EMAIL
             
             if to_email:
-                await email_service.send_ocr_result(
-                    to_email=to_email,
+                logger.info(f"Step 3: Queueing email to {to_email}")
+                await _queue_result_email(
+                    services,
+                    task_id=task_id,
+                    to_email=str(to_email),
                     image_data={
                         'id': image_id,
-                        'title': image_data.title,
-                        'uploaded_at': str(image_data.uploaded_at),
-                        'size': getattr(image_data, 'size', 0),
-                        'width': getattr(image_data, 'width', 0),
-                        'height': getattr(image_data, 'height', 0),
-                        'format': getattr(image_data, 'format', '')
+                        'title': image_data.get('title', ''),
+                        'uploaded_at': str(image_data.get('uploaded_at', '')),
+                        'size': image_data.get('size', 0),
+                        'width': image_data.get('width', 0),
+                        'height': image_data.get('height', 0),
+                        'format': image_data.get('format', '')
                     },
                     ocr_text=ocr_result['text'],
                     confidence=ocr_result['confidence']
                 )
+                email_queued = True
+        
+        await services.task_events.publish(task_id, 'completed', email_queued=email_queued)
         
         return {
             'task_id': task_id,
@@ -120,13 +449,132 @@ async def _process_ocr_async(
             'status': 'completed',
             'text': ocr_result['text'],
             'confidence': ocr_result['confidence'],
-            'email_sent': send_email
+            'languages': languages,
+            'text_detected': text_detected,
+            'page_count': page_count,
+            'email_queued': email_queued
         }
         
     except Exception as e:
         logger.error(f"Error in OCR processing: {str(e)}")
         raise
 
+async def _queue_result_email(
+    services: WorkerServices,
+    task_id: str,
+    to_email: str,
+    image_data: dict,
+    ocr_text: str,
+    confidence: Optional[float]
+):
+    """
+    Передача результата в очередь писем: сразу отдельным письмом
+    или в дайджест получателя, если он включен
+    """
+    if not settings.EMAIL_DIGEST_ENABLED:
+        send_ocr_result_email.delay(to_email, image_data, ocr_text, confidence, ocr_task_id=task_id)
+        return
+    
+    count = await services.email_digest.add(to_email, {
+        'task_id': task_id,
+        'image_data': image_data,
+        'ocr_text': ocr_text,
+        'confidence': confidence
+    })
+    
+    if count >= settings.EMAIL_DIGEST_MAX_ITEMS:
+        flush_email_digest.delay(to_email)
+    elif count == 1:
+        flush_email_digest.apply_async(args=[to_email], countdown=settings.EMAIL_DIGEST_WINDOW)
+
+@celery_app.task(
+    name='send_ocr_result_email',
+    rate_limit=settings.EMAIL_RATE_LIMIT,
+    autoretry_for=(EmailSendingException,),
+    retry_backoff=True,
+    max_retries=5
+)
+def send_ocr_result_email(
+    to_email: str,
+    image_data: dict,
+    ocr_text: str,
+    confidence: Optional[float] = None,
+    ocr_task_id: Optional[str] = None
+):
+    """
+    Отправка результата OCR отдельным письмом (очередь писем)
+    """
+    services = get_worker_services()
+    sent = run_async(
+        services.email_service.send_ocr_result(
+            to_email=to_email,
+            image_data=image_data,
+            ocr_text=ocr_text,
+            confidence=confidence
+        )
+    )
+    if ocr_task_id:
+        run_async(services.task_events.publish(ocr_task_id, 'emailed', to_email=to_email))
+    return sent
+
+@celery_app.task(
+    name='flush_email_digest',
+    rate_limit=settings.EMAIL_RATE_LIMIT,
+    autoretry_for=(EmailSendingException,),
+    retry_backoff=True,
+    max_retries=5
+)
+def flush_email_digest(to_email: str):
+    """
+    Отправка накопленных результатов получателю одним письмом
+    """
+    services = get_worker_services()
+    results = run_async(services.email_digest.pop_all(to_email))
+    
+    if not results:
+        return {'to_email': to_email, 'sent': 0}
+    
+    try:
+        run_async(services.email_service.send_ocr_digest(to_email, results))
+    except EmailSendingException:
+        # Возвращаем результаты, чтобы повторная попытка отправила их снова
+        for result in results:
+            run_async(services.email_digest.add(to_email, result))
+        raise
+    
+    for result in results:
+        if result.get('task_id'):
+            run_async(services.task_events.publish(result['task_id'], 'emailed', to_email=to_email, digest=True))
+    
+    logger.info(f"📬 Digest with {len(results)} results sent to {to_email}")
+    return {'to_email': to_email, 'sent': len(results)}
+
+@celery_app.task(name='ocr_batch_completed')
+def ocr_batch_completed(results: List[dict], batch_id: str, email: Optional[str] = None):
+    """
+    Callback (chord body), выполняемый после завершения всех задач пакета
+    """
+    completed = [r for r in results if r and r.get('status') == 'completed']
+    logger.info(f"📦 Batch {batch_id} finished: {len(completed)}/{len(results)} completed")
+    
+    summary = {
+        'batch_id': batch_id,
+        'total': len(results),
+        'completed': len(completed),
+        'failed': len(results) - len(completed)
+    }
+    
+    if email:
+        run_async(
+            get_worker_services().email_service.send_notification(
+                to_email=email,
+                subject=f"Пакет OCR {batch_id} обработан",
+                body=f"Обработано изображений: {len(completed)} из {len(results)}"
+            )
+        )
+    
+    return summary
+
 @celery_app.task(name='health_check')
 def health_check():
     """Задача для проверки здоровья Celery"""
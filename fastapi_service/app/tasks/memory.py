@@ -0,0 +1,51 @@
+import glob
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Префикс временных файлов pytesseract (изображение и вывод tesseract)
+TESSERACT_TEMP_PREFIX = 'tess_'
+
+def start_tracemalloc(frames: int = 1) -> bool:
+    """Включение tracemalloc в процессе воркера (False, если уже включен)"""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    return True
+
+def take_snapshot():
+    """Снимок выделений памяти или None, если tracemalloc выключен"""
+    if not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.take_snapshot()
+
+def top_allocations(before, after, limit: int) -> List[str]:
+    """Места с наибольшим приростом выделений между двумя снимками"""
+    stats = after.compare_to(before, 'lineno')
+    return [str(stat) for stat in stats[:limit] if stat.size_diff > 0]
+
+def remove_stale_tesseract_files(max_age: float, directory: Optional[str] = None) -> int:
+    """
+    Удаление временных файлов pytesseract старше max_age секунд.
+    
+    pytesseract удаляет свои файлы сам, но они остаются, если процесс
+    был убит посреди распознавания (лимит времени задачи, OOM).
+    """
+    directory = directory or tempfile.gettempdir()
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in glob.glob(os.path.join(directory, f'{TESSERACT_TEMP_PREFIX}*')):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info(f"🧹 Removed {removed} stale tesseract temp files from {directory}")
+    return removed
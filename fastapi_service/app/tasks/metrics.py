@@ -0,0 +1,133 @@
+import logging
+import os
+from typing import Optional
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, start_http_server, multiprocess
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+RUN_TIME_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900, 1800)
+MEGAPIXEL_BUCKETS = (0.1, 0.5, 1, 2, 4, 8, 12, 24, 50, 100)
+MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in (64, 128, 256, 512, 768, 1024, 1536, 2048, 4096))
+MEMORY_GROWTH_BUCKETS = tuple(mb * 1024 * 1024 for mb in (0.5, 1, 4, 16, 64, 128, 256, 512))
+
+task_queue_wait = Histogram(
+    'ocr_task_queue_wait_seconds',
+    'Time between task publish and start of execution',
+    ['queue'],
+    buckets=QUEUE_WAIT_BUCKETS
+)
+task_run_duration = Histogram(
+    'ocr_task_run_seconds',
+    'Task execution time',
+    ['queue'],
+    buckets=RUN_TIME_BUCKETS
+)
+task_retries = Counter(
+    'ocr_task_retries_total',
+    'Task retries',
+    ['task', 'queue']
+)
+task_failures = Counter(
+    'ocr_task_failures_total',
+    'Tasks failed after all retries',
+    ['task', 'queue', 'exception']
+)
+task_dead_lettered = Counter(
+    'ocr_task_dead_lettered_total',
+    'Tasks moved to the dead-letter queue',
+    ['task', 'queue', 'retryable']
+)
+image_megapixels = Histogram(
+    'ocr_image_megapixels',
+    'Size of images processed by OCR workers',
+    buckets=MEGAPIXEL_BUCKETS
+)
+task_peak_memory = Histogram(
+    'ocr_task_peak_memory_bytes',
+    'Peak resident memory of the worker process while running a task',
+    ['queue'],
+    buckets=MEMORY_BUCKETS
+)
+
+task_rss_growth = Histogram(
+    'ocr_task_rss_growth_bytes',
+    'Resident memory retained by the worker process after a task',
+    ['queue'],
+    buckets=MEMORY_GROWTH_BUCKETS
+)
+worker_recycled = Counter(
+    'ocr_worker_recycled_total',
+    'Worker child processes shut down',
+    ['reason']
+)
+
+def reset_peak_rss() -> bool:
+    """
+    Сброс пикового RSS процесса перед задачей (Linux, /proc/self/clear_refs).
+    
+    В prefork пуле процесс выполняет одну задачу за раз, поэтому пик
+    после сброса относится к текущей задаче.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _proc_status_bytes(field: str) -> Optional[int]:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def peak_rss_bytes() -> Optional[int]:
+    """Пиковый RSS процесса с последнего сброса (VmHWM)"""
+    return _proc_status_bytes('VmHWM')
+
+def rss_bytes() -> Optional[int]:
+    """Текущий RSS процесса (VmRSS)"""
+    return _proc_status_bytes('VmRSS')
+
+def multiprocess_enabled() -> bool:
+    """
+    Режим multiprocess prometheus_client.
+    
+    Включается переменной окружения PROMETHEUS_MULTIPROC_DIR, которая должна
+    быть задана до запуска воркера: дочерние процессы prefork пула пишут
+    значения метрик в файлы этого каталога.
+    """
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+def prepare_multiprocess_dir():
+    """Очистка файлов метрик, оставшихся от предыдущего запуска воркера"""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith('.db'):
+            os.remove(os.path.join(path, name))
+
+def start_metrics_server(port: int, addr: str = '0.0.0.0'):
+    """
+    HTTP эндпоинт метрик в главном процессе воркера.
+    
+    В multiprocess режиме метрики собираются из файлов всех дочерних
+    процессов, иначе отдается реестр текущего процесса (solo/threads пул).
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    start_http_server(port, addr=addr, registry=registry)
+    logger.info(f"📈 Worker metrics served on {addr}:{port}")
+
+def mark_process_dead(pid: int):
+    """Удаление данных завершившегося дочернего процесса"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
\ No newline at end of file
@@ -0,0 +1,50 @@
+import random
+from typing import Optional
+import httpx
+import redis.exceptions
+from ..core.exceptions import AppException
+
+# Ответы HTTP, после которых повтор имеет смысл
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Ошибки в данных задачи или в коде: повтор даст тот же результат
+PERMANENT_ERRORS = (AppException, ValueError, TypeError, LookupError)
+
+def _is_transient(exc: BaseException) -> Optional[bool]:
+    """True или False для известных ошибок, None - если по самой ошибке не понять"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError, redis.exceptions.ConnectionError)):
+        return True
+    if isinstance(exc, AppException) and (exc.status_code >= 500 or exc.status_code in RETRYABLE_STATUS_CODES):
+        return True
+    return None
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Имеет ли смысл повторять задачу после ошибки.
+    
+    Сетевые сбои, таймауты, 429 и 5xx временные; 404, слишком большой
+    файл, нечитаемое изображение - нет. Исключения сервисов с кодом 4xx,
+    обернувшие сетевой сбой (например, "Image download failed"),
+    классифицируются по исходной ошибке из цепочки __cause__/__context__.
+    Неизвестные ошибки повторяются.
+    """
+    seen = set()
+    current = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        transient = _is_transient(current)
+        if transient is not None:
+            return transient
+        current = current.__cause__ or current.__context__
+    return not isinstance(exc, PERMANENT_ERRORS)
+
+def backoff_delay(retries: int, base: float, cap: float) -> float:
+    """
+    Задержка перед повтором с экспоненциальным ростом и полным джиттером.
+    
+    Случайное значение от 0 до min(cap, base * 2^retries): задачи, упавшие
+    одновременно, повторяются вразброс, а не одной волной.
+    """
+    return random.uniform(0, min(cap, base * 2 ** retries))
\ No newline at end of file
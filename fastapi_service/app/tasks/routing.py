@@ -0,0 +1,21 @@
+from ..core.config import settings
+
+# Грубое соотношение пикселей к байтам для сжатых форматов,
+# используется, когда Django не смог определить размеры изображения
+PIXELS_PER_BYTE = 4
+
+def estimate_ocr_cost(image_data: dict) -> float:
+    """
+    Оценка стоимости распознавания изображения в мегапикселях
+    по данным api-data (width, height, page_count, size)
+    """
+    pixels = (image_data.get('width') or 0) * (image_data.get('height') or 0) * (image_data.get('page_count') or 1)
+    if not pixels:
+        pixels = (image_data.get('size') or 0) * PIXELS_PER_BYTE
+    return pixels / 1_000_000
+
+def select_ocr_queue(image_data: dict) -> str:
+    """Выбор очереди OCR по оценке стоимости задачи"""
+    if estimate_ocr_cost(image_data) >= settings.OCR_LARGE_COST_THRESHOLD:
+        return settings.OCR_QUEUE_LARGE
+    return settings.OCR_QUEUE_SMALL
\ No newline at end of file
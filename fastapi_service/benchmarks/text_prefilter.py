@@ -0,0 +1,119 @@
+"""
+Качество и выигрыш префильтра наличия текста на корпусе изображений.
+
+Корпус - каталог с подкаталогами text/ (изображения с текстом) и
+no_text/ (без текста). Без каталога используется синтетический корпус:
+документы, чеки и текст поверх фона против фото-подобного шума,
+градиентов, фигур и пустых страниц.
+
+Префильтр пропускает изображения, признанные пустыми, поэтому
+precision - доля действительно пустых среди пропущенных, recall - доля
+пропущенных среди всех пустых. Сэкономленное время - пропущенные
+изображения, умноженные на среднее время Tesseract (измеряется, если
+tesseract установлен, иначе берется ASSUMED_OCR_SECONDS).
+
+Запуск: python -m benchmarks.text_prefilter [каталог корпуса] [порог плотности]
+"""
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from app.core.config import settings
+from app.services.ocr_service import _recognize
+from app.services.text_presence import TextPresenceFilter
+
+ASSUMED_OCR_SECONDS = 1.5
+
+WORDS = "invoice total amount date receipt payment customer order number счет итого сумма дата".split()
+
+def _document(width: int, height: int, lines: int, size: int, background='white', ink='black') -> Image.Image:
+    image = Image.new('RGB', (width, height), background)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=size)
+    for i in range(lines):
+        line = ' '.join(random.choice(WORDS) for _ in range(6))
+        draw.text((width * 0.08, height * 0.08 + i * size * 1.6), line, fill=ink, font=font)
+    return image
+
+def _photo(width: int, height: int, blur: float, scale: int, amplitude: int = 30) -> Image.Image:
+    noise = Image.effect_noise((width // scale, height // scale), amplitude)
+    return noise.resize((width, height), Image.Resampling.BICUBIC).filter(ImageFilter.GaussianBlur(blur)).convert('RGB')
+
+def _shapes(width: int, height: int) -> Image.Image:
+    image = _photo(width, height, 4, 32)
+    draw = ImageDraw.Draw(image)
+    for _ in range(6):
+        x, y = random.randint(0, width - 200), random.randint(0, height - 200)
+        draw.ellipse((x, y, x + random.randint(50, 200), y + random.randint(50, 200)), fill=(random.randint(0, 255),) * 3)
+    return image
+
+def synthetic_corpus(count: int = 5) -> Iterator[Tuple[str, bool, Image.Image]]:
+    random.seed(1)
+    for i in range(count):
+        yield f'page-{i}', True, _document(2480, 3508, random.randint(1, 40), random.choice((28, 40, 56)))
+        yield f'receipt-{i}', True, _document(600, 1600, random.randint(3, 20), random.choice((14, 18)))
+        yield f'gray-{i}', True, _document(1600, 1200, 5, 30, background=(200, 200, 200), ink=(90, 90, 90))
+        yield f'poster-{i}', True, Image.blend(_photo(2000, 1500, 2, 32), _document(2000, 1500, 3, 60), 0.6)
+        yield f'photo-{i}', False, _photo(3000, 2000, random.uniform(1, 4), 32)
+        yield f'texture-{i}', False, _photo(3000, 2000, 0.5, 16)
+        yield f'shapes-{i}', False, _shapes(2000, 1500)
+        yield f'gradient-{i}', False, Image.linear_gradient('L').resize((1000, 1000)).convert('RGB')
+        yield f'blank-{i}', False, Image.new('RGB', (2480, 3508), 'white')
+
+def directory_corpus(root: Path) -> Iterator[Tuple[str, bool, Image.Image]]:
+    for label, has_text in (('text', True), ('no_text', False)):
+        for path in sorted((root / label).iterdir()):
+            image = Image.open(path)
+            image.load()
+            yield str(path), has_text, image
+
+def ocr_seconds(images: List[Image.Image]) -> Tuple[float, bool]:
+    """Среднее время Tesseract на изображение и было ли оно измерено"""
+    if not images or not shutil.which(settings.TESSERACT_CMD):
+        return ASSUMED_OCR_SECONDS, False
+    started = time.perf_counter()
+    for image in images:
+        _recognize(image, settings.TESSERACT_CMD, settings.OCR_LANGUAGES)
+    return (time.perf_counter() - started) / len(images), True
+
+def main():
+    root = Path(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != '-' else None
+    prefilter = TextPresenceFilter()
+    if len(sys.argv) > 2:
+        prefilter.min_density = float(sys.argv[2])
+    
+    corpus = list(directory_corpus(root) if root else synthetic_corpus())
+    
+    skipped = []
+    prefilter_time = 0.0
+    for name, has_text, image in corpus:
+        started = time.perf_counter()
+        score = prefilter.score(image)
+        prefilter_time += time.perf_counter() - started
+        if score < prefilter.min_density:
+            skipped.append((name, has_text))
+    
+    text_free = sum(1 for _, has_text, _ in corpus if not has_text)
+    true_skips = sum(1 for _, has_text in skipped if not has_text)
+    precision = true_skips / len(skipped) if skipped else 1.0
+    recall = true_skips / text_free if text_free else 1.0
+    
+    seconds, measured = ocr_seconds([image for _, has_text, image in corpus if not has_text][:3])
+    saved = len(skipped) * seconds - prefilter_time
+    
+    print(f"images: {len(corpus)} ({text_free} without text), threshold: {prefilter.min_density}")
+    print(f"skipped: {len(skipped)}, precision: {precision:.2f}, recall: {recall:.2f}")
+    for name, has_text in skipped:
+        if has_text:
+            print(f"  text image skipped: {name}")
+    print(f"prefilter: {prefilter_time / len(corpus) * 1000:.1f} ms/image")
+    print(f"tesseract: {seconds:.2f} s/image ({'measured' if measured else 'assumed'})")
+    print(f"time saved: {saved:.1f}s of {len(corpus) * seconds:.1f}s OCR ({saved / (len(corpus) * seconds):.0%})")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+Сравнение пропускной способности OCR задач: новый event loop и новые
+сервисы на каждую задачу против долгоживущего loop и общих сервисов.
+
+Django API эмулируется локальным HTTP сервером, распознавание замокано,
+поэтому измеряются только накладные расходы воркера.
+
+Запуск: python -m benchmarks.worker_loop_throughput [количество задач]
+"""
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+from app.services.django_service import DjangoService
+from app.services.email_service import EmailService
+from app.services.ocr_service import OCRService
+from app.services.task_events import TaskEventPublisher
+from app.services.result_store import RedisResultStore
+from app.services.language import LanguageDetector
+from app.services.text_presence import TextPresenceFilter
+from app.core.config import settings
+
+tasks = __import__('app.tasks.celery_app', fromlist=['celery_app'])
+
+class ImageDataHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        body = json.dumps({
+            'id': str(uuid4()),
+            'title': 'Receipt',
+            'image_url': 'http://localhost/media/receipt.jpg',
+            'uploaded_at': '2026-02-16T10:00:00',
+            'size': 20480,
+            'width': 600,
+            'height': 800,
+            'format': 'jpg'
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+async def _old_task(base_url: str, image_id: str):
+    """Поведение до изменений: сервисы и HTTP клиент создаются на каждую задачу"""
+    django_service = DjangoService(base_url=base_url)
+    OCRService()
+    EmailService()
+    try:
+        await django_service.get_image(image_id)
+    finally:
+        await django_service.close()
+
+def run_old(base_url: str, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(_old_task(base_url, str(uuid4())))
+        loop.close()
+    return time.perf_counter() - started
+
+def run_new(base_url: str, count: int) -> float:
+    tasks.worker_process_init_handler()
+    services = tasks.get_worker_services()
+    services.django_service.base_url = base_url
+    started = time.perf_counter()
+    for _ in range(count):
+        tasks.run_async(tasks._process_ocr_async(str(uuid4()), False, None, 'bench'))
+    elapsed = time.perf_counter() - started
+    tasks.worker_process_shutdown_handler()
+    return elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    logging.disable(logging.CRITICAL)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageDataHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/api"
+    
+    ocr_result = {'text': 'receipt', 'confidence': 90.0}
+    with patch.object(settings, 'IMAGE_METADATA_CACHE_ENABLED', False), \
+         patch.object(OCRService, 'download_image', AsyncMock(return_value=MagicMock(size=(600, 800)))), \
+         patch.object(OCRService, 'recognize_with_confidence', AsyncMock(return_value=ocr_result)), \
+         patch.object(TaskEventPublisher, 'publish', AsyncMock()), \
+         patch.object(RedisResultStore, 'save', AsyncMock()), \
+         patch.object(LanguageDetector, 'detect', AsyncMock(return_value='rus')), \
+         patch.object(TextPresenceFilter, 'has_text', AsyncMock(return_value=True)):
+        old = run_old(base_url, count)
+        new = run_new(base_url, count)
+    
+    server.shutdown()
+    print(f"tasks: {count}")
+    print(f"per-task loop and services: {old:.2f}s ({count / old:.0f} tasks/s)")
+    print(f"persistent loop and services: {new:.2f}s ({count / new:.0f} tasks/s)")
+    print(f"speedup: x{old / new:.2f}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -8,6 +8,11 @@ from app.core.config import settings
 from app.services.django_service import DjangoService
 from app.services.ocr_service import OCRService
 from app.services.email_service import EmailService
+from app.services.task_dedup import TaskDeduplicator
+from app.services.image_metadata import ImageMetadataCache
+from app.services.admission import AdmissionController
+from app.services.language import LanguageDetector
+from app.services.dead_letter import DeadLetterQueue
 
 @pytest.fixture
 def app():
@@ -24,16 +29,17 @@ def mock_django_service():
     """Мок для Django сервиса"""
     service = AsyncMock(spec=DjangoService)
     
-    # Мок для get_image
-    mock_image = MagicMock()
-    mock_image.id = uuid4()
-    mock_image.title = "Test Image"
-    mock_image.image_url = "http://test.com/image.jpg"
-    mock_image.uploaded_at = "2026-02-16T10:00:00"
-    mock_image.size = 1024
-    mock_image.width = 800
-    mock_image.height = 600
-    mock_image.format = "jpg"
+    # Мок для get_image (Django api-data возвращает словарь)
+    mock_image = {
+        'id': str(uuid4()),
+        'title': "Test Image",
+        'image_url': "http://test.com/image.jpg",
+        'uploaded_at': "2026-02-16T10:00:00",
+        'size': 1024,
+        'width': 800,
+        'height': 600,
+        'format': "jpg"
+    }
     
     service.get_image.return_value = mock_image
     return service
@@ -55,6 +61,139 @@ def mock_email_service():
     service.send_ocr_result.return_value = True
     return service
 
+class FakePipeline:
+    """Конвейер FakeRedis: команды выполняются по execute()"""
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+    
+    def set(self, *args, **kwargs):
+        self.commands.append(self.redis.set(*args, **kwargs))
+    
+    def get(self, key):
+        self.commands.append(self.redis.get(key))
+    
+    def llen(self, key):
+        self.commands.append(self.redis.llen(key))
+    
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+        return lambda *args, **kwargs: self.commands.append(command(*args, **kwargs))
+    
+    async def execute(self):
+        return [await command for command in self.commands]
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *args):
+        pass
+
+class FakeRedis:
+    """Минимальная замена Redis в памяти (SET NX, GET, MGET, LLEN, хэши, sorted set, скрипт снятия ключа)"""
+    def __init__(self):
+        self.data = {}
+    
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+    
+    async def get(self, key):
+        return self.data.get(key)
+    
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+    
+    async def llen(self, key):
+        return len(self.data.get(key, []))
+    
+    async def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+        return 1
+    
+    async def hmget(self, key, fields):
+        values = self.data.get(key, {})
+        return [values.get(field) for field in fields]
+    
+    async def hdel(self, key, *fields):
+        values = self.data.get(key, {})
+        return sum(1 for field in fields if values.pop(field, None) is not None)
+    
+    async def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+        return len(mapping)
+    
+    async def zcard(self, key):
+        return len(self.data.get(key, {}))
+    
+    async def zrem(self, key, *members):
+        scores = self.data.get(key, {})
+        return sum(1 for member in members if scores.pop(member, None) is not None)
+    
+    def _zsorted(self, key):
+        scores = self.data.get(key, {})
+        return sorted(scores, key=lambda member: (scores[member], member))
+    
+    async def zrange(self, key, start, end):
+        members = self._zsorted(key)
+        return members[start:len(members) if end == -1 else end + 1]
+    
+    async def zrevrange(self, key, start, end):
+        members = self._zsorted(key)[::-1]
+        return members[start:len(members) if end == -1 else end + 1]
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+    
+    async def eval(self, script, numkeys, key, value):
+        if self.data.get(key) == value:
+            del self.data[key]
+            return 1
+        return 0
+    
+    async def aclose(self):
+        pass
+
+@pytest.fixture
+def task_dedup():
+    """Сервис дедупликации задач поверх Redis в памяти"""
+    service = TaskDeduplicator()
+    service._redis = FakeRedis()
+    return service
+
+@pytest.fixture
+def metadata_cache():
+    """Кэш метаданных изображений поверх Redis в памяти"""
+    cache = ImageMetadataCache(media_base_url="http://web:8000")
+    cache._redis = FakeRedis()
+    return cache
+
+@pytest.fixture
+def admission():
+    """Контроль приема задач поверх Redis в памяти"""
+    controller = AdmissionController(
+        queues=['ocr.small'], max_depth=100, max_wait=60, min_drain_rate=0.5,
+        sample_interval=1, retry_after_max=300
+    )
+    controller._redis = FakeRedis()
+    return controller
+
+@pytest.fixture
+def language_detector():
+    """Определение языков с кэшем в Redis в памяти"""
+    detector = LanguageDetector(default_languages='rus+eng', sample_side=1200)
+    detector._redis = FakeRedis()
+    return detector
+
+@pytest.fixture
+def dead_letter():
+    """Dead-letter очередь поверх Redis в памяти"""
+    queue = DeadLetterQueue(max_items=3)
+    queue._redis = FakeRedis()
+    return queue
+
 @pytest.fixture
 def sample_image_id():
     """Фикстура с примером UUID"""
@@ -0,0 +1,95 @@
+import asyncio
+import io
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi import status
+from PIL import Image
+
+@pytest.fixture
+def sync_client(client, mock_django_service, mock_ocr_service):
+    client.app.state.django_service = mock_django_service
+    client.app.state.ocr_service = mock_ocr_service
+    client.app.state.email_service = MagicMock()
+    client.app.state.result_store = AsyncMock()
+    mock_ocr_service.read_image_bytes.return_value = b'image'
+    sync_ocr = MagicMock(deadline=2.0, busy=False)
+    sync_ocr.recognize = AsyncMock(return_value={'text': 'Итого 100', 'confidence': 91.0})
+    sync_ocr.image_size.side_effect = lambda data: Image.open(io.BytesIO(data)).size
+    client.app.state.sync_ocr = sync_ocr
+    return client
+
+def png_bytes(width, height):
+    buffer = io.BytesIO()
+    Image.new('L', (width, height), 255).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def test_busy_pool_queues_without_download(sync_client, mock_ocr_service, sample_image_id):
+    """При занятом пуле изображение не загружается, задача сразу ставится в очередь"""
+    sync_client.app.state.sync_ocr.busy = True
+    
+    with patch('app.api.routes.process_ocr_task') as mock_task:
+        mock_task.apply_async.return_value = MagicMock(id='task-1')
+        response = sync_client.post("/api/v1/analyze_sync", data={"image_id": str(sample_image_id)})
+    
+    assert response.json()["reason"] == "busy"
+    mock_ocr_service.read_image_bytes.assert_not_awaited()
+    sync_client.app.state.sync_ocr.recognize.assert_not_awaited()
+
+def test_small_image_recognized_synchronously(sync_client, sample_image_id):
+    """Небольшое изображение распознается без очереди, результат сохраняется"""
+    with patch('app.api.routes.process_ocr_task') as mock_task:
+        response = sync_client.post("/api/v1/analyze_sync", data={"image_id": str(sample_image_id)})
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["path"] == "sync"
+    assert data["text"] == "Итого 100"
+    assert data["task_id"] is None
+    mock_task.apply_async.assert_not_called()
+    sync_client.app.state.result_store.save.assert_awaited_once()
+
+@pytest.mark.parametrize("size, recognize, reason", [
+    ((4000, 3000), None, 'cost'),
+    ((800, 600), AsyncMock(return_value=None), 'busy'),
+    ((800, 600), AsyncMock(side_effect=asyncio.TimeoutError), 'deadline'),
+])
+def test_falls_back_to_queue(sync_client, mock_django_service, sample_image_id, size, recognize, reason):
+    """Дорогое изображение, занятый пул или истекший срок - задача в очередь"""
+    mock_django_service.get_image.return_value.update(width=size[0], height=size[1])
+    if recognize is not None:
+        sync_client.app.state.sync_ocr.recognize = recognize
+    
+    with patch('app.api.routes.process_ocr_task') as mock_task:
+        mock_task.apply_async.return_value = MagicMock(id='task-1')
+        response = sync_client.post("/api/v1/analyze_sync", data={"image_id": str(sample_image_id)})
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "path": "queued", "reason": reason, "image_id": str(sample_image_id),
+        "text": None, "confidence": None, "task_id": "task-1"
+    }
+    assert mock_task.apply_async.call_args.kwargs['kwargs']['send_email'] is False
+
+def test_upload_recognized_synchronously(sync_client):
+    """Загруженный файл распознается без обращения к Django"""
+    response = sync_client.post(
+        "/api/v1/analyze_sync", files={"file": ("receipt.png", png_bytes(400, 300), "image/png")}
+    )
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["path"] == "sync"
+    sync_client.app.state.django_service.get_image.assert_not_called()
+
+def test_large_upload_rejected(sync_client):
+    """Слишком большое для быстрого пути изображение не принимается загрузкой"""
+    response = sync_client.post(
+        "/api/v1/analyze_sync", files={"file": ("scan.png", png_bytes(3000, 3000), "image/png")}
+    )
+    
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    sync_client.app.state.sync_ocr.recognize.assert_not_called()
+
+def test_requires_image_id_or_file(sync_client):
+    response = sync_client.post("/api/v1/analyze_sync", data={})
+    
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
\ No newline at end of file
@@ -0,0 +1,33 @@
+from unittest.mock import patch, MagicMock
+from uuid import uuid4
+from prometheus_client import REGISTRY
+
+from app.core.metrics import observe_stage
+
+def request_samples(endpoint, status):
+    return REGISTRY.get_sample_value(
+        'http_requests_total', {'method': 'GET', 'endpoint': endpoint, 'status': status}
+    ) or 0
+
+def test_requests_labeled_by_route_template(client):
+    """Запросы к разным task_id попадают в одну серию шаблона маршрута"""
+    endpoint = "/api/v1/task_status/{task_id}"
+    before = request_samples(endpoint, '2xx')
+    
+    with patch('celery.result.AsyncResult') as mock_async_result:
+        mock_async_result.return_value = MagicMock(state='PENDING')
+        for _ in range(3):
+            client.get(f"/api/v1/task_status/{uuid4()}")
+    client.get("/no/such/path")
+    
+    assert request_samples(endpoint, '2xx') - before == 3
+    assert request_samples('unmatched', '4xx') >= 1
+
+def test_observe_stage_records_duration():
+    """Длительность этапа OCR записывается в гистограмму этапа"""
+    before = REGISTRY.get_sample_value('ocr_stage_seconds_count', {'stage': 'decode'}) or 0
+    
+    with observe_stage('decode'):
+        pass
+    
+    assert REGISTRY.get_sample_value('ocr_stage_seconds_count', {'stage': 'decode'}) == before + 1
\ No newline at end of file
@@ -3,6 +3,9 @@ from unittest.mock import patch, MagicMock, AsyncMock
 from uuid import uuid4
 from fastapi import status
 
+from app.core.config import settings
+from app.core.exceptions import QueueOverloadedException
+
 def test_health_check(client):
     """Тест проверки здоровья"""
     response = client.get("/health")
@@ -16,18 +19,19 @@ def test_root_endpoint(client):
     assert "message" in response.json()
 
 @pytest.mark.asyncio
-async def test_analyze_doc_success(client, mock_django_service, mock_ocr_service, mock_email_service, sample_image_id):
+async def test_analyze_doc_success(client, mock_django_service, mock_ocr_service, mock_email_service, task_dedup, sample_image_id):
     """Тест успешного запуска OCR"""
     with patch('app.api.routes.process_ocr_task') as mock_task:
         # Настройка мока задачи
         mock_async_result = MagicMock()
         mock_async_result.id = "test-task-id-123"
-        mock_task.delay.return_value = mock_async_result
+        mock_task.apply_async.return_value = mock_async_result
         
         # Подмена сервисов в state
         client.app.state.django_service = mock_django_service
         client.app.state.ocr_service = mock_ocr_service
         client.app.state.email_service = mock_email_service
+        client.app.state.task_dedup = task_dedup
         
         # Отправка запроса
         response = client.post(
@@ -43,15 +47,18 @@ async def test_analyze_doc_success(client, mock_django_service, mock_ocr_service
         data = response.json()
         assert data["task_id"] == "test-task-id-123"
         assert data["status"] == "processing"
+        assert mock_task.apply_async.call_args.kwargs["queue"] == "ocr.small"
+        assert mock_task.apply_async.call_args.kwargs["kwargs"]["image_data"]["title"] == "Test Image"
 
 @pytest.mark.asyncio
-async def test_analyze_doc_image_not_found(client, mock_django_service, sample_image_id):
+async def test_analyze_doc_image_not_found(client, mock_django_service, task_dedup, sample_image_id):
     """Тест, когда изображение не найдено"""
     # Настройка мока на ошибку
     from app.core.exceptions import ImageNotFoundException
     mock_django_service.get_image.side_effect = ImageNotFoundException(str(sample_image_id))
     
     client.app.state.django_service = mock_django_service
+    client.app.state.task_dedup = task_dedup
     
     response = client.post(
         "/api/v1/analyze_doc",
@@ -63,6 +70,66 @@ async def test_analyze_doc_image_not_found(client, mock_django_service, sample_i
     
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert "не найдено" in response.json()["detail"]
+    assert task_dedup.redis.data == {}
+
+def test_analyze_doc_deduplicates_in_flight(client, mock_django_service, task_dedup, sample_image_id):
+    """Повторный запрос, пока задача выполняется, возвращает ту же задачу"""
+    client.app.state.django_service = mock_django_service
+    client.app.state.ocr_service = MagicMock()
+    client.app.state.email_service = MagicMock()
+    client.app.state.task_dedup = task_dedup
+    payload = {"image_id": str(sample_image_id), "send_email": False}
+    
+    with patch('app.api.routes.process_ocr_task') as mock_task:
+        mock_task.apply_async.side_effect = lambda **kwargs: MagicMock(id=kwargs['task_id'])
+        first = client.post("/api/v1/analyze_doc", json=payload).json()
+        second = client.post("/api/v1/analyze_doc", json=payload).json()
+        other = client.post("/api/v1/analyze_doc", json=payload, headers={"Idempotency-Key": "abc"}).json()
+        again = client.post("/api/v1/analyze_doc", json=payload, headers={"Idempotency-Key": "abc"}).json()
+        reused = client.post(
+            "/api/v1/analyze_doc", json={**payload, "send_email": True}, headers={"Idempotency-Key": "abc"}
+        ).json()
+    
+    assert second["task_id"] == first["task_id"]
+    assert second["deduplicated"] is True
+    assert other["task_id"] != first["task_id"]
+    assert again["task_id"] == other["task_id"]
+    assert reused["task_id"] != other["task_id"]
+    assert mock_task.apply_async.call_count == 3
+    release_key = mock_task.apply_async.call_args_list[0].kwargs['kwargs']['release_key']
+    assert task_dedup.redis.data[release_key] == first["task_id"]
+
+def test_analyze_doc_queue_overloaded(client, mock_django_service, task_dedup, sample_image_id):
+    """При переполненной очереди задача не ставится: 429 и Retry-After"""
+    client.app.state.django_service = mock_django_service
+    client.app.state.ocr_service = MagicMock()
+    client.app.state.email_service = MagicMock()
+    client.app.state.task_dedup = task_dedup
+    admission = MagicMock()
+    admission.check = AsyncMock(side_effect=QueueOverloadedException(settings.OCR_QUEUE_SMALL, 42))
+    client.app.state.admission = admission
+    
+    with patch('app.api.routes.process_ocr_task') as mock_task:
+        response = client.post("/api/v1/analyze_doc", json={"image_id": str(sample_image_id)})
+    
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "42"
+    mock_task.apply_async.assert_not_called()
+    assert task_dedup.redis.data == {}
+
+def test_rate_limited_request_gets_429(client, sample_image_id):
+    """Запрос сверх лимита отклоняется до обработчика маршрута"""
+    rate_limiter = MagicMock()
+    rate_limiter.hit = AsyncMock(return_value=7)
+    client.app.state.rate_limiter = rate_limiter
+    
+    with patch('app.api.routes.process_ocr_task') as mock_task:
+        response = client.post("/api/v1/analyze_doc", json={"image_id": str(sample_image_id)})
+    
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "7"
+    assert rate_limiter.hit.await_args.args[1] == "/api/v1/analyze_doc"
+    mock_task.apply_async.assert_not_called()
 
 def test_send_message_to_email_success(client, mock_email_service):
     """Тест успешной отправки email"""
@@ -91,4 +158,296 @@ def test_get_task_status_pending(client):
         response = client.get("/api/v1/task_status/test-task-id")
         
         assert response.status_code == status.HTTP_200_OK
-        assert response.json()["state"] == 'PENDING'
\ No newline at end of file
+        assert response.json()["state"] == 'PENDING'
+
+def test_analyze_batch_success(client, mock_django_service, mock_ocr_service, mock_email_service):
+    """Тест пакетного запуска OCR: одна bulk-проверка и одна публикация группы"""
+    found_id, missing_id = str(uuid4()), str(uuid4())
+    mock_django_service.get_images.return_value = ({found_id: {'id': found_id}}, [missing_id])
+    
+    client.app.state.django_service = mock_django_service
+    client.app.state.ocr_service = mock_ocr_service
+    client.app.state.email_service = mock_email_service
+    
+    with patch('app.api.routes.group') as mock_group:
+        child = MagicMock()
+        child.id = "child-task-id"
+        group_result = MagicMock()
+        group_result.id = "batch-id-123"
+        group_result.results = [child]
+        mock_group.return_value.apply_async.return_value = group_result
+        
+        response = client.post(
+            "/api/v1/analyze_batch",
+            json={"image_ids": [found_id, missing_id], "send_email": False}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["batch_id"] == "batch-id-123"
+        assert data["task_ids"] == ["child-task-id"]
+        assert data["missing_ids"] == [missing_id]
+        mock_django_service.get_images.assert_awaited_once()
+        mock_group.return_value.apply_async.assert_called_once()
+        group_result.save.assert_called_once()
+
+def test_analyze_batch_with_callback_keeps_group_id(client, mock_django_service):
+    """batch_id пакета с callback - это id опубликованной группы, задачи пакета помечены batch_member"""
+    found_id = str(uuid4())
+    mock_django_service.get_images.return_value = ({found_id: {'id': found_id}}, [])
+    client.app.state.django_service = mock_django_service
+    client.app.state.ocr_service = MagicMock()
+    client.app.state.email_service = MagicMock()
+    
+    with patch('app.api.routes.chord') as mock_chord:
+        group_result = mock_chord.return_value.apply_async.return_value.parent
+        group_result.results = [MagicMock(id="child-task-id")]
+        
+        response = client.post(
+            "/api/v1/analyze_batch",
+            json={"image_ids": [found_id], "send_email": False, "notify_on_complete": True}
+        )
+    
+    assert response.status_code == status.HTTP_200_OK
+    batch_id = response.json()["batch_id"]
+    header, callback = mock_chord.call_args.args
+    assert mock_chord.call_args.kwargs["task_id"] == batch_id
+    assert callback.kwargs["batch_id"] == batch_id
+    assert all(signature.kwargs["batch_member"] for signature in header.tasks)
+    group_result.save.assert_called_once()
+
+def test_analyze_batch_queue_overloaded(client, mock_django_service):
+    """Пакет не ставится, если перегружена очередь любой его задачи"""
+    small_id, large_id = str(uuid4()), str(uuid4())
+    mock_django_service.get_images.return_value = (
+        {small_id: {'id': small_id}, large_id: {'id': large_id, 'width': 10000, 'height': 10000}}, []
+    )
+    client.app.state.django_service = mock_django_service
+    client.app.state.ocr_service = MagicMock()
+    client.app.state.email_service = MagicMock()
+    admission = MagicMock()
+    admission.check = AsyncMock(side_effect=[None, QueueOverloadedException(settings.OCR_QUEUE_LARGE, 42)])
+    client.app.state.admission = admission
+    
+    with patch('app.api.routes.group') as mock_group:
+        response = client.post("/api/v1/analyze_batch", json={"image_ids": [small_id, large_id]})
+    
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "42"
+    checked = [call.args[0] for call in admission.check.await_args_list]
+    assert sorted(checked) == sorted([settings.OCR_QUEUE_SMALL, settings.OCR_QUEUE_LARGE])
+    mock_group.return_value.apply_async.assert_not_called()
+
+def test_analyze_batch_too_large(client, mock_django_service):
+    """Тест ограничения размера пакета"""
+    client.app.state.django_service = mock_django_service
+    client.app.state.ocr_service = MagicMock()
+    client.app.state.email_service = MagicMock()
+    
+    with patch('app.api.routes.settings') as mock_settings:
+        mock_settings.OCR_BATCH_MAX_SIZE = 1
+        response = client.post(
+            "/api/v1/analyze_batch",
+            json={"image_ids": [str(uuid4()), str(uuid4())]}
+        )
+    
+    assert response.status_code == 413
+    mock_django_service.get_images.assert_not_called()
+
+def test_get_batch_status(client):
+    """Тест агрегированного прогресса пакета"""
+    from app.services.task_status import TaskStatusService
+    
+    states = ['SUCCESS', 'SUCCESS', 'FAILURE', 'STARTED']
+    task_status = MagicMock(spec=TaskStatusService)
+    task_status.get_many.return_value = {
+        f"task-{i}": {'status': state} for i, state in enumerate(states)
+    }
+    client.app.state.task_status = task_status
+    
+    with patch('celery.result.GroupResult.restore') as mock_restore:
+        group_result = MagicMock()
+        group_result.results = [MagicMock(id=f"task-{i}") for i in range(len(states))]
+        mock_restore.return_value = group_result
+        
+        response = client.get("/api/v1/batch_status/batch-id-123")
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["total"] == 4
+        assert data["done"] == 2
+        assert data["failed"] == 1
+        assert data["pending"] == 1
+        assert data["completed"] is False
+
+def test_get_batch_status_counts_failed_batch_members(client):
+    """Задача пакета, вернувшая результат failed, считается ошибкой"""
+    from app.services.task_status import TaskStatusService
+    
+    task_status = MagicMock(spec=TaskStatusService)
+    task_status.get_many.return_value = {
+        "task-0": {'status': 'SUCCESS', 'result': {'status': 'completed'}},
+        "task-1": {'status': 'SUCCESS', 'result': {'status': 'failed', 'error': 'not found'}}
+    }
+    client.app.state.task_status = task_status
+    
+    with patch('celery.result.GroupResult.restore') as mock_restore:
+        mock_restore.return_value.results = [MagicMock(id="task-0"), MagicMock(id="task-1")]
+        data = client.get("/api/v1/batch_status/batch-id-123").json()
+    
+    assert (data["done"], data["failed"], data["completed"]) == (1, 1, True)
+
+def test_task_events_stream(client):
+    """SSE поток отдает текущее состояние и этапы до завершения задачи"""
+    import asyncio
+    from contextlib import asynccontextmanager
+    
+    class StubBroker:
+        @asynccontextmanager
+        async def subscribe(self, task_id):
+            queue = asyncio.Queue()
+            for stage in ('fetched', 'downloaded', 'ocr'):
+                queue.put_nowait({'task_id': task_id, 'stage': stage})
+            queue.put_nowait({'task_id': task_id, 'stage': 'completed', 'email_queued': False})
+            yield queue
+    
+    client.app.state.task_events = StubBroker()
+    
+    with patch('celery.result.AsyncResult') as mock_async_result:
+        mock_async_result.return_value.state = 'STARTED'
+        response = client.get("/api/v1/task_events/test-task-id")
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line.split(": ", 1)[1] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events == ['state', 'fetched', 'downloaded', 'ocr', 'completed']
+
+def test_get_task_status_bulk(client):
+    """Тест пакетного получения статусов задач"""
+    from app.services.task_status import TaskStatusService
+    
+    task_status = MagicMock(spec=TaskStatusService)
+    task_status.get_many.return_value = {
+        'task-1': {'status': 'SUCCESS', 'result': {'text': 'Hello'}},
+        'task-2': {'status': 'STARTED', 'result': None},
+        'task-3': {'status': 'PENDING', 'result': None}
+    }
+    client.app.state.task_status = task_status
+    
+    response = client.post(
+        "/api/v1/task_status/bulk",
+        json={"task_ids": ["task-1", "task-2", "task-3"]}
+    )
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["tasks"] == {
+        'task-1': {'state': 'SUCCESS'},
+        'task-2': {'state': 'STARTED'},
+        'task-3': {'state': 'PENDING'}
+    }
+    task_status.get_many.assert_called_once_with(["task-1", "task-2", "task-3"])
+    
+    response = client.post(
+        "/api/v1/task_status/bulk",
+        json={"task_ids": ["task-1", "task-2", "task-3"], "pending_only": True}
+    )
+    assert set(response.json()["tasks"]) == {'task-2', 'task-3'}
+    
+    response = client.post(
+        "/api/v1/task_status/bulk",
+        json={"task_ids": ["task-1"], "include_results": True}
+    )
+    assert response.json()["tasks"]["task-1"]["result"] == {'text': 'Hello'}
+
+def test_get_ocr_result(client, sample_image_id):
+    """Последний результат OCR читается из хранилища результатов"""
+    result_store = MagicMock()
+    result_store.get_latest = AsyncMock(return_value={
+        'task_id': 'task-1',
+        'text': 'Hello',
+        'confidence': 91.5,
+        'processed_at': '2024-01-01T00:00:00+00:00'
+    })
+    client.app.state.result_store = result_store
+    
+    response = client.get(f"/api/v1/result/{sample_image_id}")
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["text"] == "Hello"
+    assert response.json()["task_id"] == "task-1"
+    result_store.get_latest.assert_awaited_once_with(str(sample_image_id))
+
+def test_get_ocr_result_not_found(client, sample_image_id):
+    """Для изображения без результатов возвращается 404"""
+    result_store = MagicMock()
+    result_store.get_latest = AsyncMock(return_value=None)
+    client.app.state.result_store = result_store
+    
+    response = client.get(f"/api/v1/result/{sample_image_id}")
+    
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_get_ocr_result_layout_formats(client, sample_image_id):
+    """Разметка слов отдается в JSON, hOCR и TSV из одного сохраненного результата"""
+    layout = {'pages': [[200, 100]], 'text': ['Hello', 'World'], 'conf': [95, 88], 'left': [10, 70],
+              'top': [20, 20], 'width': [50, 60], 'height': [15, 15], 'page_num': [1, 1],
+              'block': [1, 1], 'par': [1, 1], 'line': [1, 1]}
+    result_store = MagicMock()
+    result_store.get_latest = AsyncMock(return_value={
+        'task_id': 'task-1',
+        'text': 'Hello World',
+        'confidence': 91.5,
+        'processed_at': '2024-01-01T00:00:00+00:00',
+        'layout': layout
+    })
+    client.app.state.result_store = result_store
+    
+    response = client.get(f"/api/v1/result/{sample_image_id}?format=json")
+    assert response.json()["layout"] == layout
+    result_store.get_latest.assert_awaited_with(str(sample_image_id), with_layout=True)
+    
+    response = client.get(f"/api/v1/result/{sample_image_id}?format=hocr")
+    assert response.headers["content-type"].startswith("text/html")
+    assert "title='bbox 10 20 130 35'" in response.text
+    
+    response = client.get(f"/api/v1/result/{sample_image_id}?format=tsv")
+    assert response.headers["content-type"].startswith("text/tab-separated-values")
+    assert response.text.splitlines()[2].split('\t') == ['5', '1', '1', '1', '1', '2', '70', '20', '60', '15', '88', 'World']
+    
+    result_store.get_latest.return_value = {**result_store.get_latest.return_value, 'layout': None}
+    assert client.get(f"/api/v1/result/{sample_image_id}?format=tsv").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get(f"/api/v1/result/{sample_image_id}?format=pdf").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+@pytest.mark.asyncio
+async def test_list_and_replay_dead_letter_tasks(client, dead_letter):
+    """Упавшие задачи видны в API и переотправляются пакетом с новыми ID"""
+    for task_id in ('dead-1', 'dead-2'):
+        await dead_letter.add(
+            task_id, 'process_ocr_task', 'ocr.large',
+            kwargs={'image_id': f'img-{task_id}', 'send_email': False, 'image_data': {'width': 8000, 'height': 6000}},
+            exception=ConnectionError('Django is down'),
+            retries=3,
+            retryable=True
+        )
+    client.app.state.dead_letter = dead_letter
+    
+    data = client.get("/api/v1/dead_letter").json()
+    assert data["total"] == 2
+    assert [task["task_id"] for task in data["tasks"]] == ["dead-2", "dead-1"]
+    assert data["tasks"][0]["image_id"] == "img-dead-2"
+    
+    with patch('app.api.routes.process_ocr_task') as mock_task:
+        mock_task.apply_async.side_effect = [MagicMock(id='new-1')]
+        response = client.post("/api/v1/dead_letter/replay", json={"task_ids": ["dead-1", "missing"]})
+    
+    assert response.json() == {"replayed": {"dead-1": "new-1"}, "missing_ids": ["missing"]}
+    assert mock_task.apply_async.call_args.kwargs["queue"] == "ocr.large"
+    assert mock_task.apply_async.call_args.kwargs["kwargs"]["image_id"] == "img-dead-1"
+    assert await dead_letter.oldest(10) == ["dead-2"]
+    
+    with patch('app.api.routes.process_ocr_task') as mock_task:
+        mock_task.apply_async.side_effect = ConnectionError('broker is down')
+        response = client.post("/api/v1/dead_letter/replay", json={})
+    
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert await dead_letter.oldest(10) == ["dead-2"]
\ No newline at end of file
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from types import ModuleType
+from unittest.mock import MagicMock
+from fastapi import status
+from app.core.lazy import lazy_import, load_lazy_modules
+
+# Модули, которые должны загружаться при первом использовании, а не при импорте приложения
+LAZY_MODULES = ('pytesseract', 'PIL.Image', 'jinja2', 'aiosmtplib')
+
+def test_app_import_skips_heavy_modules():
+    """python -X importtime: импорт приложения не тянет тяжелые зависимости OCR и email"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app.main'],
+        capture_output=True, text=True, cwd=os.getcwd(), check=True
+    )
+    
+    imported = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            imported[name.strip()] = int(cumulative)
+    
+    assert 'app.main' in imported
+    slowest = sorted(imported.items(), key=lambda item: -item[1])[:10]
+    for module in LAZY_MODULES:
+        assert module not in imported, f"{module} imported eagerly; slowest imports: {slowest}"
+
+def test_load_lazy_modules(monkeypatch):
+    """Отложенный модуль загружается явно, до обращений из потоков пула"""
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+    module = lazy_import('colorsys')
+    assert type(module) is not ModuleType
+    
+    load_lazy_modules('colorsys')
+    
+    assert type(module) is ModuleType
+    assert module.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+
+def test_ready_without_probe_results(client):
+    """До первых проверок сервис не готов"""
+    response = client.get("/ready")
+    
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["status"] == "starting"
+
+def test_ready_reports_probe_state(client):
+    """/ready отдает последний результат фоновых проверок"""
+    probe = MagicMock(ready=True)
+    probe.status.return_value = {'status': 'ready', 'checks': {'broker': {'ok': True}}}
+    client.app.state.readiness = probe
+    
+    response = client.get("/ready")
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["checks"]["broker"]["ok"] is True
\ No newline at end of file
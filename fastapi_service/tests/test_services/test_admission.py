@@ -0,0 +1,55 @@
+import pytest
+from unittest.mock import patch
+
+from app.core.exceptions import QueueOverloadedException
+from app.services.admission import DRAINED_KEY_PREFIX
+
+def fill_queue(admission, depth, drained=0):
+    admission.redis.data['ocr.small'] = ['task'] * depth
+    admission.redis.data[f"{DRAINED_KEY_PREFIX}ocr.small"] = str(drained)
+
+@pytest.mark.asyncio
+async def test_admits_below_thresholds(admission):
+    """Короткая очередь не мешает постановке задачи"""
+    fill_queue(admission, depth=10)
+    
+    await admission.check('ocr.small')
+    
+    assert admission.snapshot['ocr.small']['depth'] == 10
+    assert admission.snapshot['ocr.small']['estimated_wait'] == 20
+
+@pytest.mark.asyncio
+async def test_rejects_deep_queue(admission):
+    """Очередь глубже порога отклоняется с Retry-After"""
+    fill_queue(admission, depth=150)
+    
+    with pytest.raises(QueueOverloadedException) as exc_info:
+        await admission.check('ocr.small')
+    
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers['Retry-After'] == '240'
+
+@pytest.mark.asyncio
+async def test_drain_rate_lowers_estimated_wait(admission):
+    """Скорость разбора считается по приращению счетчика воркеров"""
+    fill_queue(admission, depth=50, drained=0)
+    with patch('app.services.admission.time.monotonic', return_value=100.0):
+        with pytest.raises(QueueOverloadedException):
+            await admission.check('ocr.small')
+    
+    fill_queue(admission, depth=50, drained=20)
+    with patch('app.services.admission.time.monotonic', return_value=110.0):
+        snapshot = await admission.sample()
+        await admission.check('ocr.small')
+    
+    assert snapshot['ocr.small']['drain_rate'] == 2.0
+    assert snapshot['ocr.small']['estimated_wait'] == 25
+
+@pytest.mark.asyncio
+async def test_admits_when_redis_unavailable(admission):
+    """Без данных об очереди задачи принимаются"""
+    def broken(*args, **kwargs):
+        raise ConnectionError('redis down')
+    admission.redis.llen = broken
+    
+    await admission.check('ocr.small')
\ No newline at end of file
@@ -0,0 +1,57 @@
+import pytest
+
+async def add(dead_letter, task_id, error=None):
+    return await dead_letter.add(
+        task_id, 'process_ocr_task', 'ocr.small',
+        kwargs={'image_id': f'img-{task_id}', 'send_email': False},
+        exception=error or ConnectionError('Django is down'),
+        retries=3,
+        retryable=True
+    )
+
+@pytest.mark.asyncio
+async def test_list_returns_newest_first(dead_letter):
+    """Записи отдаются от новых к старым вместе с общим числом"""
+    for task_id in ('task-1', 'task-2'):
+        assert await add(dead_letter, task_id) is True
+    
+    total, entries = await dead_letter.list(limit=10)
+    
+    assert total == 2
+    assert [entry['task_id'] for entry in entries] == ['task-2', 'task-1']
+    assert entries[0]['exception'] == 'ConnectionError'
+    assert entries[0]['kwargs']['image_id'] == 'img-task-2'
+
+@pytest.mark.asyncio
+async def test_oldest_entries_are_evicted(dead_letter):
+    """Очередь ограничена: самые старые записи вытесняются"""
+    for i in range(5):
+        await add(dead_letter, f'task-{i}')
+    
+    total, entries = await dead_letter.list(limit=10)
+    
+    assert total == 3
+    assert [entry['task_id'] for entry in entries] == ['task-4', 'task-3', 'task-2']
+
+@pytest.mark.asyncio
+async def test_pop_takes_entry_once(dead_letter):
+    """Извлеченная запись удаляется, и повторное извлечение ее не находит"""
+    await add(dead_letter, 'task-1')
+    await add(dead_letter, 'task-2')
+    
+    entries = await dead_letter.pop(['task-1', 'missing'])
+    
+    assert [entry['task_id'] for entry in entries] == ['task-1']
+    assert await dead_letter.pop(['task-1']) == []
+    assert await dead_letter.oldest(10) == ['task-2']
+
+@pytest.mark.asyncio
+async def test_restore_keeps_original_order(dead_letter):
+    """Возвращенная запись встает на свое место по времени ошибки"""
+    await add(dead_letter, 'task-1')
+    await add(dead_letter, 'task-2')
+    entry, = await dead_letter.pop(['task-1'])
+    
+    await dead_letter.restore(entry)
+    
+    assert await dead_letter.oldest(10) == ['task-1', 'task-2']
\ No newline at end of file
@@ -0,0 +1,62 @@
+import json
+import httpx
+import pytest
+from uuid import uuid4
+
+from app.core.exceptions import ImageNotFoundException
+from app.services.django_service import DjangoService
+
+def make_service(metadata_cache, handler):
+    """DjangoService с подменой HTTP транспорта; запросы записываются в requests"""
+    requests = []
+    
+    def record(request):
+        requests.append(request)
+        return handler(request)
+    
+    service = DjangoService(base_url="http://web:8000/api", metadata_cache=metadata_cache)
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+    return service, requests
+
+@pytest.mark.asyncio
+async def test_get_image_reads_django_record_from_cache(metadata_cache):
+    """Запись, которую написал Django, читается без HTTP запроса"""
+    image_id = str(uuid4())
+    metadata_cache.redis.data[f"image_meta:{image_id}"] = json.dumps(
+        {'id': image_id, 'image_url': '/media/images/a.png', 'size': 10}
+    )
+    service, requests = make_service(metadata_cache, lambda request: httpx.Response(500))
+    
+    data = await service.get_image(image_id)
+    
+    assert data['image_url'] == "http://web:8000/media/images/a.png"
+    assert requests == []
+
+@pytest.mark.asyncio
+async def test_get_image_caches_not_found(metadata_cache):
+    """404 кэшируется, повторный запрос в Django не идет"""
+    image_id = str(uuid4())
+    service, requests = make_service(metadata_cache, lambda request: httpx.Response(404))
+    
+    for _ in range(2):
+        with pytest.raises(ImageNotFoundException):
+            await service.get_image(image_id)
+    
+    assert len(requests) == 1
+
+@pytest.mark.asyncio
+async def test_get_images_fetches_only_cache_misses(metadata_cache):
+    """Пакетный запрос уходит в Django только за отсутствующими в кэше ID"""
+    cached_id, fetched_id = str(uuid4()), str(uuid4())
+    metadata_cache.redis.data[f"image_meta:{cached_id}"] = json.dumps({'id': cached_id})
+    
+    def handler(request):
+        ids = json.loads(request.content)['ids']
+        return httpx.Response(200, json={'images': {i: {'id': i} for i in ids}, 'missing': []})
+    
+    service, requests = make_service(metadata_cache, handler)
+    found, missing = await service.get_images([cached_id, fetched_id])
+    
+    assert set(found) == {cached_id, fetched_id}
+    assert json.loads(requests[0].content)['ids'] == [fetched_id]
+    assert f"image_meta:{fetched_id}" in metadata_cache.redis.data
\ No newline at end of file
@@ -1,3 +1,4 @@
+import socket
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from app.services.email_service import EmailService
@@ -10,7 +11,7 @@ async def test_send_ocr_result_success():
     
     with patch('aiosmtplib.SMTP') as mock_smtp:
         mock_smtp_instance = AsyncMock()
-        mock_smtp.return_value.__aenter__.return_value = mock_smtp_instance
+        mock_smtp.return_value = mock_smtp_instance
         
         # Тестовые данные
         to_email = "test@example.com"
@@ -41,7 +42,7 @@ async def test_send_notification_success():
     
     with patch('aiosmtplib.SMTP') as mock_smtp:
         mock_smtp_instance = AsyncMock()
-        mock_smtp.return_value.__aenter__.return_value = mock_smtp_instance
+        mock_smtp.return_value = mock_smtp_instance
         
         result = await service.send_notification(
             to_email="test@example.com",
@@ -58,7 +59,7 @@ async def test_send_email_smtp_error():
     
     with patch('aiosmtplib.SMTP') as mock_smtp:
         mock_smtp_instance = AsyncMock()
-        mock_smtp.return_value.__aenter__.return_value = mock_smtp_instance
+        mock_smtp.return_value = mock_smtp_instance
         mock_smtp_instance.send_message.side_effect = Exception("SMTP error")
         
         with pytest.raises(EmailSendingException):
@@ -66,4 +67,120 @@ async def test_send_email_smtp_error():
                 to_email="test@example.com",
                 subject="Test",
                 body="Test"
-            )
\ No newline at end of file
+            )
+
+@pytest.mark.asyncio
+async def test_connection_reused_across_messages():
+    """Одно SMTP соединение обслуживает и OCR результаты, и уведомления"""
+    service = EmailService()
+    
+    with patch('aiosmtplib.SMTP') as mock_smtp:
+        mock_smtp_instance = AsyncMock()
+        mock_smtp_instance.is_connected = True
+        mock_smtp.return_value = mock_smtp_instance
+        
+        await service.send_ocr_result("test@example.com", {'title': 'Test'}, "Text", 90.0)
+        await service.send_notification("test@example.com", "Subject", "Body")
+        
+        mock_smtp.assert_called_once()
+        mock_smtp_instance.connect.assert_called_once()
+        assert mock_smtp_instance.send_message.call_count == 2
+        mock_smtp_instance.quit.assert_not_called()
+    
+    await service.close()
+    mock_smtp_instance.quit.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_reconnect_after_failed_noop():
+    """Соединение, не прошедшее NOOP проверку, заменяется новым"""
+    service = EmailService()
+    service.pool.healthcheck_interval = 0
+    
+    with patch('aiosmtplib.SMTP') as mock_smtp:
+        stale, fresh = AsyncMock(), AsyncMock()
+        stale.is_connected = fresh.is_connected = True
+        stale.noop.side_effect = ConnectionError("connection reset")
+        mock_smtp.side_effect = [stale, fresh]
+        
+        await service.send_notification("test@example.com", "First", "Body")
+        await service.send_notification("test@example.com", "Second", "Body")
+        
+        assert mock_smtp.call_count == 2
+        stale.send_message.assert_called_once()
+        fresh.send_message.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_resend_after_server_disconnect():
+    """Письмо отправляется повторно, если сервер закрыл соединение"""
+    import aiosmtplib
+    service = EmailService()
+    
+    with patch('aiosmtplib.SMTP') as mock_smtp:
+        dropped, fresh = AsyncMock(), AsyncMock()
+        dropped.is_connected = fresh.is_connected = True
+        dropped.send_message.side_effect = aiosmtplib.SMTPServerDisconnected("closed")
+        mock_smtp.side_effect = [dropped, fresh]
+        
+        result = await service.send_notification("test@example.com", "Subject", "Body")
+        
+        assert result is True
+        fresh.send_message.assert_called_once()
+        assert service.pool.idle_count == 1
+
+@pytest.mark.asyncio
+async def test_pool_against_local_smtp_server():
+    """Проверка пула на локальном SMTP сервере aiosmtpd"""
+    aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+    import aiosmtplib
+    
+    received = []
+    
+    class Handler:
+        async def handle_DATA(self, server, session, envelope):
+            received.append(envelope)
+            return '250 OK'
+    
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    
+    controller = aiosmtpd_controller.Controller(Handler(), hostname='127.0.0.1', port=port)
+    controller.start()
+    try:
+        service = EmailService()
+        service.pool.host = '127.0.0.1'
+        service.pool.port = port
+        service.pool.use_tls = False
+        service.pool.username = service.pool.password = None
+        service.from_email = 'noreply@example.com'
+        
+        connect = aiosmtplib.SMTP.connect
+        with patch.object(aiosmtplib.SMTP, 'connect', autospec=True, side_effect=connect) as spy:
+            for i in range(3):
+                await service.send_notification("test@example.com", f"Subject {i}", "Body")
+            await service.send_ocr_result("test@example.com", {'title': 'Test'}, "Text", 90.0)
+        
+        await service.close()
+        
+        assert len(received) == 4
+        assert spy.call_count == 1
+    finally:
+        controller.stop()
+
+@pytest.mark.asyncio
+async def test_send_ocr_digest_renders_all_results():
+    """Дайджест содержит все результаты в одном письме"""
+    service = EmailService()
+    
+    with patch.object(service, '_send_email', new_callable=AsyncMock) as mock_send:
+        result = await service.send_ocr_digest("test@example.com", [
+            {'image_data': {'title': 'First'}, 'ocr_text': 'Text one', 'confidence': 90.0},
+            {'image_data': {'title': 'Second'}, 'ocr_text': 'Text two', 'confidence': None}
+        ])
+    
+    assert result is True
+    message = mock_send.call_args.args[0]
+    html = message.get_payload()[1].get_payload(decode=True).decode()
+    assert 'First' in html and 'Second' in html
+    assert 'Text one' in html and 'Text two' in html
+    assert '2 изображений' in message['Subject']
\ No newline at end of file
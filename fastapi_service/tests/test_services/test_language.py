@@ -0,0 +1,47 @@
+import pytest
+from unittest.mock import patch
+from PIL import Image
+from pydantic import ValidationError
+
+from app.models.schemas import OCRRequest
+
+@pytest.mark.asyncio
+async def test_detected_languages_are_cached(language_detector):
+    """Повторное изображение берет языки из кэша без OSD"""
+    image = Image.new('RGB', (800, 600), 'white')
+    
+    with patch.object(language_detector, '_osd', return_value='rus') as mock_osd:
+        assert await language_detector.detect(image) == 'rus'
+        assert await language_detector.detect(image.copy()) == 'rus'
+    
+    mock_osd.assert_called_once()
+    assert list(language_detector.redis.data.values()) == ['rus']
+
+@pytest.mark.asyncio
+async def test_falls_back_to_all_languages(language_detector):
+    """Без уверенного результата OSD используется полный набор языков"""
+    with patch.object(language_detector, '_osd', return_value=None):
+        assert await language_detector.detect(Image.new('L', (100, 100), 255)) == 'rus+eng'
+
+def test_osd_sample_is_downscaled(language_detector):
+    sample = language_detector._sample(Image.new('RGB', (4000, 1000), 'white'))
+    
+    assert sample.size == (1000, 250)
+    assert sample.mode == 'L'
+
+@pytest.mark.parametrize("osd, languages", [
+    ({'script': 'Cyrillic', 'script_conf': 6.5}, 'rus'),
+    ({'script': 'Latin', 'script_conf': 11.0}, 'eng'),
+    ({'script': 'Cyrillic', 'script_conf': 0.4}, None),
+    ({'script': 'Han', 'script_conf': 9.0}, None),
+])
+def test_script_mapped_to_languages(language_detector, osd, languages):
+    """Письменность OSD сопоставляется с языками только при достаточной уверенности"""
+    with patch('pytesseract.image_to_osd', return_value=osd):
+        assert language_detector._osd(Image.new('L', (100, 100), 255)) == languages
+
+def test_request_languages_override_validated():
+    """Клиент может выбрать только языки из OCR_LANGUAGES"""
+    assert OCRRequest(image_id='5f0c6f8e-8b7e-4c1a-9d7e-2b7a1c3d4e5f', languages='rus').languages == 'rus'
+    with pytest.raises(ValidationError):
+        OCRRequest(image_id='5f0c6f8e-8b7e-4c1a-9d7e-2b7a1c3d4e5f', languages='deu')
\ No newline at end of file
@@ -0,0 +1,49 @@
+from app.services.ocr_layout import words_layout, join_pages, summarize, to_hocr, to_tsv
+
+DATA = {
+    'text': ['', 'Hello', 'World', '', 'a<b'],
+    'conf': ['-1', '95', '88.5', '-1', '70'],
+    'left': [0, 10, 70, 0, 10],
+    'top': [0, 20, 22, 0, 60],
+    'width': [200, 50, 60, 0, 30],
+    'height': [100, 15, 15, 0, 12],
+    'block_num': [0, 1, 1, 2, 2],
+    'par_num': [0, 1, 1, 1, 1],
+    'line_num': [0, 1, 1, 1, 1]
+}
+
+def test_words_layout_is_columnar():
+    """Пустые элементы отбрасываются, слова хранятся колонками"""
+    layout = words_layout(DATA, (200, 100))
+    
+    assert layout['pages'] == [[200, 100]]
+    assert layout['text'] == ['Hello', 'World', 'a<b']
+    assert layout['conf'] == [95, 88, 70]
+    assert layout['block'] == [1, 1, 2]
+    assert summarize(layout) == {'text': 'Hello World a<b', 'confidence': round((95 + 88 + 70) / 3, 2)}
+
+def test_tsv_and_hocr_rendering():
+    """TSV содержит строку на слово, hOCR - рамки блоков, строк и слов"""
+    layout = words_layout(DATA, (200, 100))
+    
+    rows = to_tsv(layout).splitlines()
+    assert rows[0].startswith('level\tpage_num\tblock_num')
+    assert rows[3].split('\t') == ['5', '1', '2', '1', '1', '1', '10', '60', '30', '12', '70', 'a<b']
+    
+    hocr = to_hocr(layout)
+    assert "<div class='ocr_page' id='page_1' title='bbox 0 0 200 100; ppageno 0'>" in hocr
+    assert "<div class='ocr_carea' id='block_1_1' title='bbox 10 20 130 37'>" in hocr
+    assert "title='bbox 10 20 60 35; x_wconf 95'>Hello</span>" in hocr
+    assert '>a&lt;b</span>' in hocr
+    assert hocr.count("class='ocr_line'") == 2
+
+def test_pages_joined_in_order():
+    """Страницы документа нумеруются по порядку, пустая страница сохраняется"""
+    first = words_layout(DATA, (200, 100))
+    empty = words_layout({'text': []}, (300, 100))
+    layout = join_pages([first, empty, first])
+    
+    assert layout['pages'] == [[200, 100], [300, 100], [200, 100]]
+    assert layout['page_num'] == [1, 1, 1, 3, 3, 3]
+    assert to_tsv(layout).splitlines()[4].split('\t')[:2] == ['5', '3']
+    assert "id='page_2' title='bbox 0 0 300 100; ppageno 1'></div>" in to_hocr(layout).replace('>\n<', '><')
\ No newline at end of file
@@ -1,27 +1,50 @@
+import io
+import time
+import httpx
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
-from app.services.ocr_service import OCRService
-from app.core.exceptions import OCRProcessingException
+from app.services.ocr_service import OCRService, _split_into_bands
+from app.core.exceptions import OCRProcessingException, ImageTooLargeException
+
+def tesseract_data(text, conf, top=None, height=None):
+    """Результат image_to_data для слов в одной строке"""
+    count = len(text)
+    return {
+        'text': text,
+        'conf': conf,
+        'left': [10 * i for i in range(count)],
+        'top': top or [0] * count,
+        'width': [8] * count,
+        'height': height or [10] * count,
+        'block_num': [1] * count,
+        'par_num': [1] * count,
+        'line_num': [1] * count
+    }
+
+def serve(content=b'fake-image-content'):
+    """OCR сервис, загружающий изображения из ответа-заглушки"""
+    service = OCRService()
+    service._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=content))
+    )
+    return service
 
 @pytest.mark.asyncio
 async def test_extract_text_from_url_success():
     """Тест успешного извлечения текста из URL"""
-    service = OCRService()
+    service = serve()
     
-    with patch('httpx.AsyncClient.get') as mock_get, \
-         patch('PIL.Image.open') as mock_image_open, \
-         patch('pytesseract.image_to_string') as mock_tesseract:
+    with patch('PIL.Image.open') as mock_image_open, \
+         patch('pytesseract.image_to_data') as mock_tesseract:
         
         # Настройка моков
-        mock_response = MagicMock()
-        mock_response.raise_for_status = MagicMock()
-        mock_response.content = b'fake-image-content'
-        mock_get.return_value = mock_response
-        
         mock_image = MagicMock()
+        mock_image.size = (800, 600)
         mock_image_open.return_value = mock_image
         
-        mock_tesseract.return_value = "Extracted text from image"
+        mock_tesseract.return_value = tesseract_data(
+            ['Extracted', 'text', 'from', 'image'], ['90', '90', '90', '90']
+        )
         
         # Вызов метода
         result = await service.extract_text_from_url("http://test.com/image.jpg")
@@ -32,26 +55,18 @@ async def test_extract_text_from_url_success():
 @pytest.mark.asyncio
 async def test_extract_text_with_confidence_success():
     """Тест извлечения текста с уверенностью"""
-    service = OCRService()
+    service = serve()
     
-    with patch('httpx.AsyncClient.get') as mock_get, \
-         patch('PIL.Image.open') as mock_image_open, \
+    with patch('PIL.Image.open') as mock_image_open, \
          patch('pytesseract.image_to_data') as mock_tesseract_data:
         
         # Настройка моков
-        mock_response = MagicMock()
-        mock_response.raise_for_status = MagicMock()
-        mock_response.content = b'fake-image-content'
-        mock_get.return_value = mock_response
-        
         mock_image = MagicMock()
+        mock_image.size = (800, 600)
         mock_image_open.return_value = mock_image
         
         # Мок данных Tesseract
-        mock_tesseract_data.return_value = {
-            'text': ['Hello', 'World', '', ''],
-            'conf': ['95', '90', '-1', '-1']
-        }
+        mock_tesseract_data.return_value = tesseract_data(['Hello', 'World', '', ''], ['95', '90', '-1', '-1'])
         
         # Вызов метода
         result = await service.extract_text_with_confidence("http://test.com/image.jpg")
@@ -59,14 +74,174 @@ async def test_extract_text_with_confidence_success():
         assert 'text' in result
         assert 'confidence' in result
         assert result['text'] == 'Hello World'
+        assert result['layout']['text'] == ['Hello', 'World']
+        assert result['layout']['pages'] == [[800, 600]]
+        mock_tesseract_data.assert_called_once()
 
 @pytest.mark.asyncio
 async def test_extract_text_from_url_http_error():
     """Тест ошибки HTTP при загрузке изображения"""
+    def refuse(request):
+        raise httpx.ConnectError("Connection error")
+    
     service = OCRService()
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(refuse))
+    
+    with pytest.raises(OCRProcessingException):
+        await service.extract_text_from_url("http://test.com/image.jpg")
+        
+def test_split_into_bands_covers_image_once():
+    """Зоны владения полос покрывают изображение без пропусков и пересечений"""
+    bands = _split_into_bands(6000, 1500, 120)
+    
+    assert bands[0][0] == 0
+    assert bands[-1][1] == 6000
+    assert bands[0][2] == 0
+    assert bands[-1][3] == 6000
+    for current, following in zip(bands, bands[1:]):
+        assert current[1] > following[0]
+        assert current[3] == following[2]
+
+@pytest.mark.asyncio
+async def test_extract_text_with_confidence_tiled():
+    """Большое изображение распознается по полосам, дубли из перекрытия отбрасываются"""
+    service = serve()
+    service.tile_threshold = 1000
+    service.band_height = 100
+    service.band_overlap = 20
     
-    with patch('httpx.AsyncClient.get') as mock_get:
-        mock_get.side_effect = Exception("Connection error")
+    def fake_image_to_data(band, config=None, output_type=None):
+        # Нижнее слово каждой полосы совпадает с верхним словом следующей
+        return tesseract_data(['head', 'tail'], ['90', '60'], top=[5, 85])
+    
+    with patch('PIL.Image.open') as mock_image_open, \
+         patch('pytesseract.image_to_data', side_effect=fake_image_to_data):
+        
+        mock_image = MagicMock()
+        mock_image.size = (100, 260)
+        mock_image_open.return_value = mock_image
         
-        with pytest.raises(OCRProcessingException):
-            await service.extract_text_from_url("http://test.com/image.jpg")
\ No newline at end of file
+        result = await service.extract_text_with_confidence("http://test.com/image.jpg")
+        
+        # Полосы: [0,100), [80,180), [160,260); дубли из перекрытий отброшены
+        assert result['text'] == 'head head head tail'
+        assert result['confidence'] == round((90 * 3 + 60) / 4, 2)
+        assert mock_image.crop.call_count == 3
+        # Разметка в координатах всего изображения, блоки полос не совпадают
+        assert result['layout']['top'] == [5, 85, 165, 245]
+        assert result['layout']['block'] == [1, 2, 3, 3]
+
+@pytest.mark.asyncio
+async def test_open_local_image_from_media_volume(tmp_path):
+    """Файл с общего media тома читается напрямую, пути вне тома игнорируются"""
+    from PIL import Image
+    media = tmp_path / "media"
+    (media / "images").mkdir(parents=True)
+    Image.new('RGB', (40, 20), 'white').save(media / "images" / "a.png")
+    (tmp_path / "secret.png").write_bytes(b"")
+    
+    service = OCRService()
+    service.media_root = str(media)
+    
+    image = await service.open_local_image("images/a.png")
+    
+    assert image.size == (40, 20)
+    assert await service.open_local_image("images/missing.png") is None
+    assert await service.open_local_image("../secret.png") is None
+    assert await service.open_local_image(None) is None
+
+@pytest.mark.asyncio
+async def test_read_image_bytes_falls_back_to_http_when_file_disappears(tmp_path):
+    """Файл, пропавший после проверки пути, загружается по HTTP, а слишком большой - отклоняется"""
+    service = serve(content=b'from-http')
+    image_data = {'file_path': 'scan.png', 'image_url': 'http://test.com/scan.png'}
+    
+    with patch.object(service, '_resolve_media_path', return_value=str(tmp_path / 'scan.png')):
+        assert await service.read_image_bytes(image_data) == b'from-http'
+    
+    (tmp_path / 'scan.png').write_bytes(b'x' * 10)
+    service.max_download_bytes = 5
+    with patch.object(service, '_resolve_media_path', return_value=str(tmp_path / 'scan.png')):
+        with pytest.raises(ImageTooLargeException):
+            await service.read_image_bytes(image_data)
+
+@pytest.mark.asyncio
+async def test_download_rejected_by_content_length():
+    """Content-Length больше лимита отклоняется до чтения тела"""
+    service = serve(content=b'x' * 10)
+    service.max_download_bytes = 5
+    
+    with pytest.raises(ImageTooLargeException):
+        await service.download_image("http://test.com/image.jpg")
+
+@pytest.mark.asyncio
+async def test_download_stops_when_stream_exceeds_limit():
+    """Без Content-Length загрузка прерывается при превышении лимита"""
+    async def chunks():
+        for _ in range(10):
+            yield b'x' * 1024
+    
+    service = OCRService()
+    service._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=chunks()))
+    )
+    service.max_download_bytes = 4096
+    
+    with pytest.raises(ImageTooLargeException):
+        await service.download_image("http://test.com/image.jpg")
+
+@pytest.mark.asyncio
+async def test_large_jpeg_decoded_at_reduced_scale():
+    """Большой JPEG декодируется в уменьшенном масштабе через draft()"""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (2000, 1000), 'white').save(buffer, format='JPEG')
+    
+    service = serve(content=buffer.getvalue())
+    service.decode_max_side = 500
+    image = await service.download_image("http://test.com/image.jpg")
+    
+    assert image.size == (500, 250)
+    assert image.mode == 'L'
+    
+    service.decode_max_side = 0
+    assert (await service.download_image("http://test.com/image.jpg")).size == (2000, 1000)
+
+def multipage_tiff(path, shades=(0, 100, 200)):
+    """Многостраничный TIFF: страницы различаются яркостью"""
+    from PIL import Image
+    pages = [Image.new('L', (60, 80), shade) for shade in shades]
+    pages[0].save(path, 'TIFF', save_all=True, append_images=pages[1:])
+
+@pytest.mark.asyncio
+async def test_recognize_pages_in_page_order(tmp_path):
+    """Страницы распознаются параллельно, результат собирается в порядке страниц"""
+    multipage_tiff(tmp_path / "scan.tiff")
+    service = OCRService()
+    service.media_root = str(tmp_path)
+    image = await service.open_local_image("scan.tiff")
+    
+    def fake_image_to_data(page, config=None, output_type=None):
+        shade = page.getpixel((0, 0))
+        # Первая страница распознается дольше остальных
+        if shade == 0:
+            time.sleep(0.05)
+        return tesseract_data([f'page{shade}'], ['90'])
+    
+    progress = []
+    async def on_page(done, total):
+        progress.append((done, total))
+    
+    async def has_text(page):
+        return page.getpixel((0, 0)) != 200
+    
+    with patch('pytesseract.image_to_data', side_effect=fake_image_to_data) as mock_tesseract:
+        result = await service.recognize_with_confidence(image, 'eng', on_page=on_page, has_text=has_text)
+    
+    assert result['page_count'] == 3
+    assert result['text'] == 'page0 page100'
+    assert result['layout']['page_num'] == [1, 2]
+    assert result['layout']['pages'] == [[60, 80]] * 3
+    assert mock_tesseract.call_count == 2
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    await service.close()
\ No newline at end of file
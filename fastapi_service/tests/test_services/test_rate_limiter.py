@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from starlette.requests import Request
+
+from app.services.rate_limiter import RateLimiter, parse_rate
+
+def make_request(headers=None, ip='10.0.0.1'):
+    raw_headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({'type': 'http', 'method': 'POST', 'path': '/', 'headers': raw_headers, 'client': (ip, 5000)})
+
+@pytest.fixture
+def rate_limiter():
+    limiter = RateLimiter(
+        api_key_limit='60/m', ip_limit='10/s', api_keys=['secret'],
+        route_costs={'/api/v1/analyze_doc': 1, '/api/v1/analyze_batch': 100}
+    )
+    limiter._redis = MagicMock()
+    limiter._redis.eval = AsyncMock(return_value=[1, '9', '0'])
+    return limiter
+
+def test_parse_rate():
+    """Лимит '120/m' - емкость корзины и пополнение в секунду"""
+    assert parse_rate('120/m') == (120, 2.0)
+    assert parse_rate('5/s') == (5, 5.0)
+
+def test_client_key_prefers_api_key(rate_limiter):
+    """С известным API ключом клиент ограничивается по ключу, иначе по IP"""
+    scope, key = rate_limiter.client_key(make_request({'X-API-Key': 'secret'}))
+    assert scope == 'api_key'
+    assert 'secret' not in key
+    assert rate_limiter.client_key(make_request()) == ('ip', 'ratelimit:ip:10.0.0.1')
+
+def test_unknown_api_key_limited_by_ip(rate_limiter):
+    """Неизвестный ключ не дает новой корзины: клиент ограничивается по IP"""
+    for api_key in ('random-1', 'random-2'):
+        assert rate_limiter.client_key(make_request({'X-API-Key': api_key})) == ('ip', 'ratelimit:ip:10.0.0.1')
+
+@pytest.mark.asyncio
+async def test_route_costs(rate_limiter):
+    """Стоимость берется по маршруту и не превышает емкость корзины"""
+    assert await rate_limiter.hit(make_request(), '/api/v1/task_status/{task_id}') is None
+    rate_limiter._redis.eval.assert_not_called()
+    
+    assert await rate_limiter.hit(make_request(), '/api/v1/analyze_batch') is None
+    args = rate_limiter._redis.eval.call_args.args
+    assert args[2:] == ('ratelimit:ip:10.0.0.1', 10, 10.0, 10)
+
+@pytest.mark.asyncio
+async def test_rejection_is_cached_locally(rate_limiter):
+    """После отказа Redis повторные запросы клиента отклоняются локально"""
+    rate_limiter._redis.eval = AsyncMock(return_value=[0, '0.2', '2.5'])
+    
+    assert await rate_limiter.hit(make_request(), '/api/v1/analyze_doc') == 3
+    assert await rate_limiter.hit(make_request(), '/api/v1/analyze_doc') == 3
+    assert rate_limiter._redis.eval.await_count == 1
+    
+    rate_limiter._redis.eval = AsyncMock(return_value=[1, '9', '0'])
+    assert await rate_limiter.hit(make_request(ip='10.0.0.2'), '/api/v1/analyze_doc') is None
+
+@pytest.mark.asyncio
+async def test_local_rejection_does_not_block_cheaper_routes(rate_limiter):
+    """Отказ дорогому маршруту не отклоняет локально дешевый: его проверяет Redis"""
+    rate_limiter._redis.eval = AsyncMock(return_value=[0, '4', '0.6'])
+    assert await rate_limiter.hit(make_request(), '/api/v1/analyze_batch') == 1
+    
+    rate_limiter._redis.eval = AsyncMock(return_value=[1, '3', '0'])
+    assert await rate_limiter.hit(make_request(), '/api/v1/analyze_doc') is None
+    rate_limiter._redis.eval.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_allows_when_redis_unavailable(rate_limiter):
+    """Недоступный Redis не блокирует запросы"""
+    rate_limiter._redis.eval = AsyncMock(side_effect=ConnectionError('redis down'))
+    
+    assert await rate_limiter.hit(make_request(), '/api/v1/analyze_doc') is None
\ No newline at end of file
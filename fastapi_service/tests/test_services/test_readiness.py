@@ -0,0 +1,37 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.readiness import ReadinessProbe
+
+def make_probe(worker_replies, require_workers=False):
+    celery_app = MagicMock()
+    celery_app.control.ping.return_value = worker_replies
+    probe = ReadinessProbe(celery_app, timeout=0.5, require_workers=require_workers)
+    probe._redis = MagicMock(ping=AsyncMock(return_value=True), aclose=AsyncMock())
+    return probe
+
+@pytest.mark.asyncio
+async def test_ready_when_broker_is_reachable():
+    """Для готовности достаточно брокера; отсутствие воркеров только отображается"""
+    probe = make_probe([])
+    assert probe.status()['status'] == 'starting'
+    
+    await probe.run_once()
+    
+    assert probe.ready
+    assert probe.checks['broker']['ok'] is True
+    assert probe.checks['workers']['ok'] is False
+    await probe.close()
+
+@pytest.mark.asyncio
+async def test_workers_can_be_required():
+    """С READINESS_REQUIRE_WORKERS готовность требует ответа воркеров"""
+    probe = make_probe([], require_workers=True)
+    await probe.run_once()
+    assert not probe.ready
+    
+    probe.celery_app.control.ping.return_value = [{'small@host': {'ok': 'pong'}}]
+    await probe.run_once()
+    assert probe.ready
+    assert probe.checks['workers']['detail'] == '1 workers'
+    await probe.close()
\ No newline at end of file
@@ -0,0 +1,65 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from app.services.result_store import SQLiteResultStore
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteResultStore(path=str(tmp_path / "results.sqlite3"), history_limit=3, retention_days=30)
+
+@pytest.mark.asyncio
+async def test_latest_result_and_history(store):
+    """Последний результат и история запусков в обратном порядке"""
+    start = datetime.now(timezone.utc)
+    for i in range(5):
+        await store.save('img-1', text=f"run {i}", confidence=80.0 + i, task_id=f"task-{i}",
+                         processed_at=start + timedelta(seconds=i))
+    await store.save('img-2', text="other", processed_at=start)
+    
+    latest = await store.get_latest('img-1')
+    history = await store.get_history('img-1', limit=10)
+    
+    assert latest['text'] == "run 4"
+    assert latest['task_id'] == "task-4"
+    assert [run['text'] for run in history] == ["run 4", "run 3", "run 2"]
+    assert await store.get_latest('missing') is None
+    await store.close()
+
+@pytest.mark.asyncio
+async def test_retention_drops_old_runs(store):
+    """Запуски старше срока хранения удаляются"""
+    await store.save('img-1', text="old", processed_at=datetime.now(timezone.utc) - timedelta(days=31))
+    await store.save('img-2', text="fresh")
+    
+    assert await store.get_latest('img-1') is None
+    assert (await store.get_latest('img-2'))['text'] == "fresh"
+    await store.close()
+
+@pytest.mark.asyncio
+async def test_layout_stored_with_latest_run(store):
+    """Разметка слов отдается только по запросу и не попадает в историю"""
+    layout = {'pages': [[100, 50]], 'text': ['Привет'], 'conf': [95], 'left': [1], 'top': [2],
+              'width': [30], 'height': [10], 'page_num': [1], 'block': [1], 'par': [1], 'line': [1]}
+    await store.save('img-1', text="Привет", confidence=95.0, layout=layout)
+    
+    assert (await store.get_latest('img-1', with_layout=True))['layout'] == layout
+    assert 'layout' not in await store.get_latest('img-1')
+    assert 'layout' not in (await store.get_history('img-1'))[0]
+    await store.close()
+
+@pytest.mark.asyncio
+async def test_layout_column_added_to_existing_table(tmp_path):
+    """В таблицу, созданную до появления разметки, добавляется колонка layout"""
+    import sqlite3
+    path = str(tmp_path / "old.sqlite3")
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            'CREATE TABLE ocr_results (id INTEGER PRIMARY KEY AUTOINCREMENT, image_id TEXT NOT NULL, '
+            'task_id TEXT, text TEXT NOT NULL, confidence REAL, processed_at TEXT NOT NULL)'
+        )
+    store = SQLiteResultStore(path=path)
+    
+    await store.save('img-1', text="text", layout={'pages': [[1, 1]]})
+    
+    assert (await store.get_latest('img-1', with_layout=True))['layout'] == {'pages': [[1, 1]]}
+    await store.close()
\ No newline at end of file
@@ -0,0 +1,33 @@
+import asyncio
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from app.services.sync_ocr import SyncOCRExecutor
+
+def slow_recognize(data, tesseract_cmd):
+    time.sleep(float(data))
+    return {'text': 'ok', 'confidence': 90.0}
+
+@pytest.fixture
+def sync_ocr():
+    executor = SyncOCRExecutor(max_workers=1, deadline=0.2)
+    executor._executor = ThreadPoolExecutor(max_workers=1)
+    with patch('app.services.sync_ocr.recognize_image_bytes', slow_recognize):
+        yield executor
+    executor._executor.shutdown(wait=True)
+
+@pytest.mark.asyncio
+async def test_recognize_within_deadline(sync_ocr):
+    assert await sync_ocr.recognize(b'0') == {'text': 'ok', 'confidence': 90.0}
+
+@pytest.mark.asyncio
+async def test_deadline_keeps_slot_until_job_finishes(sync_ocr):
+    """Просроченная задача держит слот пула, пока не завершится"""
+    with pytest.raises(asyncio.TimeoutError):
+        await sync_ocr.recognize(b'0.5')
+    
+    assert await sync_ocr.recognize(b'0') is None
+    await asyncio.sleep(0.5)
+    assert await sync_ocr.recognize(b'0') == {'text': 'ok', 'confidence': 90.0}
\ No newline at end of file
@@ -0,0 +1,33 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_claim_returns_existing_task(task_dedup):
+    """Занятый ключ возвращает id первой задачи"""
+    key = task_dedup.inflight_key('img-1', send_email=True, email=None)
+    
+    assert await task_dedup.claim(key, 'task-1') == ('task-1', True)
+    assert await task_dedup.claim(key, 'task-2') == ('task-1', False)
+
+@pytest.mark.asyncio
+async def test_release_only_by_owner(task_dedup):
+    """Ключ снимает только задача, за которой он закреплен"""
+    key = task_dedup.inflight_key('img-1', send_email=True, email=None)
+    await task_dedup.claim(key, 'task-1')
+    
+    assert await task_dedup.release(key, 'task-2') is False
+    assert await task_dedup.release(key, 'task-1') is True
+    assert await task_dedup.claim(key, 'task-3') == ('task-3', True)
+
+def test_keys_depend_on_options(task_dedup):
+    """Разные параметры OCR дают разные ключи"""
+    assert task_dedup.inflight_key('img-1', send_email=True) != task_dedup.inflight_key('img-1', send_email=False)
+    assert task_dedup.inflight_key('img-1', a=1, b=2) == task_dedup.inflight_key('img-1', b=2, a=1)
+
+def test_idempotency_key_scoped_to_request(task_dedup):
+    """Тот же Idempotency-Key с другим изображением или параметрами дает другой ключ"""
+    key = task_dedup.idempotency_key('abc', 'img-1', send_email=True)
+    
+    assert key == task_dedup.idempotency_key('abc', 'img-1', send_email=True)
+    assert key != task_dedup.idempotency_key('abc', 'img-2', send_email=True)
+    assert key != task_dedup.idempotency_key('abc', 'img-1', send_email=False)
+    assert key != task_dedup.idempotency_key('xyz', 'img-1', send_email=True)
\ No newline at end of file
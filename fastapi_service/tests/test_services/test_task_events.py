@@ -0,0 +1,95 @@
+import json
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.services.task_events import TaskEventBroker
+
+@pytest.mark.asyncio
+async def test_broker_dispatches_to_task_subscribers():
+    """Событие получают только подписчики своей задачи"""
+    broker = TaskEventBroker()
+    
+    with patch.object(broker, '_ensure_listener', new_callable=AsyncMock) as mock_listener:
+        async with broker.subscribe('task-1') as first, \
+                   broker.subscribe('task-1') as second, \
+                   broker.subscribe('task-2') as other:
+            broker.dispatch(json.dumps({'task_id': 'task-1', 'stage': 'ocr'}))
+            
+            assert first.get_nowait()['stage'] == 'ocr'
+            assert second.get_nowait()['stage'] == 'ocr'
+            assert other.empty()
+            assert broker.subscriber_count == 3
+        
+        assert broker.subscriber_count == 0
+        assert mock_listener.await_count == 3
+
+@pytest.mark.asyncio
+async def test_broker_uses_single_subscription():
+    """Все клиенты процесса используют одну подписку Redis"""
+    import asyncio
+    broker = TaskEventBroker()
+    broker._redis = MagicMock()
+    broker._redis.aclose = AsyncMock()
+    pubsub = broker._redis.pubsub.return_value
+    pubsub.subscribe = AsyncMock()
+    pubsub.aclose = AsyncMock()
+    
+    async def listen_forever(pubsub):
+        await asyncio.Event().wait()
+    
+    with patch.object(broker, '_listen', side_effect=listen_forever):
+        async with broker.subscribe('task-1'), broker.subscribe('task-2'):
+            pass
+        async with broker.subscribe('task-3'):
+            pass
+    
+    pubsub.subscribe.assert_awaited_once_with(broker.channel)
+    await broker.close()
+    pubsub.aclose.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_broker_drops_events_for_slow_subscriber():
+    """Переполненная очередь медленного клиента не блокирует рассылку"""
+    broker = TaskEventBroker(queue_size=1)
+    
+    with patch.object(broker, '_ensure_listener', new_callable=AsyncMock):
+        async with broker.subscribe('task-1') as queue:
+            broker.dispatch(json.dumps({'task_id': 'task-1', 'stage': 'fetched'}))
+            broker.dispatch(json.dumps({'task_id': 'task-1', 'stage': 'downloaded'}))
+            
+            assert queue.qsize() == 1
+            assert queue.get_nowait()['stage'] == 'fetched'
+
+@pytest.mark.asyncio
+async def test_lost_subscription_ends_streams_and_resubscribes():
+    """Упавший слушатель завершает потоки подписчиков, следующий подписчик подписывается заново"""
+    import asyncio
+    from app.services.task_events import DISCONNECTED_STAGE
+    broker = TaskEventBroker()
+    broker._redis = MagicMock()
+    broker._redis.aclose = AsyncMock()
+    stale, fresh = MagicMock(), MagicMock()
+    for pubsub in (stale, fresh):
+        pubsub.subscribe = AsyncMock()
+        pubsub.aclose = AsyncMock()
+    broker._redis.pubsub.side_effect = [stale, fresh]
+    
+    async def broken_listen():
+        raise ConnectionError('Redis connection lost')
+        yield
+    stale.listen = broken_listen
+    
+    async def listen_forever():
+        await asyncio.Event().wait()
+        yield
+    fresh.listen = listen_forever
+    
+    async with broker.subscribe('task-1') as queue:
+        event = await asyncio.wait_for(queue.get(), timeout=1)
+        assert event == {'task_id': 'task-1', 'stage': DISCONNECTED_STAGE}
+    
+    async with broker.subscribe('task-2'):
+        stale.aclose.assert_awaited_once()
+        fresh.subscribe.assert_awaited_once_with(broker.channel)
+    
+    await broker.close()
\ No newline at end of file
@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock
+
+from app.services.task_status import TaskStatusService
+
+def make_backend(stored):
+    """Backend с MGET поверх словаря, который хранит уже декодированные значения"""
+    backend = MagicMock()
+    backend.get_key_for_task.side_effect = lambda task_id: f"celery-task-meta-{task_id}"
+    backend.mget.side_effect = lambda keys: [stored.get(key.rsplit('-', 1)[1]) for key in keys]
+    backend.decode_result.side_effect = lambda value: value
+    return backend
+
+def test_get_many_uses_single_mget():
+    """Все состояния читаются одним MGET, отсутствующие задачи считаются PENDING"""
+    backend = make_backend({'a': {'status': 'SUCCESS', 'result': 1}, 'b': {'status': 'STARTED', 'result': None}})
+    service = TaskStatusService(backend)
+    
+    metas = service.get_many(['a', 'b', 'c'])
+    
+    assert [m['status'] for m in metas.values()] == ['SUCCESS', 'STARTED', 'PENDING']
+    backend.mget.assert_called_once()
+
+def test_terminal_states_are_cached():
+    """Завершенные задачи повторно из backend не читаются"""
+    stored = {'a': {'status': 'SUCCESS', 'result': 1}, 'b': {'status': 'STARTED', 'result': None}}
+    backend = make_backend(stored)
+    service = TaskStatusService(backend)
+    
+    service.get_many(['a', 'b'])
+    stored['b'] = {'status': 'FAILURE', 'result': 'boom'}
+    metas = service.get_many(['a', 'b'])
+    
+    assert metas['b']['status'] == 'FAILURE'
+    assert backend.mget.call_args.args[0] == ['celery-task-meta-b']
+    
+    backend.mget.reset_mock()
+    service.get_many(['a', 'b'])
+    backend.mget.assert_not_called()
+
+def test_cache_is_bounded():
+    """Кэш завершенных задач ограничен по размеру"""
+    backend = make_backend({str(i): {'status': 'SUCCESS', 'result': i} for i in range(5)})
+    service = TaskStatusService(backend, cache_size=3)
+    
+    service.get_many([str(i) for i in range(5)])
+    
+    assert len(service._cache) == 3
+    assert list(service._cache) == ['2', '3', '4']
\ No newline at end of file
@@ -0,0 +1,42 @@
+import pytest
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from app.services.text_presence import TextPresenceFilter
+
+def document(lines):
+    image = Image.new('RGB', (1240, 1754), 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    for i in range(lines):
+        draw.text((100, 120 + i * 45), "Invoice total amount 1234.56", fill='black', font=font)
+    return image
+
+def photo():
+    noise = Image.effect_noise((60, 40), 30).resize((1920, 1280), Image.Resampling.BICUBIC)
+    return noise.filter(ImageFilter.GaussianBlur(3)).convert('RGB')
+
+@pytest.mark.asyncio
+async def test_text_images_pass_prefilter():
+    """Страница даже с одной строкой текста считается текстовой"""
+    prefilter = TextPresenceFilter()
+    
+    assert await prefilter.has_text(document(1))
+    assert await prefilter.has_text(document(30))
+
+@pytest.mark.asyncio
+async def test_images_without_text_are_skipped():
+    """Пустая страница, градиент и гладкое фото отсеиваются"""
+    prefilter = TextPresenceFilter()
+    
+    assert not await prefilter.has_text(Image.new('RGB', (2480, 3508), 'white'))
+    assert not await prefilter.has_text(Image.linear_gradient('L').resize((1000, 1000)))
+    assert not await prefilter.has_text(photo())
+
+@pytest.mark.asyncio
+async def test_threshold_is_tunable():
+    """Порог плотности границ задается настройкой, ошибка проверки пропускает изображение в OCR"""
+    image = document(1)
+    score = TextPresenceFilter().score(image)
+    
+    assert not await TextPresenceFilter(min_density=score + 0.01).has_text(image)
+    assert await TextPresenceFilter().has_text(object())
\ No newline at end of file
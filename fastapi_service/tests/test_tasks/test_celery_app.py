@@ -0,0 +1,278 @@
+import sys
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from uuid import uuid4
+
+from app.core.exceptions import ImageNotFoundException, DjangoAPIException
+import app.tasks.celery_app
+
+# Пакет app.tasks экспортирует объект celery_app, поэтому модуль берем из sys.modules
+tasks = sys.modules['app.tasks.celery_app']
+
+@pytest.fixture
+def worker_services():
+    """Общие сервисы воркера с замоканным I/O"""
+    services = tasks.get_worker_services()
+    image_id = str(uuid4())
+    with patch.object(services.django_service, 'get_image', new_callable=AsyncMock) as mock_get_image, \
+         patch.object(services.ocr_service, 'download_image', new_callable=AsyncMock,
+                      return_value=MagicMock(size=(800, 600))), \
+         patch.object(services.ocr_service, 'open_local_image', new_callable=AsyncMock, return_value=None), \
+         patch.object(services.ocr_service, 'recognize_with_confidence', new_callable=AsyncMock) as mock_ocr, \
+         patch.object(services.email_service, 'send_ocr_result', new_callable=AsyncMock) as mock_send, \
+         patch.object(services.task_events, 'publish', new_callable=AsyncMock), \
+         patch.object(services.result_store, 'save', new_callable=AsyncMock), \
+         patch.object(services.task_dedup, 'release', new_callable=AsyncMock), \
+         patch.object(services.dead_letter, 'add', new_callable=AsyncMock), \
+         patch.object(services.language_detector, 'detect', new_callable=AsyncMock, return_value='rus'), \
+         patch.object(services.text_prefilter, 'has_text', new_callable=AsyncMock, return_value=True):
+        mock_get_image.return_value = {
+            'id': image_id,
+            'title': 'Test Image',
+            'image_url': 'http://test.com/image.jpg',
+            'uploaded_at': '2026-02-16T10:00:00',
+            'size': 1024,
+            'width': 800,
+            'height': 600,
+            'format': 'jpg'
+        }
+        mock_ocr.return_value = {'text': 'Sample text', 'confidence': 91.0}
+        mock_send.return_value = True
+        yield services, image_id
+
+def test_run_async_reuses_worker_loop():
+    """Корутины выполняются в одном долгоживущем event loop"""
+    async def current_loop():
+        import asyncio
+        return asyncio.get_running_loop()
+    
+    first = tasks.run_async(current_loop())
+    second = tasks.run_async(current_loop())
+    
+    assert first is second
+    assert not first.is_closed()
+
+def test_worker_services_are_singletons():
+    """Сервисы создаются один раз на процесс"""
+    assert tasks.get_worker_services() is tasks.get_worker_services()
+
+def test_process_ocr_task_uses_shared_services(worker_services):
+    """Задача использует общие сервисы процесса вместо создания новых"""
+    services, image_id = worker_services
+    
+    with patch.object(tasks, 'DjangoService') as mock_cls, \
+         patch.object(tasks.send_ocr_result_email, 'delay') as mock_email_task:
+        result = tasks.process_ocr_task.apply(
+            kwargs={'image_id': image_id, 'send_email': True, 'email': 'test@example.com'}
+        ).get()
+        mock_cls.assert_not_called()
+    
+    assert result['status'] == 'completed'
+    assert result['text'] == 'Sample text'
+    assert result['email_queued'] is True
+    mock_email_task.assert_called_once()
+    services.email_service.send_ocr_result.assert_not_awaited()
+    services.result_store.save.assert_awaited_once()
+    assert services.result_store.save.await_args.args[0] == image_id
+
+def test_send_ocr_result_email_task(worker_services):
+    """Письмо отправляется отдельной задачей из очереди писем"""
+    services, image_id = worker_services
+    
+    tasks.send_ocr_result_email.apply(
+        args=['test@example.com', {'id': image_id, 'title': 'Test'}, 'Sample text', 91.0]
+    ).get()
+    
+    services.email_service.send_ocr_result.assert_awaited_once()
+    assert tasks.celery_app.amqp.router.route({}, 'send_ocr_result_email')['queue'].name == 'email'
+
+def test_digest_mode_collects_results(worker_services):
+    """В режиме дайджеста первый результат планирует отправку по окну"""
+    services, image_id = worker_services
+    
+    with patch.object(tasks.settings, 'EMAIL_DIGEST_ENABLED', True), \
+         patch.object(services.email_digest, 'add', new_callable=AsyncMock) as mock_add, \
+         patch.object(tasks.flush_email_digest, 'apply_async') as mock_flush_later, \
+         patch.object(tasks.flush_email_digest, 'delay') as mock_flush_now, \
+         patch.object(tasks.send_ocr_result_email, 'delay') as mock_email_task:
+        mock_add.return_value = 1
+        tasks.process_ocr_task.apply(kwargs={'image_id': image_id, 'email': 'test@example.com'}).get()
+        
+        mock_add.return_value = tasks.settings.EMAIL_DIGEST_MAX_ITEMS
+        tasks.process_ocr_task.apply(kwargs={'image_id': image_id, 'email': 'test@example.com'}).get()
+    
+    mock_email_task.assert_not_called()
+    mock_flush_later.assert_called_once()
+    assert mock_flush_later.call_args.kwargs['countdown'] == tasks.settings.EMAIL_DIGEST_WINDOW
+    mock_flush_now.assert_called_once_with('test@example.com')
+
+def test_flush_email_digest_sends_one_message(worker_services):
+    """Накопленные результаты уходят одним письмом"""
+    services, image_id = worker_services
+    results = [
+        {'image_data': {'id': image_id, 'title': 'A'}, 'ocr_text': 'one', 'confidence': 90.0},
+        {'image_data': {'id': image_id, 'title': 'B'}, 'ocr_text': 'two', 'confidence': 80.0}
+    ]
+    
+    with patch.object(services.email_digest, 'pop_all', new_callable=AsyncMock) as mock_pop, \
+         patch.object(services.email_service, 'send_ocr_digest', new_callable=AsyncMock) as mock_digest:
+        mock_pop.return_value = results
+        result = tasks.flush_email_digest.apply(args=['test@example.com']).get()
+    
+    assert result['sent'] == 2
+    mock_digest.assert_awaited_once_with('test@example.com', results)
+
+def test_process_ocr_task_publishes_stages(worker_services):
+    """Воркер публикует этапы обработки в порядке их выполнения"""
+    services, image_id = worker_services
+    
+    with patch.object(tasks.send_ocr_result_email, 'delay'):
+        result = tasks.process_ocr_task.apply(
+            kwargs={'image_id': image_id, 'email': 'test@example.com'}
+        )
+    
+    stages = [c.args[1] for c in services.task_events.publish.await_args_list]
+    assert stages == ['fetched', 'downloaded', 'ocr', 'completed']
+    assert services.task_events.publish.await_args_list[-1].args[0] == result.id
+    assert services.task_events.publish.await_args_list[-1].kwargs['email_queued'] is True
+
+def test_process_ocr_task_releases_dedup_key(worker_services):
+    """По завершении задача снимает ключ дедупликации analyze_doc"""
+    services, image_id = worker_services
+    
+    result = tasks.process_ocr_task.apply(
+        kwargs={'image_id': image_id, 'send_email': False, 'release_key': 'ocr:inflight:abc'}
+    )
+    
+    services.task_dedup.release.assert_awaited_once_with('ocr:inflight:abc', result.id)
+
+def test_process_ocr_task_uses_prefetched_metadata(worker_services):
+    """Метаданные из payload задачи не запрашиваются у Django повторно, файл читается с тома"""
+    services, image_id = worker_services
+    services.ocr_service.open_local_image.return_value = MagicMock(size=(800, 600))
+    image_data = {'id': image_id, 'file_path': 'images/a.png', 'image_url': 'http://web:8000/media/images/a.png'}
+    
+    result = tasks.process_ocr_task.apply(
+        kwargs={'image_id': image_id, 'send_email': False, 'image_data': image_data}
+    ).get()
+    
+    assert result['status'] == 'completed'
+    services.django_service.get_image.assert_not_awaited()
+    services.ocr_service.open_local_image.assert_awaited_once_with('images/a.png')
+    services.ocr_service.download_image.assert_not_awaited()
+
+def test_process_ocr_task_languages(worker_services):
+    """Языки клиента используются как есть, иначе определяются по изображению"""
+    services, image_id = worker_services
+    
+    detected = tasks.process_ocr_task.apply(kwargs={'image_id': image_id, 'send_email': False}).get()
+    assert detected['languages'] == 'rus'
+    assert services.ocr_service.recognize_with_confidence.await_args.args[1] == 'rus'
+    
+    services.language_detector.detect.reset_mock()
+    chosen = tasks.process_ocr_task.apply(
+        kwargs={'image_id': image_id, 'send_email': False, 'languages': 'eng'}
+    ).get()
+    assert chosen['languages'] == 'eng'
+    services.language_detector.detect.assert_not_awaited()
+
+def test_process_ocr_task_skips_images_without_text(worker_services):
+    """Изображение без текста не распознается, сохраняется пустой результат"""
+    services, image_id = worker_services
+    services.text_prefilter.has_text.return_value = False
+    
+    result = tasks.process_ocr_task.apply(kwargs={'image_id': image_id, 'send_email': False}).get()
+    
+    assert result['text'] == ''
+    assert result['text_detected'] is False
+    services.ocr_service.recognize_with_confidence.assert_not_awaited()
+    services.language_detector.detect.assert_not_awaited()
+    assert services.result_store.save.await_args.kwargs['layout']['text'] == []
+
+def test_process_ocr_task_reports_page_progress(worker_services):
+    """Для многостраничного документа публикуется прогресс по страницам"""
+    services, image_id = worker_services
+    services.ocr_service.download_image.return_value = MagicMock(size=(800, 600), n_frames=2)
+    
+    async def recognize(image, languages, on_page=None, has_text=None):
+        await on_page(1, 2)
+        await on_page(2, 2)
+        return {'text': 'one two', 'confidence': 90.0, 'page_count': 2}
+    services.ocr_service.recognize_with_confidence.side_effect = recognize
+    
+    result = tasks.process_ocr_task.apply(kwargs={'image_id': image_id, 'send_email': False}).get()
+    
+    assert result['page_count'] == 2
+    pages = [c.kwargs for c in services.task_events.publish.await_args_list if c.args[1] == 'page']
+    assert pages == [{'pages_done': 1, 'page_count': 2}, {'pages_done': 2, 'page_count': 2}]
+    services.text_prefilter.has_text.assert_not_awaited()
+
+def test_recycle_reason_reports_limits():
+    """Причина перезапуска дочернего процесса определяется по лимитам задач и памяти"""
+    with patch.object(tasks, '_tasks_in_process', 500), \
+         patch.object(tasks.settings, 'WORKER_MAX_TASKS_PER_CHILD', 500):
+        assert tasks._recycle_reason() == 'max_tasks'
+    
+    with patch.object(tasks, '_tasks_in_process', 1), \
+         patch.object(tasks.settings, 'WORKER_MAX_MEMORY_PER_CHILD_MB', 100), \
+         patch.object(tasks, 'mem_rss', return_value=200 * 1024):
+        assert tasks._recycle_reason() == 'max_memory'
+    
+    with patch.object(tasks, '_tasks_in_process', 1), \
+         patch.object(tasks, 'mem_rss', return_value=1024):
+        assert tasks._recycle_reason() == 'shutdown'
+
+def test_permanent_error_goes_to_dead_letter_without_retries(worker_services):
+    """Отсутствующее изображение не повторяется, задача сразу попадает в dead-letter очередь"""
+    services, image_id = worker_services
+    services.django_service.get_image.side_effect = ImageNotFoundException(image_id)
+    
+    result = tasks.process_ocr_task.apply(kwargs={'image_id': image_id, 'send_email': False, 'release_key': 'key'})
+    
+    assert result.failed()
+    assert services.django_service.get_image.await_count == 1
+    services.task_dedup.release.assert_awaited_once()
+    entry = services.dead_letter.add.await_args
+    assert entry.kwargs['retryable'] is False
+    assert entry.kwargs['retries'] == 0
+    assert entry.kwargs['kwargs']['image_id'] == image_id
+
+def test_transient_error_retries_with_backoff(worker_services):
+    """Временная ошибка повторяется с растущей задержкой, после последней попытки задача в dead-letter очереди"""
+    services, image_id = worker_services
+    services.django_service.get_image.side_effect = DjangoAPIException("Timeout connecting to Django API")
+    
+    with patch.object(tasks, 'backoff_delay', wraps=tasks.backoff_delay) as mock_backoff:
+        result = tasks.process_ocr_task.apply(kwargs={'image_id': image_id, 'send_email': False})
+    
+    assert result.failed()
+    max_retries = tasks.settings.OCR_TASK_MAX_RETRIES
+    assert services.django_service.get_image.await_count == max_retries + 1
+    assert [call.args[0] for call in mock_backoff.call_args_list] == list(range(max_retries))
+    entry = services.dead_letter.add.await_args
+    assert entry.kwargs['retryable'] is True
+    assert entry.kwargs['retries'] == max_retries
+
+def test_batch_callback_runs_when_one_image_fails(worker_services):
+    """Ошибка одного изображения пакета не отменяет callback: он получает результат failed"""
+    from celery import chord, group
+    services, image_id = worker_services
+    missing_id = str(uuid4())
+    image_data = services.django_service.get_image.return_value
+    
+    async def get_image(requested_id):
+        if str(requested_id) == missing_id:
+            raise ImageNotFoundException(missing_id)
+        return image_data
+    services.django_service.get_image.side_effect = get_image
+    
+    header = group(
+        tasks.process_ocr_task.s(image_id=requested_id, send_email=False, batch_member=True)
+        for requested_id in (image_id, missing_id)
+    )
+    with patch.object(services.email_service, 'send_notification', new_callable=AsyncMock) as mock_notify:
+        summary = chord(header, tasks.ocr_batch_completed.s(batch_id='batch-1', email='ops@example.com')).apply().get()
+    
+    assert summary == {'batch_id': 'batch-1', 'total': 2, 'completed': 1, 'failed': 1}
+    mock_notify.assert_awaited_once()
+    services.dead_letter.add.assert_awaited_once()
\ No newline at end of file
@@ -0,0 +1,44 @@
+import httpx
+from app.core.exceptions import ImageNotFoundException, DjangoAPIException, OCRProcessingException
+from app.tasks.retry import is_retryable, backoff_delay
+
+def wrapped(cause: Exception, detail: str) -> OCRProcessingException:
+    """Исключение сервиса, выброшенное при обработке исходной ошибки"""
+    try:
+        raise cause
+    except Exception:
+        try:
+            raise OCRProcessingException(detail)
+        except OCRProcessingException as e:
+            return e
+
+def http_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request('GET', 'http://web/media/1.jpg')
+    return httpx.HTTPStatusError('error', request=request, response=httpx.Response(status_code, request=request))
+
+def test_transient_errors_are_retried():
+    """Сетевые сбои, таймауты, 429 и 5xx временные"""
+    assert is_retryable(DjangoAPIException("Timeout connecting to Django API"))
+    assert is_retryable(ConnectionError())
+    assert is_retryable(http_error(503))
+    assert is_retryable(http_error(429))
+    assert is_retryable(RuntimeError("unexpected"))
+
+def test_permanent_errors_are_not_retried():
+    """Отсутствующее изображение и ошибки в данных задачи не повторяются"""
+    assert not is_retryable(ImageNotFoundException('img-1'))
+    assert not is_retryable(ValueError("Image URL not found"))
+    assert not is_retryable(http_error(404))
+
+def test_wrapped_errors_are_classified_by_cause():
+    """Ошибка загрузки классифицируется по исходной ошибке, а не по коду 422"""
+    assert is_retryable(wrapped(httpx.ConnectError('refused'), "Image download failed"))
+    assert not is_retryable(wrapped(http_error(404), "Image download failed"))
+    assert not is_retryable(wrapped(OSError("cannot identify image file"), "Image decode failed"))
+
+def test_backoff_delay_has_full_jitter():
+    """Задержка случайна от 0 до base * 2^retries и не превышает потолок"""
+    delays = [backoff_delay(3, base=10, cap=600) for _ in range(200)]
+    assert all(0 <= delay <= 80 for delay in delays)
+    assert len(set(delays)) > 100
+    assert max(backoff_delay(20, base=10, cap=600) for _ in range(50)) <= 600
\ No newline at end of file
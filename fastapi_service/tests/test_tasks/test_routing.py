@@ -0,0 +1,22 @@
+from app.tasks.routing import estimate_ocr_cost, select_ocr_queue
+from app.core.config import settings
+
+def test_estimate_cost_from_dimensions():
+    """Стоимость считается в мегапикселях"""
+    assert estimate_ocr_cost({'width': 2000, 'height': 1000, 'size': 1}) == 2.0
+
+def test_estimate_cost_counts_pages():
+    """Стоимость многостраничного документа растет с числом страниц"""
+    assert estimate_ocr_cost({'width': 2000, 'height': 1000, 'page_count': 3, 'size': 1}) == 6.0
+
+def test_estimate_cost_falls_back_to_size():
+    """Без размеров стоимость оценивается по объему файла"""
+    assert estimate_ocr_cost({'width': 0, 'height': 0, 'size': 500_000}) == 2.0
+
+def test_small_image_goes_to_small_queue():
+    """Небольшой чек попадает в очередь для маленьких задач"""
+    assert select_ocr_queue({'width': 800, 'height': 600, 'size': 1024}) == settings.OCR_QUEUE_SMALL
+
+def test_large_scan_goes_to_large_queue():
+    """Большой скан попадает в отдельную очередь"""
+    assert select_ocr_queue({'width': 8000, 'height': 6000, 'size': 10_000_000}) == settings.OCR_QUEUE_LARGE
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import httpx
+import pytest
+from prometheus_client import CollectorRegistry, multiprocess
+
+import app.tasks.metrics as metrics
+from app.tasks import memory
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_multiprocess_metrics_are_aggregated(tmp_path):
+    """Метрики дочерних процессов prefork пула суммируются через каталог multiprocess"""
+    env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(tmp_path)}
+    code = (
+        "from app.tasks.metrics import task_retries, task_run_duration\n"
+        "task_retries.labels(task='process_ocr_task', queue='ocr.small').inc()\n"
+        "task_run_duration.labels(queue='ocr.small').observe(1.5)\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', code], env=env, check=True, cwd=os.getcwd())
+    
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+    
+    labels = {'task': 'process_ocr_task', 'queue': 'ocr.small'}
+    assert registry.get_sample_value('ocr_task_retries_total', labels) == 2
+    assert registry.get_sample_value('ocr_task_run_seconds_count', {'queue': 'ocr.small'}) == 2
+
+def test_start_metrics_server_serves_worker_metrics():
+    """Главный процесс воркера отдает метрики по HTTP"""
+    port = free_port()
+    metrics.start_metrics_server(port, addr='127.0.0.1')
+    metrics.image_megapixels.observe(2.0)
+    
+    response = httpx.get(f"http://127.0.0.1:{port}/metrics")
+    
+    assert response.status_code == 200
+    assert 'ocr_image_megapixels_count' in response.text
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="VmHWM есть только в Linux")
+def test_peak_rss_is_reset_between_tasks():
+    """Пиковый RSS сбрасывается перед задачей и отражает ее выделения"""
+    if not metrics.reset_peak_rss():
+        pytest.skip("clear_refs недоступен")
+    baseline = metrics.peak_rss_bytes()
+    
+    buffer = bytearray(64 * 1024 * 1024)
+    assert metrics.peak_rss_bytes() >= baseline + len(buffer) // 2
+    
+    del buffer
+    metrics.reset_peak_rss()
+    assert metrics.peak_rss_bytes() < baseline + 32 * 1024 * 1024
+
+def test_rss_bytes_tracks_current_memory():
+    """Текущий RSS растет при выделении и падает после освобождения"""
+    if not metrics.rss_bytes():
+        pytest.skip("/proc/self/status недоступен")
+    baseline = metrics.rss_bytes()
+    
+    buffer = bytearray(64 * 1024 * 1024)
+    buffer[::4096] = b'x' * len(buffer[::4096])
+    assert metrics.rss_bytes() >= baseline + len(buffer) // 2
+    
+    del buffer
+    assert metrics.rss_bytes() < baseline + 32 * 1024 * 1024
+
+def test_remove_stale_tesseract_files(tmp_path):
+    """Удаляются только старые временные файлы pytesseract"""
+    stale = tmp_path / 'tess_abc_input.PNG'
+    fresh = tmp_path / 'tess_def_input.PNG'
+    other = tmp_path / 'upload.png'
+    for path in (stale, fresh, other):
+        path.write_bytes(b'x')
+    old = time.time() - 7200
+    os.utime(stale, (old, old))
+    os.utime(other, (old, old))
+    
+    assert memory.remove_stale_tesseract_files(3600, str(tmp_path)) == 1
+    assert not stale.exists()
+    assert fresh.exists() and other.exists()
+
+def test_top_allocations_between_snapshots():
+    """Места наибольших выделений находятся сравнением снимков tracemalloc"""
+    started = memory.start_tracemalloc()
+    try:
+        before = memory.take_snapshot()
+        buffers = [bytearray(1024 * 1024) for _ in range(4)]
+        after = memory.take_snapshot()
+        
+        top = memory.top_allocations(before, after, limit=3)
+        assert top and 'test_worker_metrics.py' in top[0]
+        del buffers
+    finally:
+        if started:
+            tracemalloc.stop()
@@ -0,0 +1,91 @@
+import sys
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import uuid4
+import pytest
+from PIL import Image, ImageDraw
+
+import app.tasks.celery_app
+from app.services.ocr_service import OCRService
+from app.services.result_store import SQLiteResultStore
+from app.services.text_presence import TextPresenceFilter
+from app.tasks.metrics import rss_bytes
+
+# Пакет app.tasks экспортирует объект celery_app, поэтому модуль берем из sys.modules
+tasks = sys.modules['app.tasks.celery_app']
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="RSS is read from /proc")
+
+WARMUP_TASKS = 200
+SOAK_TASKS = 2000
+MAX_RSS_GROWTH = 20 * 1024 * 1024
+
+def fake_image_to_data(image, lang=None, config=None, output_type=None):
+    """Ответ tesseract без запуска процесса: одно слово на изображение"""
+    return {
+        'text': ['total'], 'conf': ['91'], 'left': [10], 'top': [10], 'width': [40], 'height': [12],
+        'block_num': [1], 'par_num': [1], 'line_num': [1]
+    }
+
+def write_pages(path, count):
+    pages = []
+    for i in range(count):
+        page = Image.new('RGB', (320, 240), 'white')
+        ImageDraw.Draw(page).text((10, 10 + i * 20), 'invoice total 42', fill='black')
+        pages.append(page)
+    pages[0].save(path, save_all=count > 1, append_images=pages[1:])
+
+class FakeDjango:
+    def __init__(self, files):
+        self.files = files
+        self.calls = 0
+    
+    async def get_image(self, image_id):
+        self.calls += 1
+        return {'id': str(image_id), 'file_path': self.files[self.calls % len(self.files)]}
+
+class FakeEvents:
+    async def publish(self, task_id, stage, **fields):
+        pass
+
+class FakeLanguages:
+    async def detect(self, image):
+        return 'eng'
+
+@pytest.fixture
+def soak_services(tmp_path):
+    write_pages(tmp_path / 'receipt.png', 1)
+    write_pages(tmp_path / 'scan.tiff', 3)
+    ocr_service = OCRService()
+    ocr_service.media_root = str(tmp_path)
+    services = SimpleNamespace(
+        django_service=FakeDjango(['receipt.png', 'scan.tiff']),
+        ocr_service=ocr_service,
+        task_events=FakeEvents(),
+        result_store=SQLiteResultStore(path=str(tmp_path / 'results.sqlite3'), history_limit=2),
+        language_detector=FakeLanguages(),
+        text_prefilter=TextPresenceFilter()
+    )
+    with patch.object(tasks, 'get_worker_services', return_value=services), \
+         patch('pytesseract.image_to_data', side_effect=fake_image_to_data):
+        yield services
+    tasks.run_async(ocr_service.close())
+    tasks.run_async(services.result_store.close())
+
+def run_tasks(count, image_ids):
+    for i in range(count):
+        result = tasks.run_async(tasks._process_ocr_async(
+            image_ids[i % len(image_ids)], send_email=False, email=None, task_id=f'soak-{i}'
+        ))
+        assert result['status'] == 'completed'
+
+def test_worker_memory_is_bounded_over_many_tasks(soak_services):
+    """RSS процесса не растет от задачи к задаче: изображения и отображения файлов освобождаются"""
+    image_ids = [str(uuid4()) for _ in range(20)]
+    run_tasks(WARMUP_TASKS, image_ids)
+    before = rss_bytes()
+    
+    run_tasks(SOAK_TASKS, image_ids)
+    
+    growth = rss_bytes() - before
+    assert growth < MAX_RSS_GROWTH, f"RSS grew by {growth} bytes over {SOAK_TASKS} tasks"
\ No newline at end of file
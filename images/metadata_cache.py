@@ -0,0 +1,36 @@
+import json
+import logging
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+def get_client():
+    """Клиент Redis, общего с FastAPI сервисом (создается лениво)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.IMAGE_METADATA_REDIS_URL, socket_timeout=1)
+    return _client
+
+def metadata_key(image_id):
+    return f"{settings.IMAGE_METADATA_KEY_PREFIX}{image_id}"
+
+def publish_image_metadata(image):
+    """Запись компактных метаданных изображения для FastAPI сервиса"""
+    try:
+        get_client().set(
+            metadata_key(image.id),
+            json.dumps(image.metadata_record()),
+            ex=settings.IMAGE_METADATA_TTL
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Could not publish metadata for image {image.id}: {e}")
+
+def remove_image_metadata(image_id):
+    """Удаление метаданных удаленного изображения"""
+    try:
+        get_client().delete(metadata_key(image_id))
+    except Exception as e:
+        logger.warning(f"⚠️ Could not remove metadata for image {image_id}: {e}")
\ No newline at end of file
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-19 10:00
+
+import django.core.validators
+import images.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='page_count',
+            field=models.IntegerField(default=1, verbose_name='Количество страниц'),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='image',
+            field=models.ImageField(upload_to=images.models.upload_to, validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tif', 'tiff'])], verbose_name='Файл изображения'),
+        ),
+    ]
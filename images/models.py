@@ -20,7 +20,7 @@ class Image(models.Model):
         verbose_name="Файл изображения",
         validators=[
             FileExtensionValidator(
-                allowed_extensions=['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp']
+                allowed_extensions=['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tif', 'tiff']
             )
         ]
     )
@@ -29,6 +29,7 @@ class Image(models.Model):
     width = models.IntegerField(verbose_name="Ширина изображения", default=0)
     height = models.IntegerField(verbose_name="Высота изображения", default=0)
     format = models.CharField(max_length=10, verbose_name="Формат файла", default='')
+    page_count = models.IntegerField(verbose_name="Количество страниц", default=1)
 
     class Meta:
         verbose_name = "Изображение"
@@ -38,6 +39,21 @@ class Image(models.Model):
     def __str__(self):
         return f"{self.title} ({self.format})"
 
+    def metadata_record(self):
+        """Компактные метаданные для FastAPI сервиса (URL файла и путь в MEDIA_ROOT относительные)"""
+        return {
+            'id': str(self.id),
+            'title': self.title,
+            'image_url': self.image.url if self.image else None,
+            'file_path': self.image.name if self.image else None,
+            'uploaded_at': self.uploaded_at.isoformat(),
+            'size': self.size,
+            'width': self.width,
+            'height': self.height,
+            'format': self.format,
+            'page_count': self.page_count,
+        }
+    
     def save(self, *args, **kwargs):
         """Переопределяем save для автоматического вычисления размера и размеров изображения"""
         super().save(*args, **kwargs)
@@ -56,13 +72,17 @@ class Image(models.Model):
                 if os.path.exists(img_path):
                     with PILImage.open(img_path) as img:
                         self.width, self.height = img.size
+                        # Многостраничные TIFF и анимированные GIF/WebP: кадры не декодируются
+                        self.page_count = getattr(img, 'n_frames', 1)
                 else:
                     self.width = 0
                     self.height = 0
+                    self.page_count = 1
                     
             except Exception as e:
                 print(f"Ошибка при получении размеров изображения: {e}")
                 self.width = 0
                 self.height = 0
+                self.page_count = 1
             
-            super().save(update_fields=['size', 'format', 'width', 'height'])
+            super().save(update_fields=['size', 'format', 'width', 'height', 'page_count'])
@@ -7,8 +7,8 @@ class ImageSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Image
-        fields = ['id', 'title', 'image', 'image_url', 'uploaded_at', 'width', 'height', 'format']
-        read_only_fields = ['id', 'uploaded_at', 'width', 'height', 'format']
+        fields = ['id', 'title', 'image', 'image_url', 'uploaded_at', 'width', 'height', 'format', 'page_count']
+        read_only_fields = ['id', 'uploaded_at', 'width', 'height', 'format', 'page_count']
         extra_kwargs = {
             'image': {'write_only': True}
         }
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Image
+from .metadata_cache import publish_image_metadata, remove_image_metadata
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, **kwargs):
+    """Метаданные попадают в Redis только после фиксации транзакции"""
+    transaction.on_commit(lambda: publish_image_metadata(instance))
+
+@receiver(post_delete, sender=Image)
+def image_deleted(sender, instance, **kwargs):
+    image_id = instance.id
+    transaction.on_commit(lambda: remove_image_metadata(image_id))
\ No newline at end of file
@@ -1,8 +1,9 @@
+import uuid
 from rest_framework import viewsets, status
 from rest_framework.permissions import AllowAny
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.renderers import TemplateHTMLRenderer, JSONRenderer
 from django.shortcuts import render
 from .models import Image
@@ -59,6 +60,13 @@ class ImageViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    def _api_data_payload(self, request, image):
+        """Компактное представление изображения для FastAPI сервиса"""
+        data = image.metadata_record()
+        if data['image_url']:
+            data['image_url'] = request.build_absolute_uri(data['image_url'])
+        return data
+    
     @action(detail=True, 
             methods=['get'], 
             permission_classes=[AllowAny],
@@ -73,21 +81,7 @@ class ImageViewSet(viewsets.ModelViewSet):
         try:
             image = self.get_object()
             
-            if image.image:
-                image_url = request.build_absolute_uri(image.image.url)
-            else:
-                image_url = None
-            
-            data = {
-                'id': str(image.id),
-                'title': image.title,
-                'image_url': image_url,
-                'uploaded_at': image.uploaded_at.isoformat(),
-                'size': image.size,
-                'width': image.width,
-                'height': image.height,
-                'format': image.format,
-            }
+            data = self._api_data_payload(request, image)
             
             logger.info(f"✅ API data sent for image {image.id}")
             return Response(data, status=status.HTTP_200_OK)
@@ -98,6 +92,40 @@ class ImageViewSet(viewsets.ModelViewSet):
                 {'detail': f'Ошибка при получении данных изображения: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=False, 
+            methods=['post'], 
+            permission_classes=[AllowAny],
+            authentication_classes=[],
+            parser_classes=[JSONParser],
+            renderer_classes=[JSONRenderer],
+            url_path='api-data/bulk')
+    def api_data_bulk(self, request):
+        """
+        Пакетный вариант api-data для FastAPI сервиса.
+        Принимает {"ids": [...]} и возвращает найденные изображения
+        одним запросом к базе; отсутствующие ID перечислены в "missing".
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list):
+            return Response(
+                {'detail': 'Поле ids должно быть списком'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        valid_ids = []
+        for image_id in ids:
+            try:
+                valid_ids.append(str(uuid.UUID(str(image_id))))
+            except ValueError:
+                continue
+        
+        images = Image.objects.filter(id__in=valid_ids)
+        found = {str(image.id): self._api_data_payload(request, image) for image in images}
+        missing = [str(image_id) for image_id in ids if str(image_id) not in found]
+        
+        logger.info(f"✅ Bulk API data sent for {len(found)} images ({len(missing)} missing)")
+        return Response({'images': found, 'missing': missing}, status=status.HTTP_200_OK)
 
     @method_decorator(cache_page(60 * 5))
     @method_decorator(vary_on_headers('Authorization',))
@@ -68,4 +68,18 @@ class TestImageModel:
     def test_image_meta_verbose_names(self):
         """Тест verbose_name в Meta"""
         assert Image._meta.verbose_name == "Изображение"
-        assert Image._meta.verbose_name_plural == "Изображения"
\ No newline at end of file
+        assert Image._meta.verbose_name_plural == "Изображения"
+    
+    def test_multipage_tiff_page_count(self):
+        """Количество страниц многостраничного TIFF сохраняется в модели и метаданных"""
+        file = BytesIO()
+        pages = [PILImage.new('L', (100, 140), color) for color in (255, 200, 150)]
+        pages[0].save(file, 'TIFF', save_all=True, append_images=pages[1:])
+        image_file = SimpleUploadedFile(name='scan.tiff', content=file.getvalue(), content_type='image/tiff')
+        
+        image = Image.objects.create(title="Scan", image=image_file)
+        image.refresh_from_db()
+        
+        assert image.page_count == 3
+        assert image.metadata_record()['page_count'] == 3
+        assert Image.objects.create(title="Photo", image=self.create_test_image()).page_count == 1
\ No newline at end of file